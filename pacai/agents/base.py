@@ -2,6 +2,7 @@ import abc
 import glob
 import logging
 import os
+import time
 
 from pacai.util import reflection
 
@@ -19,12 +20,24 @@ class BaseAgent(abc.ABC):
 
     Non-abstract children should make sure that their constructors accept `**kwargs`,
     since agents are typically created reflexively.
+
+    Before calling `BaseAgent.registerInitialState` or `BaseAgent.getAction`,
+    a game that enforces timeouts sets a deadline for the call.
+    Anytime agents (e.g. iterative deepening) can check `BaseAgent.getTimeLeft`
+    to use as much of their budget as they safely can.
+
+    Agents that keep their own structures up to date as the game changes (e.g. sets of food)
+    can opt in to a feed of what changed in the game by overriding `BaseAgent.wantsDeltas`,
+    see `BaseAgent.observeDeltas`.
     """
 
     def __init__(self, index = 0, **kwargs):
         self.index = index
         self.kwargs = kwargs
 
+        # The deadline (in terms of time.perf_counter()) for the current call from the game.
+        self._deadline = None
+
     @abc.abstractmethod
     def getAction(self, state):
         """
@@ -34,6 +47,29 @@ class BaseAgent(abc.ABC):
 
         pass
 
+    def getDeadline(self):
+        """
+        Get the time (in terms of `time.perf_counter`) the current move must be made by,
+        or None if there is no deadline
+        (e.g. the agent is not being run by a game, or the game does not enforce timeouts).
+        The deadline accounts for the rules' move timeout, the agent's remaining total time,
+        and (once an agent is out of warnings) the rules' move warning time.
+        Taking longer than the rules' move warning time (when it is shorter) costs a warning.
+        """
+
+        return self._deadline
+
+    def getTimeLeft(self):
+        """
+        Get the number of seconds left until the deadline of the current move,
+        or None if there is no deadline.
+        """
+
+        if (self._deadline is None):
+            return None
+
+        return max(0.0, self._deadline - time.perf_counter())
+
     def registerInitialState(self, state):
         """
         Inspect the starting state.
@@ -41,6 +77,16 @@ class BaseAgent(abc.ABC):
 
         pass
 
+    def observeDeltas(self, deltas):
+        """
+        Called (before `BaseAgent.observationFunction`) on agents that want deltas
+        with what changed in each move made since this agent last moved (or the game started),
+        as a list of `pacai.core.gamestate.StateDelta`, oldest first.
+        This is also called before `BaseAgent.final` with any moves the agent has not seen.
+        """
+
+        pass
+
     def observationFunction(self, state):
         """
         Make an observation on the state of the game.
@@ -56,6 +102,21 @@ class BaseAgent(abc.ABC):
 
         pass
 
+    def setDeadline(self, deadline):
+        """
+        Set by the game before each call that has a time limit.
+        """
+
+        self._deadline = deadline
+
+    def wantsDeltas(self):
+        """
+        Return true to get `BaseAgent.observeDeltas` calls.
+        Checked after `BaseAgent.registerInitialState`.
+        """
+
+        return False
+
     @staticmethod
     def loadAgent(name, index, args = {}):
         """
@@ -21,7 +21,7 @@ class OffensiveReflexAgent(ReflexCaptureAgent):
         # This should always be True, but better safe than sorry.
         if (len(foodList) > 0):
             myPos = successor.getAgentState(self.index).getPosition()
-            minDistance = min([self.getMazeDistance(myPos, food) for food in foodList])
+            _, minDistance = self.distancer.getNearest(myPos, foodList)
             features['distanceToFood'] = minDistance
 
         return features
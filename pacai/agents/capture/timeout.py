@@ -10,8 +10,10 @@ class TimeoutAgent(CaptureAgent):
     An agent that always waits a specified duration before making a random move.
     """
 
-    # The duration to wait.
+    # The duration to wait, unless the agent was given its own.
     # Testers may edit this directly (and reset() when done).
+    # Agents created in another process (see `pacai.agents.remote`) may not see these edits,
+    # so they should be given their durations when they are created instead.
     waitMoveDurationSecs = DEFAULT_WAIT_DURATION_SECS
     waitInitDurationSecs = DEFAULT_WAIT_DURATION_SECS
 
@@ -19,18 +21,30 @@ class TimeoutAgent(CaptureAgent):
         TimeoutAgent.waitMoveDurationSecs = DEFAULT_WAIT_DURATION_SECS
         TimeoutAgent.waitInitDurationSecs = DEFAULT_WAIT_DURATION_SECS
 
-    def __init__(self, index, **kwargs):
+    def __init__(self, index, waitMoveDurationSecs = None, waitInitDurationSecs = None,
+            **kwargs):
         super().__init__(index, **kwargs)
 
+        self._waitMoveDurationSecs = waitMoveDurationSecs
+        self._waitInitDurationSecs = waitInitDurationSecs
+
     def registerInitialState(self, gameState):
         # Wait first.
-        time.sleep(TimeoutAgent.waitInitDurationSecs)
+        waitDurationSecs = self._waitInitDurationSecs
+        if (waitDurationSecs is None):
+            waitDurationSecs = TimeoutAgent.waitInitDurationSecs
+
+        time.sleep(waitDurationSecs)
 
         super().registerInitialState(gameState)
 
     def chooseAction(self, gameState):
         # Wait first.
-        time.sleep(TimeoutAgent.waitMoveDurationSecs)
+        waitDurationSecs = self._waitMoveDurationSecs
+        if (waitDurationSecs is None):
+            waitDurationSecs = TimeoutAgent.waitMoveDurationSecs
+
+        time.sleep(waitDurationSecs)
 
         # Take a random action.
         actions = gameState.getLegalActions(self.index)
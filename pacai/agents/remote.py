@@ -0,0 +1,305 @@
+"""
+Agents that run in their own process.
+
+A `RemoteAgent` stands in for an agent that lives in an `AgentHost` (a worker process),
+and forwards each call from the game to it through a pipe.
+Since the game only waits until an agent's deadline (see `pacai.agents.base.BaseAgent`),
+an agent that hangs can be killed instead of stalling the game,
+and agents in different processes think on different cores.
+
+The layout of a game is only sent to a host once,
+after that states refer to the host's copy of the layout instead of including it.
+Note that engine calls made inside a host are not counted in `pacai.core.gamestats`.
+"""
+
+import io
+import logging
+import multiprocessing
+import pickle
+import random
+import time
+import traceback
+
+from pacai.agents.base import BaseAgent
+from pacai.core.layout import Layout
+
+# How long past an agent's deadline to wait before killing its host.
+# The game sees that the agent took too long and handles the timeout like any other.
+PREEMPT_GRACE_SECS = 0.1
+
+COMMAND_CLOSE = 'close'
+COMMAND_FINAL = 'final'
+COMMAND_GET_ACTION = 'getAction'
+COMMAND_LAYOUT = 'layout'
+COMMAND_REGISTER_INITIAL_STATE = 'registerInitialState'
+
+class AgentHost(object):
+    """
+    A worker process that hosts one or more agents.
+    The agents are created inside the worker by calling `factory(*factoryArgs)`,
+    which must return a list of agents (like a team's `createTeam`).
+    `factory` and `factoryArgs` must be picklable.
+    """
+
+    def __init__(self, factory, factoryArgs = ()):
+        self._factory = factory
+        self._factoryArgs = factoryArgs
+
+        self._process = None
+        self._connection = None
+
+        # {id(layout): (token, layout)} for the layouts this host has a copy of.
+        self._layouts = {}
+
+    def call(self, agentIndex, command, state = None, timeLeft = None, preempt = False,
+            deltas = None):
+        """
+        Call a method of a hosted agent, and return its result.
+        The hosted agent gets a deadline `timeLeft` seconds away (if given),
+        and observes any `deltas` first.
+        If `preempt` is true and the deadline passes without a result,
+        the host is killed and None is returned.
+        Exceptions raised by the agent are raised here as a RuntimeError.
+        """
+
+        if (not self.isAlive()):
+            raise RuntimeError('The process hosting agent %d is not running.' % (agentIndex))
+
+        if (state is not None):
+            self._sendLayout(state.getInitialLayout())
+
+        # Agents get the time left (not the deadline), clocks may differ between processes.
+        startTime = time.perf_counter()
+        self._send((command, agentIndex, (state, timeLeft, deltas)))
+
+        if (preempt and timeLeft is not None):
+            remaining = max(0.0, timeLeft - (time.perf_counter() - startTime)) + PREEMPT_GRACE_SECS
+            if (not self._connection.poll(remaining)):
+                logging.warning('Killing the process hosting agent %d, it is past its deadline.'
+                        % (agentIndex))
+                self.kill()
+                return None
+
+        try:
+            status, result = self._connection.recv()
+        except EOFError:
+            self.kill()
+            raise RuntimeError('The process hosting agent %d exited unexpectedly.' % (agentIndex))
+
+        if (status == 'error'):
+            raise RuntimeError('Agent %d raised an exception in its process:\n%s' % (
+                    agentIndex, result))
+
+        return result
+
+    def close(self):
+        """
+        Ask the host to exit, killing it if it does not.
+        """
+
+        if (not self.isAlive()):
+            return
+
+        try:
+            self._connection.send((COMMAND_CLOSE, None, None))
+        except (BrokenPipeError, EOFError):
+            pass
+
+        self._process.join(1.0)
+        self.kill()
+
+    def isAlive(self):
+        return (self._process is not None and self._process.is_alive())
+
+    def kill(self):
+        if (self._process is None):
+            return
+
+        if (self._process.is_alive()):
+            self._process.kill()
+
+        self._process.join()
+        self._connection.close()
+
+        self._process = None
+        self._connection = None
+        self._layouts = {}
+
+    def start(self):
+        """
+        Start the worker process (which creates its agents).
+        Any agents already hosted are killed and replaced.
+        """
+
+        self.kill()
+
+        self._connection, childConnection = multiprocessing.Pipe()
+
+        # Each host gets its own (reproducible) seed.
+        seed = random.getrandbits(32)
+
+        self._process = multiprocessing.Process(target = _hostMain, daemon = True,
+                args = (childConnection, self._factory, self._factoryArgs, seed))
+        self._process.start()
+
+        childConnection.close()
+
+    def _persistentId(self, obj):
+        if (isinstance(obj, Layout) and id(obj) in self._layouts):
+            return (COMMAND_LAYOUT, self._layouts[id(obj)][0])
+
+        return None
+
+    def _send(self, message):
+        buffer = io.BytesIO()
+
+        pickler = pickle.Pickler(buffer, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = self._persistentId
+        pickler.dump(message)
+
+        self._connection.send_bytes(buffer.getvalue())
+
+    def _sendLayout(self, layout):
+        if (id(layout) in self._layouts):
+            return
+
+        token = len(self._layouts)
+        self._send((COMMAND_LAYOUT, None, (token, layout)))
+
+        # Keep a reference to the layout so its id is not reused.
+        self._layouts[id(layout)] = (token, layout)
+
+class RemoteAgent(BaseAgent):
+    """
+    An agent that forwards all calls to the agent with the same index in an `AgentHost`.
+    The host is started (or restarted, if it was killed) at the start of each game.
+
+    If `preempt` is true, the host is killed when the agent goes past its deadline.
+    This should only be used when the game is enforcing timeouts,
+    since the agent is lost for the rest of the game.
+    Once its host is killed, an agent (and any other agent on the same host)
+    ignores deltas and final() until the host is started again.
+    """
+
+    def __init__(self, index, host, preempt = True, **kwargs):
+        super().__init__(index, **kwargs)
+
+        self._host = host
+        self._preempt = preempt
+
+        # The hosted agent's answer to wantsDeltas(), and the deltas it has not been sent yet.
+        self._wantsDeltas = False
+        self._deltas = []
+
+    def close(self):
+        self._host.close()
+
+    def final(self, state):
+        # A host that was killed (e.g. for going past a deadline) has nothing to tell.
+        if (not self._host.isAlive()):
+            self._deltas = []
+            return
+
+        self._host.call(self.index, COMMAND_FINAL, state, deltas = self._takeDeltas())
+
+    def getAction(self, state):
+        # The observations are made by the hosted agent, just before it chooses its action.
+        return self._host.call(self.index, COMMAND_GET_ACTION, state, self.getTimeLeft(),
+                self._preempt, self._takeDeltas())
+
+    def observationFunction(self, state):
+        pass
+
+    def observeDeltas(self, deltas):
+        if (not self._host.isAlive()):
+            return
+
+        self._deltas += deltas
+
+    def registerInitialState(self, state):
+        if (not self._host.isAlive()):
+            self._host.start()
+
+        self._deltas = []
+        self._wantsDeltas = self._host.call(self.index, COMMAND_REGISTER_INITIAL_STATE, state,
+                self.getTimeLeft(), self._preempt)
+
+    def wantsDeltas(self):
+        return bool(self._wantsDeltas)
+
+    def _takeDeltas(self):
+        deltas = self._deltas
+        self._deltas = []
+
+        return deltas
+
+def closeAgents(agents):
+    """
+    Stop the hosts of any `RemoteAgent` in a list of agents.
+    """
+
+    for agent in agents:
+        if (isinstance(agent, RemoteAgent)):
+            agent.close()
+
+def _hostMain(connection, factory, factoryArgs, seed):
+    """
+    The main loop of an `AgentHost` process.
+    """
+
+    random.seed(seed)
+
+    agents = {agent.index: agent for agent in factory(*factoryArgs)}
+    layouts = {}
+
+    def persistentLoad(persistentId):
+        return layouts[persistentId[1]]
+
+    try:
+        while (True):
+            unpickler = pickle.Unpickler(io.BytesIO(connection.recv_bytes()))
+            unpickler.persistent_load = persistentLoad
+            command, agentIndex, payload = unpickler.load()
+
+            if (command == COMMAND_CLOSE):
+                break
+
+            if (command == COMMAND_LAYOUT):
+                token, layout = payload
+                layouts[token] = layout
+                continue
+
+            state, timeLeft, deltas = payload
+            agent = agents[agentIndex]
+
+            deadline = None
+            if (timeLeft is not None):
+                deadline = time.perf_counter() + timeLeft
+            agent.setDeadline(deadline)
+
+            try:
+                result = None
+                if (deltas):
+                    agent.observeDeltas(deltas)
+
+                if (command == COMMAND_REGISTER_INITIAL_STATE):
+                    agent.registerInitialState(state)
+                    result = agent.wantsDeltas()
+                elif (command == COMMAND_GET_ACTION):
+                    agent.observationFunction(state)
+                    result = agent.getAction(state)
+                elif (command == COMMAND_FINAL):
+                    agent.final(state)
+                else:
+                    raise ValueError('Unknown command: %s.' % (command))
+
+                response = ('ok', result)
+            except Exception:
+                response = ('error', traceback.format_exc())
+
+            connection.send(response)
+    except (EOFError, KeyboardInterrupt):
+        # The game went away (or is being interrupted), there is no one to answer.
+        pass
+    finally:
+        connection.close()
@@ -3,29 +3,63 @@ import textwrap
 
 from pacai.ui import view
 
-def getParser(description, name):
+def addCacheDirArgument(parser):
     """
-    Loads common arguments between pacman and capture.
+    Add the --cache-dir option for keeping derived data across runs.
     """
 
-    parser = argparse.ArgumentParser(description = textwrap.dedent(description), prog = name,
-            formatter_class = argparse.RawTextHelpFormatter)
+    parser.add_argument('--cache-dir', dest = 'cacheDir',
+            action = 'store', type = str, default = None,
+            help = 'keep precompiled layouts (and other derived data) in this directory '
+                + 'so they can be reused across runs (default: %(default)s)')
+
+def addLoggingArguments(parser):
+    """
+    Add the options to set the logging level (-d/--debug and -q/--quiet).
+    """
 
     parser.add_argument('-d', '--debug', dest = 'debug',
             action = 'store_true', default = False,
             help = 'set logging level to debug (default: %(default)s)')
 
-    parser.add_argument('-n', '--num-games', dest = 'numGames',
-            action = 'store', type = int, default = 1,
-            help = 'play the specified number of games (default: %(default)s)')
-
     parser.add_argument('-q', '--quiet', dest = 'quiet',
             action = 'store_true', default = False,
             help = 'set logging level to warning (default: %(default)s)')
 
+def addRecordArgument(parser):
+    """
+    Add the --record option for saving games to a replay archive.
+    """
+
+    parser.add_argument('--record', dest = 'record',
+            action = 'store', type = str, default = None,
+            help = 'adds the moves of each game to the named replay archive (default: %(default)s)')
+
+def addSeedArgument(parser, help = 'Enter seed value to randomize the game'):
+    """
+    Add the -s/--seed option, programs that use the seed differently can give their own help.
+    """
+
     parser.add_argument('-s', '--seed', dest = 'seed',
             action = 'store', type = int, default = None,
-            help = 'Enter seed value to randomize the game')
+            help = help)
+
+def getParser(description, name):
+    """
+    Loads common arguments between pacman and capture.
+    """
+
+    parser = argparse.ArgumentParser(description = textwrap.dedent(description), prog = name,
+            formatter_class = argparse.RawTextHelpFormatter)
+
+    addLoggingArguments(parser)
+    addSeedArgument(parser)
+    addCacheDirArgument(parser)
+    addRecordArgument(parser)
+
+    parser.add_argument('-n', '--num-games', dest = 'numGames',
+            action = 'store', type = int, default = 1,
+            help = 'play the specified number of games (default: %(default)s)')
 
     parser.add_argument('--catch-exceptions', dest = 'catchExceptions',
             action = 'store_true', default = False,
@@ -56,18 +90,30 @@ def getParser(description, name):
             action = 'store', type = int, default = 0,
             help = 'set how many episodes of training (suppresses output) (default: %(default)s)')
 
-    parser.add_argument('--record', dest = 'record',
-            action = 'store', type = str, default = None,
-            help = 'writes the moves of a game to the named pickle file (default: %(default)s)')
-
     parser.add_argument('--replay', dest = 'replay',
             action = 'store', type = str, default = None,
-            help = 'load a recorded pickle game file to replay (default: %(default)s)')
+            help = 'load a recorded game (or archive of games) to replay (default: %(default)s)')
+
+    parser.add_argument('--replay-game', dest = 'replayGame',
+            action = 'store', type = int, default = None,
+            help = 'only replay the game at this index (starting at zero) of a replay archive, '
+                + 'instead of every game in it (default: %(default)s)')
+
+    parser.add_argument('--replay-start', dest = 'replayStart',
+            action = 'store', type = int, default = 0,
+            help = 'start replays after this many moves, '
+                + 'without showing the moves before it (default: %(default)s)')
 
     parser.add_argument('--sprites', dest = 'spritesPath',
             action = 'store', type = str, default = view.DEFAULT_SPRITES,
             help = 'use the specified spritesheet for graphics (default: %(default)s)')
 
+    parser.add_argument('--stats', dest = 'stats',
+            action = 'store', type = str, default = None,
+            help = 'write instrumentation for each game (move times, time spent in '
+                + 'agents/engine/rules/display, and engine call counts) as JSON to this path '
+                + '(default: %(default)s)')
+
     parser.add_argument('--text-graphics', dest = 'textGraphics',
             action = 'store_true', default = False,
             help = 'display output as text only (default: %(default)s)')
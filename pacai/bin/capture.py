@@ -7,18 +7,21 @@ On your opponents side of the map, you are a pacman and can eat food and capsule
 
 import logging
 import os
-import pickle
 import random
 import sys
 
 from pacai.agents import keyboard
+from pacai.agents import remote
 from pacai.agents.capture.dummy import DummyAgent
 from pacai.bin.arguments import getParser
+from pacai.core import distanceCalculator
+from pacai.core import gamestats
+from pacai.core import replay
 from pacai.core.actions import Actions
 from pacai.core.distance import manhattan
 from pacai.core.game import Game
 from pacai.core.gamestate import AbstractGameState
-from pacai.core.grid import Grid
+from pacai.core.grid import BitGrid
 from pacai.core.layout import Layout
 from pacai.core.layout import getLayout
 from pacai.ui.capture.null import CaptureNullView
@@ -57,6 +60,11 @@ DEFAULT_MOVE_TIMEOUT_TIME_SECS = 3
 # Next violation causes a forfeit.
 DEFAULT_MAX_MOVE_WARNINGS = 2
 
+# Ways agents can be run in their own processes (see loadRemoteAgents()).
+AGENT_PROCESS_AGENT = 'agent'
+AGENT_PROCESS_TEAM = 'team'
+AGENT_PROCESS_MODES = [AGENT_PROCESS_AGENT, AGENT_PROCESS_TEAM]
+
 class CaptureGameState(AbstractGameState):
     """
     A game state specific to capture.
@@ -97,18 +105,17 @@ class CaptureGameState(AbstractGameState):
             else:
                 self._blueCapsules.append(capsule)
 
-        self._redFood = Grid(self._food.getWidth(), self._food.getHeight(), initialValue = False)
-        self._blueFood = Grid(self._food.getWidth(), self._food.getHeight(), initialValue = False)
+        width = self._food.getWidth()
+        height = self._food.getHeight()
 
-        for x in range(self._food.getWidth()):
-            for y in range(self._food.getHeight()):
-                if (not self._food[x][y]):
-                    continue
+        self._redFood = BitGrid(width, height, initialValue = False)
+        self._blueFood = BitGrid(width, height, initialValue = False)
 
-                if (self.isOnRedSide((x, y))):
-                    self._redFood[x][y] = True
-                else:
-                    self._blueFood[x][y] = True
+        for (x, y) in self._food.asList():
+            if (self.isOnRedSide((x, y))):
+                self._redFood[x][y] = True
+            else:
+                self._blueFood[x][y] = True
 
     # Override
     def generateSuccessor(self, agentIndex, action):
@@ -123,6 +130,8 @@ class CaptureGameState(AbstractGameState):
 
     # Override
     def getLegalActions(self, agentIndex = 0):
+        gamestats.counts[gamestats.GET_LEGAL_ACTIONS] += 1
+
         if (self.isOver()):
             return []
 
@@ -154,6 +163,18 @@ class CaptureGameState(AbstractGameState):
         else:
             self._blueFood[x][y] = False
 
+    # Override
+    def getSnapshot(self):
+        snapshot = super().getSnapshot()
+        snapshot['timeleft'] = self._timeleft
+
+        return snapshot
+
+    # Override
+    def loadSnapshot(self, snapshot):
+        super().loadSnapshot(snapshot)
+        self._timeleft = snapshot['timeleft']
+
     def getBlueCapsules(self):
         """
         Get a list of remaining capsules on the blue side.
@@ -251,7 +272,7 @@ class CaptureGameState(AbstractGameState):
         # Find appropriate rules for the agent.
         AgentRules.applyAction(self, action, agentIndex)
         AgentRules.checkDeath(self, agentIndex)
-        AgentRules.decrementTimer(self.getAgentState(agentIndex))
+        AgentRules.decrementTimer(self.getMutableAgentState(agentIndex))
 
         # Book keeping.
         self._lastAgentMoved = agentIndex
@@ -373,8 +394,8 @@ class AgentRules:
         """
 
         agentState = state.getAgentState(agentIndex)
-        return Actions.getPossibleActions(agentState.getPosition(), agentState.getDirection(),
-                state.getWalls())
+        return state.getInitialLayout().getPossibleActions(agentState.getPosition(),
+                agentState.getDirection())
 
     @staticmethod
     def applyAction(state, action, agentIndex):
@@ -386,7 +407,7 @@ class AgentRules:
         if (action not in legal):
             raise ValueError('Illegal action: ' + str(action))
 
-        agentState = state.getAgentState(agentIndex)
+        agentState = state.getMutableAgentState(agentIndex)
 
         # Update position.
         vector = Actions.directionToVector(action, AgentRules.AGENT_SPEED)
@@ -445,7 +466,7 @@ class AgentRules:
                 otherTeam = state.getRedTeamIndices()
 
             for agentIndex in otherTeam:
-                state.getAgentState(agentIndex).setScaredTimer(SCARED_TIME)
+                state.getMutableAgentState(agentIndex).setScaredTimer(SCARED_TIME)
 
     @staticmethod
     def decrementTimer(agentState):
@@ -486,15 +507,51 @@ class AgentRules:
             # Otherwise, we are being eatten.
             if (agentState.isBraveGhost() or otherAgentState.isScaredGhost()):
                 state.addScore(teamPointModifier * KILL_POINTS)
-                otherAgentState.respawn()
+                state.getMutableAgentState(otherAgentIndex).respawn()
             else:
                 state.addScore(teamPointModifier * -KILL_POINTS)
+                agentState = state.getMutableAgentState(agentIndex)
                 agentState.respawn()
 
 #############################
 # FRAMEWORK TO START A GAME #
 #############################
 
+def addGameLimitArguments(parser):
+    """
+    Add the options for the length of a game and the time limits on its agents
+    (--max-moves and the arguments to `CaptureRules.newGame` for time limits).
+    """
+
+    parser.add_argument('--max-moves', dest = 'maxMoves',
+            action = 'store', type = int, default = DEFAULT_MAX_MOVES,
+            help = 'set maximum number of moves between all agents in a game '
+                + '(default: %(default)s)')
+
+    parser.add_argument('--max-total-agent-time', dest = 'maxTotalAgentTimeSecs',
+            action = 'store', type = float, default = DEFAULT_MAX_TOTAL_AGENT_TIME_SECS,
+            help = 'set maximum number of seconds a game can run (default: %(default)s)')
+
+    parser.add_argument('--max-startup-time', dest = 'maxStartupTimeSecs',
+            action = 'store', type = float, default = DEFAULT_MAX_STARTUP_TIME_SECS,
+            help = 'set maximum number of seconds allowed for registerInitialState() '
+                + '(default: %(default)s)')
+
+    parser.add_argument('--move-warning-time', dest = 'moveWarningTimeSecs',
+            action = 'store', type = float, default = DEFAULT_MOVE_WARNING_TIME_SECS,
+            help = 'set maximum number of seconds an agent can take on a move '
+                + 'before a warning is issued (default: %(default)s)')
+
+    parser.add_argument('--move-timeout-time', dest = 'moveTimeoutTimeSecs',
+            action = 'store', type = float, default = DEFAULT_MOVE_TIMEOUT_TIME_SECS,
+            help = 'set maximum number of seconds an agent can take on a move '
+                + 'before forfeiting (default: %(default)s)')
+
+    parser.add_argument('--max-move-warnings', dest = 'maxMoveWarnings',
+            action = 'store', type = int, default = DEFAULT_MAX_MOVE_WARNINGS,
+            help = 'set maximum number of warnings issued to an agent '
+                + 'before that agent is disqualified (default: %(default)s)')
+
 def parseAgentArgs(str):
     if (str is None or str == ''):
         return {}
@@ -550,6 +607,11 @@ def readCommand(argv):
             help = 'comma separated arguments to be passed to blue team (e.g. \'opt1=val1,opt2\') '
                 + '(default: %(default)s)')
 
+    parser.add_argument('--agent-processes', dest = 'agentProcesses',
+            action = 'store', type = str, default = None, choices = AGENT_PROCESS_MODES,
+            help = 'run each agent or each team in its own process, '
+                + 'so agents that go past the move timeout can be stopped (default: %(default)s)')
+
     parser.add_argument('--keys0', dest = 'keys0',
             action = 'store_true', default = False,
             help = 'make agent 0 (first red player) a keyboard agent (default: %(default)s)')
@@ -566,34 +628,12 @@ def readCommand(argv):
             action = 'store_true', default = False,
             help = 'make agent 3 (second blue player) a keyboard agent (default: %(default)s)')
 
-    parser.add_argument('--max-moves', dest = 'maxMoves',
-            action = 'store', type = int, default = DEFAULT_MAX_MOVES,
-            help = 'set maximum number of moves between all agents in a game (default: %(default)s)')
-
     parser.add_argument('--red-args', dest = 'redArgs',
             action = 'store', type = str, default = None,
             help = 'comma separated arguments to be passed to red team (e.g. \'opt1=val1,opt2\') '
                 + '(default: %(default)s)')
 
-    parser.add_argument('--max-total-agent-time', dest = 'maxTotalAgentTimeSecs',
-            action = 'store', type = float, default = DEFAULT_MAX_TOTAL_AGENT_TIME_SECS,
-            help = 'set maximum number of seconds a game can run (default: %(default)s)')
-
-    parser.add_argument('--max-startup-time', dest = 'maxStartupTimeSecs',
-            action = 'store', type = float, default = DEFAULT_MAX_STARTUP_TIME_SECS,
-            help = 'set maximum number of seconds allowed for registerInitialState() (default: %(default)s)')
-
-    parser.add_argument('--move-warning-time', dest = 'moveWarningTimeSecs',
-            action = 'store', type = float, default = DEFAULT_MOVE_WARNING_TIME_SECS,
-            help = 'set maximum number of seconds an agent can take on a move before a warning is issued (default: %(default)s)')
-
-    parser.add_argument('--move-timeout-time', dest = 'moveTimeoutTimeSecs',
-            action = 'store', type = float, default = DEFAULT_MOVE_TIMEOUT_TIME_SECS,
-            help = 'set maximum number of seconds an agent can take on a move before forfeiting (default: %(default)s)')
-
-    parser.add_argument('--max-move-warnings', dest = 'maxMoveWarnings',
-            action = 'store', type = int, default = DEFAULT_MAX_MOVE_WARNINGS,
-            help = 'set maximum number of warnings issued to an agent before that agent is disqualified (default: %(default)s)')
+    addGameLimitArguments(parser)
 
     options, otherjunk = parser.parse_known_args(argv)
     args = dict()
@@ -649,9 +689,19 @@ def readCommand(argv):
 
     nokeyboard = options.textGraphics or options.nullGraphics or options.numTraining > 0
     logging.debug('\nRed team %s with %s:' % (options.red, redArgs))
-    redAgents = loadAgents(True, options.red, nokeyboard, redArgs)
+    if (options.agentProcesses is None):
+        redAgents = loadAgents(True, options.red, nokeyboard, redArgs)
+    else:
+        redAgents = loadRemoteAgents(True, options.red, redArgs, options.agentProcesses,
+                options.catchExceptions)
+
     logging.debug('\nBlue team %s with %s:' % (options.blue, blueArgs))
-    blueAgents = loadAgents(False, options.blue, nokeyboard, blueArgs)
+    if (options.agentProcesses is None):
+        blueAgents = loadAgents(False, options.blue, nokeyboard, blueArgs)
+    else:
+        blueAgents = loadRemoteAgents(False, options.blue, blueArgs, options.agentProcesses,
+                options.catchExceptions)
+
     args['agents'] = sum([list(el) for el in zip(redAgents, blueAgents)], [])  # List of agents.
 
     numKeyboardAgents = 0
@@ -669,27 +719,21 @@ def readCommand(argv):
         numKeyboardAgents += 1
         args['agents'][index] = agent
 
-    # Choose a layout.
-    if options.layout.startswith('RANDOM'):
-        layoutSeed = None
-        if (options.layout != 'RANDOM'):
-            layoutSeed = int(options.layout[6:])
-
-        args['layout'] = Layout(generateMaze(layoutSeed).split('\n'))
-    elif options.layout.lower().find('capture') == -1:
-        raise ValueError('You must use a capture layout with capture.py.')
-    else:
-        args['layout'] = getLayout(options.layout)
+    # Persist derived data (like maze distances) if asked.
+    distanceCalculator.setCacheDir(options.cacheDir)
 
-    if (args['layout'] is None):
-        raise ValueError('The layout ' + options.layout + ' cannot be found.')
+    # Choose a layout.
+    args['layout'] = loadLayout(options.layout, options.cacheDir)
 
     args['length'] = options.maxMoves
     args['numGames'] = options.numGames
     args['numTraining'] = options.numTraining
     args['record'] = options.record
+    args['stats'] = options.stats
     args['catchExceptions'] = options.catchExceptions
     args['replay'] = options.replay
+    args['replayGame'] = options.replayGame
+    args['replayStart'] = options.replayStart
     args['maxTotalAgentTimeSecs'] = options.maxTotalAgentTimeSecs
     args['maxStartupTimeSecs'] = options.maxStartupTimeSecs
     args['moveWarningTimeSecs'] = options.moveWarningTimeSecs
@@ -709,23 +753,79 @@ def loadAgents(isRed, agentModule, textgraphics, args):
     logging.info('Loading Team: %s', agentModule)
     logging.info('Arguments: %s', args)
 
+    indices = getTeamIndices(isRed)
+
+    return createTeamFunction(indices[0], indices[1], isRed, **args)
+
+def loadRemoteAgents(isRed, agentModule, args, mode = AGENT_PROCESS_TEAM, preempt = True):
+    """
+    Like `loadAgents`, but the team is run in its own process,
+    or each agent is run in its own process (if the mode is AGENT_PROCESS_AGENT).
+    If `preempt` is true, a process is killed when its agent goes past the move timeout.
+    See `pacai.agents.remote`.
+    """
+
+    if (mode not in AGENT_PROCESS_MODES):
+        raise ValueError('Unknown agent process mode: %s.' % (mode))
+
+    numHosts = 1
+    if (mode == AGENT_PROCESS_AGENT):
+        numHosts = 2
+
+    # Every host creates the whole team, but only the agent(s) it is used for are called.
+    hosts = [remote.AgentHost(loadAgents, (isRed, agentModule, True, args))
+            for i in range(numHosts)]
+
+    return [remote.RemoteAgent(index, hosts[i % numHosts], preempt = preempt)
+            for (i, index) in enumerate(getTeamIndices(isRed))]
+
+def getTeamIndices(isRed):
     indexAddend = 0
     if (not isRed):
         indexAddend = 1
-    indices = [2 * i + indexAddend for i in range(2)]
 
-    return createTeamFunction(indices[0], indices[1], isRed, **args)
+    return [2 * i + indexAddend for i in range(2)]
+
+def loadLayout(name, cacheDir = None):
+    """
+    Load a capture layout by name, or generate one for RANDOM<seed> (i.e. RANDOM23).
+    """
+
+    if name.startswith('RANDOM'):
+        layoutSeed = None
+        if (name != 'RANDOM'):
+            layoutSeed = int(name[6:])
+
+        layout = Layout(generateMaze(layoutSeed).split('\n'))
+    elif name.lower().find('capture') == -1:
+        raise ValueError('You must use a capture layout with capture.py.')
+    else:
+        layout = getLayout(name, cacheDir = cacheDir)
+
+    if (layout is None):
+        raise ValueError('The layout ' + name + ' cannot be found.')
+
+    return layout
+
+def replayGame(layout, agents, actions, display, length, redTeamName, blueTeamName,
+        keyframes = None, start = 0, **kwargs):
+    """
+    Replay a recorded game, starting after `start` moves.
+    """
 
-def replayGame(layout, agents, actions, display, length, redTeamName, blueTeamName, **kwargs):
     agents = [DummyAgent(index) for index in range(len(agents))]
     rules = CaptureRules()
     game = rules.newGame(layout, agents, display, length, False, **kwargs)
-    state = game.state
+
+    # Always leave the last move to be played, so the end of the game is processed.
+    start = max(0, min(start, len(actions) - 1))
+    state = replay.seekReplay(game.state, actions, keyframes, start)
+
     display.redTeam = redTeamName
     display.blueTeam = blueTeamName
     display.initialize(state)
 
-    for action in actions:
+    for action in actions[start:]:
         # Execute the action
         state = state.generateSuccessor(*action)
         # Change the display
@@ -736,7 +836,7 @@ def replayGame(layout, agents, actions, display, length, redTeamName, blueTeamNa
     display.finish()
 
 def runGames(layout, agents, display, length, numGames, record, numTraining,
-        redTeamName, blueTeamName, catchExceptions = False, **kwargs):
+        redTeamName, blueTeamName, catchExceptions = False, stats = None, **kwargs):
     rules = CaptureRules()
     games = []
 
@@ -745,41 +845,42 @@ def runGames(layout, agents, display, length, numGames, record, numTraining,
         logging.info('Playing %d training games.' % numTraining)
         nullView = CaptureNullView()
 
-    for i in range(numGames):
-        isTraining = (i < numTraining)
+    try:
+        for i in range(numGames):
+            isTraining = (i < numTraining)
 
-        if (isTraining):
-            # Suppress graphics for training.
-            gameDisplay = nullView
-        else:
-            gameDisplay = display
+            if (isTraining):
+                # Suppress graphics for training.
+                gameDisplay = nullView
+            else:
+                gameDisplay = display
 
-        g = rules.newGame(layout, agents, gameDisplay, length, catchExceptions, **kwargs)
-        g.run()
+            g = rules.newGame(layout, agents, gameDisplay, length, catchExceptions, **kwargs)
+            g.run()
 
-        if (not isTraining):
-            games.append(g)
+            g.record = None
+            if (isTraining):
+                continue
 
-        g.record = None
-        if record:
-            components = {
-                'layout': layout,
-                'agents': [agent.__class__.__name__ for agent in agents],
-                'actions': g.moveHistory,
-                'length': length,
-                'redTeamName': redTeamName,
-                'blueTeamName': blueTeamName
-            }
+            games.append(g)
 
-            path = 'replay'
-            if (isinstance(record, str)):
-                path = record
+            if record:
+                path = 'replay'
+                if (isinstance(record, str)):
+                    path = record
 
-            g.record = pickle.dumps(components)
-            with open(path, 'wb') as file:
-                file.write(g.record)
+                keyframes = replay.buildKeyframes(CaptureGameState(layout, length), g.moveHistory)
+                g.record = replay.appendReplay(path, layout, g.moveHistory, len(agents),
+                        keyframes,
+                        agents = [agent.__class__.__name__ for agent in agents],
+                        length = length,
+                        redTeamName = redTeamName,
+                        blueTeamName = blueTeamName)
 
-            logging.info("Game recorded to: '%s'." % (path))
+                logging.info("Game recorded to: '%s'." % (path))
+    finally:
+        # Stop any agents that were run in their own processes.
+        remote.closeAgents(agents)
 
     if (numGames > 0):
         scores = [game.state.getScore() for game in games]
@@ -794,6 +895,10 @@ def runGames(layout, agents, display, length, numGames, record, numTraining,
         logging.info('Record: %s',
                 ', '.join([('Blue', 'Tie', 'Red')[max(0, min(2, 1 + s))] for s in scores]))
 
+    if (stats is not None):
+        gamestats.writeStats(stats, games)
+        logging.info("Game stats written to: '%s'." % (stats))
+
     return games
 
 
@@ -812,12 +917,12 @@ def main(argv):
     if (options['replay'] is not None):
         logging.info('Replaying recorded game %s.' % options['replay'])
 
-        recorded = None
-        with open(options['replay'], 'rb') as file:
-            recorded = pickle.load(file)
+        for (i, recorded) in enumerate(replay.readReplays(options['replay'])):
+            if (options['replayGame'] is not None and i != options['replayGame']):
+                continue
 
-        recorded['display'] = options['display']
-        replayGame(**recorded)
+            recorded['display'] = options['display']
+            replayGame(start = options['replayStart'], **recorded)
 
         return
 
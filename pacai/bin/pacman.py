@@ -7,9 +7,9 @@ Use WASD (or the arrow keys) to move.
 Have fun!
 """
 
+import concurrent.futures
 import logging
 import os
-import pickle
 import random
 import sys
 
@@ -17,8 +17,10 @@ from pacai.agents.base import BaseAgent
 from pacai.agents.ghost.random import RandomGhost
 from pacai.agents.greedy import GreedyAgent
 from pacai.bin.arguments import getParser
+from pacai.core import distanceCalculator
+from pacai.core import gamestats
+from pacai.core import replay
 from pacai.core.actions import Actions
-from pacai.core.directions import Directions
 from pacai.core.distance import manhattan
 from pacai.core.game import Game
 from pacai.core.gamestate import AbstractGameState
@@ -66,6 +68,8 @@ class PacmanGameState(AbstractGameState):
 
     # Override
     def getLegalActions(self, agentIndex = PACMAN_AGENT_INDEX):
+        gamestats.counts[gamestats.GET_LEGAL_ACTIONS] += 1
+
         if (self.isOver()):
             return []
 
@@ -134,7 +138,7 @@ class PacmanGameState(AbstractGameState):
             # Penalty for waiting around.
             self.addScore(-TIME_PENALTY)
         else:
-            GhostRules.decrementTimer(self.getAgentState(agentIndex))
+            GhostRules.decrementTimer(self.getMutableAgentState(agentIndex))
 
         # Resolve multi-agent effects.
         GhostRules.checkDeath(self, agentIndex)
@@ -217,8 +221,8 @@ class PacmanRules:
         """
 
         agentState = state.getPacmanState()
-        return Actions.getPossibleActions(agentState.getPosition(), agentState.getDirection(),
-                state.getWalls())
+        return state.getInitialLayout().getPossibleActions(agentState.getPosition(),
+                agentState.getDirection())
 
     @staticmethod
     def applyAction(state, action):
@@ -230,7 +234,7 @@ class PacmanRules:
         if (action not in legal):
             raise ValueError('Illegal pacman action: ' + str(action))
 
-        pacmanState = state.getPacmanState()
+        pacmanState = state.getMutableAgentState(PACMAN_AGENT_INDEX)
 
         # Update position.
         vector = Actions.directionToVector(action, PacmanRules.PACMAN_SPEED)
@@ -260,8 +264,8 @@ class PacmanRules:
             state.eatCapsule(x, y)
 
             # Reset all ghosts' scared timers.
-            for ghostState in state.getGhostStates():
-                ghostState.setScaredTimer(SCARED_TIME)
+            for ghostIndex in state.getGhostIndexes():
+                state.getMutableAgentState(ghostIndex).setScaredTimer(SCARED_TIME)
 
 class GhostRules:
     """
@@ -278,17 +282,8 @@ class GhostRules:
         """
 
         agentState = state.getGhostState(ghostIndex)
-        possibleActions = Actions.getPossibleActions(agentState.getPosition(),
-                agentState.getDirection(), state.getWalls())
-        reverse = Actions.reverseDirection(agentState.getDirection())
-
-        if (Directions.STOP in possibleActions):
-            possibleActions.remove(Directions.STOP)
-
-        if (reverse in possibleActions and len(possibleActions) > 1):
-            possibleActions.remove(reverse)
-
-        return possibleActions
+        return state.getInitialLayout().getGhostActions(agentState.getPosition(),
+                agentState.getDirection())
 
     @staticmethod
     def applyAction(state, action, ghostIndex):
@@ -296,7 +291,7 @@ class GhostRules:
         if (action not in legal):
             raise ValueError('Illegal ghost action: ' + str(action))
 
-        ghostState = state.getGhostState(ghostIndex)
+        ghostState = state.getMutableAgentState(ghostIndex)
         speed = GhostRules.GHOST_SPEED
         if (ghostState.isScared()):
             speed /= 2.0
@@ -341,7 +336,7 @@ class GhostRules:
         if (ghostState.isScared()):
             # Pacman ate a ghost.
             state.addScore(GHOST_POINTS)
-            ghostState.respawn()
+            state.getMutableAgentState(agentIndex).respawn()
         elif (not state.isOver()):
             # A ghost ate pacman.
             state.addScore(LOSE_POINTS)
@@ -397,6 +392,11 @@ def readCommand(argv):
             action = 'store', type = int, default = 4,
             help = 'set the maximum number of ghosts (default: %(default)s)')
 
+    parser.add_argument('-j', '--jobs', dest = 'jobs',
+            action = 'store', type = int, default = 1,
+            help = 'play games in parallel using this many processes, '
+                + 'each game gets its own seed derived from --seed (default: %(default)s)')
+
     parser.add_argument('-l', '--layout', dest = 'layout',
             action = 'store', type = str, default = 'mediumClassic',
             help = 'use the specified map layout (default: %(default)s)')
@@ -437,8 +437,12 @@ def readCommand(argv):
     random.seed(seed)
     logging.debug('Seed value: ' + str(seed))
 
+    # Persist derived data (like maze distances) if asked.
+    distanceCalculator.setCacheDir(options.cacheDir)
+
     # Choose a layout.
-    args['layout'] = getLayout(options.layout, maxGhosts = options.numGhosts)
+    args['layout'] = getLayout(options.layout, maxGhosts = options.numGhosts,
+            cacheDir = options.cacheDir)
     if (args['layout'] is None):
         raise ValueError('The layout ' + options.layout + ' cannot be found.')
 
@@ -447,6 +451,16 @@ def readCommand(argv):
     if (noKeyboard and ('KeyboardAgent' in options.pacman)):
         raise ValueError('Keyboard agents require graphics.')
 
+    if (options.jobs < 1):
+        raise ValueError('The number of jobs must be at least one.')
+
+    if (options.jobs > 1):
+        if (not options.nullGraphics or options.gif is not None):
+            raise ValueError('Parallel games (--jobs) require --null-graphics and no --gif.')
+
+        if (options.numTraining > 0):
+            raise ValueError('Parallel games (--jobs) do not share agents, so cannot train.')
+
     agentOpts = parseAgentArgs(options.agentArgs)
     if options.numTraining > 0:
         args['numTraining'] = options.numTraining
@@ -478,17 +492,28 @@ def readCommand(argv):
         args['display'] = PacmanGUIView(fps = options.fps, title = 'Pacman', **viewOptions)
         agentOpts['keyboard'] = args['display'].getKeyboard()
 
+    args['agentNames'] = (options.pacman, options.ghost)
+    args['agentOpts'] = agentOpts
     args['catchExceptions'] = options.catchExceptions
     args['gameToReplay'] = options.replay
+    args['gameToReplayIndex'] = options.replayGame
+    args['gameToReplayStart'] = options.replayStart
     args['ghosts'] = [BaseAgent.loadAgent(options.ghost, i + 1) for i in range(options.numGhosts)]
+    args['jobs'] = options.jobs
     args['numGames'] = options.numGames
     args['pacman'] = BaseAgent.loadAgent(options.pacman, PACMAN_AGENT_INDEX, agentOpts)
     args['record'] = options.record
+    args['stats'] = options.stats
+    args['seed'] = seed
     args['timeout'] = options.timeout
 
     return args
 
-def replayGame(layout, actions, display):
+def replayGame(layout, actions, display, keyframes = None, start = 0):
+    """
+    Replay a recorded game, starting after `start` moves.
+    """
+
     rules = ClassicGameRules()
 
     agents = []
@@ -496,10 +521,13 @@ def replayGame(layout, actions, display):
     agents += [RandomGhost(i + 1) for i in range(layout.getNumGhosts())]
 
     game = rules.newGame(layout, agents[PACMAN_AGENT_INDEX], agents[1:], display)
-    state = game.state
+
+    # Always leave the last move to be played, so the end of the game is processed.
+    start = max(0, min(start, len(actions) - 1))
+    state = replay.seekReplay(game.state, actions, keyframes, start)
     display.initialize(state)
 
-    for action in actions:
+    for action in actions[start:]:
         # Execute the action
         state = state.generateSuccessor(*action)
 
@@ -512,7 +540,34 @@ def replayGame(layout, actions, display):
     display.finish()
 
 def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraining = 0,
-        catchExceptions = False, timeout = 30, **kwargs):
+        catchExceptions = False, timeout = 30, jobs = 1, seed = None,
+        agentNames = None, agentOpts = {}, stats = None, **kwargs):
+    """
+    Play a set of games and log a summary of the results.
+    Each game is seeded with its own seed derived from `seed`
+    (or from the current random state, if `seed` is None),
+    so the same seed plays the same games no matter how many jobs there are.
+    If more than one job is requested, games are played in a pool of worker processes.
+    Each worker rebuilds the agents from `agentNames` (pacman, ghost) and `agentOpts`.
+    Parallel games are not played with the passed in agents and display,
+    and the returned games do not have agents or a display attached.
+    """
+
+    gameSeeds = _getGameSeeds(seed, numGames)
+
+    if (jobs > 1):
+        games = _runParallelGames(layout, len(ghosts), gameSeeds, catchExceptions, timeout,
+                jobs, agentNames, agentOpts)
+
+        # Games only seat as many ghosts as the layout has room for (see ClassicGameRules.newGame).
+        numAgents = min(len(ghosts), layout.getNumGhosts()) + 1
+        for game in games:
+            _recordGame(layout, game, record, numAgents)
+
+        _logSummary(games)
+        _writeStats(games, stats)
+        return games
+
     rules = ClassicGameRules(timeout)
     games = []
 
@@ -530,31 +585,93 @@ def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraini
         else:
             gameDisplay = display
 
+        random.seed(gameSeeds[i])
+
         game = rules.newGame(layout, pacman, ghosts, gameDisplay, catchExceptions)
         game.run()
 
         if (not isTraining):
             games.append(game)
+            _recordGame(layout, game, record, len(game.agents))
+
+    _logSummary(games)
+    _writeStats(games, stats)
+    return games
+
+def _getGameSeeds(seed, numGames):
+    """
+    Get the seed of each game in a run.
+    """
+
+    if (seed is None):
+        seed = random.getrandbits(32)
 
-        if (record):
-            path = 'pacman.replay'
-            if (isinstance(record, str)):
-                path = record
+    seedGenerator = random.Random(seed)
+    return [seedGenerator.getrandbits(32) for i in range(numGames)]
 
-            components = {'layout': layout, 'actions': game.moveHistory}
-            with open(path, 'wb') as file:
-                pickle.dump(components, file)
+def _logSummary(games):
+    if (len(games) == 0):
+        return
 
-    if ((numGames - numTraining) > 0):
-        scores = [game.state.getScore() for game in games]
-        wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True) / float(len(wins))
-        logging.info('Average Score: %s', sum(scores) / float(len(scores)))
-        logging.info('Scores:        %s', ', '.join([str(score) for score in scores]))
-        logging.info('Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate))
-        logging.info('Record:        %s', ', '.join([['Loss', 'Win'][int(w)] for w in wins]))
+    scores = [game.state.getScore() for game in games]
+    wins = [game.state.isWin() for game in games]
+    winRate = wins.count(True) / float(len(wins))
+    logging.info('Average Score: %s', sum(scores) / float(len(scores)))
+    logging.info('Scores:        %s', ', '.join([str(score) for score in scores]))
+    logging.info('Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate))
+    logging.info('Record:        %s', ', '.join([['Loss', 'Win'][int(w)] for w in wins]))
 
-    return games
+def _playSeededGame(layout, numGhosts, catchExceptions, timeout, agentNames, agentOpts, seed):
+    """
+    Play a single game in a worker process.
+    """
+
+    pacmanName, ghostName = agentNames
+    pacman = BaseAgent.loadAgent(pacmanName, PACMAN_AGENT_INDEX, agentOpts)
+    ghosts = [BaseAgent.loadAgent(ghostName, i + 1) for i in range(numGhosts)]
+
+    # Seed just before the game (like runGames() does), so the agents are created the same way.
+    random.seed(seed)
+
+    rules = ClassicGameRules(timeout)
+    game = rules.newGame(layout, pacman, ghosts, PacmanNullView(), catchExceptions)
+    game.run()
+
+    # Agents and views may hold things that cannot be pickled (and are not needed for a summary).
+    # Note that state hashes are only meaningful in the process that built them.
+    game.agents = None
+    game.display = None
+
+    return game
+
+def _runParallelGames(layout, numGhosts, gameSeeds, catchExceptions, timeout,
+        jobs, agentNames, agentOpts):
+    # Every game gets its own seed, so results do not depend on which worker plays which game.
+    logging.info('Playing %d games using %d jobs.' % (len(gameSeeds), jobs))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers = jobs) as executor:
+        futures = [executor.submit(_playSeededGame, layout, numGhosts, catchExceptions, timeout,
+                agentNames, agentOpts, gameSeed) for gameSeed in gameSeeds]
+
+        return [future.result() for future in futures]
+
+def _recordGame(layout, game, record, numAgents):
+    if (not record):
+        return
+
+    path = 'pacman.replay'
+    if (isinstance(record, str)):
+        path = record
+
+    keyframes = replay.buildKeyframes(PacmanGameState(layout), game.moveHistory)
+    replay.appendReplay(path, layout, game.moveHistory, numAgents, keyframes)
+
+def _writeStats(games, path):
+    if (path is None):
+        return
+
+    gamestats.writeStats(path, games)
+    logging.info("Game stats written to: '%s'." % (path))
 
 def main(argv):
     """
@@ -571,12 +688,12 @@ def main(argv):
     if (args['gameToReplay'] is not None):
         logging.info('Replaying recorded game %s.' % args['gameToReplay'])
 
-        recorded = None
-        with open(args['gameToReplay'], 'rb') as file:
-            recorded = pickle.load(file)
+        for (i, recorded) in enumerate(replay.readReplays(args['gameToReplay'])):
+            if (args['gameToReplayIndex'] is not None and i != args['gameToReplayIndex']):
+                continue
 
-        recorded['display'] = args['display']
-        replayGame(**recorded)
+            recorded['display'] = args['display']
+            replayGame(start = args['gameToReplayStart'], **recorded)
 
         return
 
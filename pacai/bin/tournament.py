@@ -0,0 +1,450 @@
+"""
+A round-robin tournament between capture teams.
+
+Every pair of teams plays on every layout, once as each color, for a number of repetitions.
+Games are played in a pool of worker processes and results are streamed into a SQLite database,
+along with Elo ratings and win rates for each team.
+The tournament seed is saved in the database too,
+so a tournament can be resumed (even with RANDOM layouts) without passing its seed again.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import logging
+import os
+import random
+import sqlite3
+import sys
+import textwrap
+import time
+
+from pacai.agents import remote
+from pacai.bin import capture
+from pacai.bin.arguments import addCacheDirArgument
+from pacai.bin.arguments import addLoggingArguments
+from pacai.bin.arguments import addRecordArgument
+from pacai.bin.arguments import addSeedArgument
+from pacai.core import distanceCalculator
+from pacai.core import replay
+from pacai.ui.capture.null import CaptureNullView
+from pacai.util.logs import initLogging
+from pacai.util.logs import updateLoggingLevel
+
+DEFAULT_DATABASE = 'tournament.sqlite'
+
+INITIAL_ELO = 1500.0
+ELO_K_FACTOR = 32.0
+
+# Layouts loaded by this process.
+# Workers play many games, so each layout is only loaded (and its distances computed) once.
+_layouts = {}
+_cacheDir = None
+
+Match = collections.namedtuple('Match', ['red', 'blue', 'layout', 'repetition', 'seed'])
+
+def computeRatings(connection):
+    """
+    Rebuild the ratings table from all the games in the database.
+    Elo ratings depend on the order games are processed in,
+    so games are processed in a fixed order (not the order they finished in).
+    """
+
+    elo = collections.defaultdict(lambda: INITIAL_ELO)
+    records = collections.defaultdict(lambda: [0, 0, 0])
+
+    rows = connection.execute('''
+        SELECT red, blue, score
+        FROM games
+        ORDER BY repetition, layout, red, blue
+    ''')
+
+    for (red, blue, score) in rows:
+        # The result for red: 1 for a win, 0.5 for a tie, and 0 for a loss.
+        result = 0.5
+        if (score > 0):
+            result = 1.0
+        elif (score < 0):
+            result = 0.0
+
+        expected = 1.0 / (1.0 + 10.0 ** ((elo[blue] - elo[red]) / 400.0))
+        delta = ELO_K_FACTOR * (result - expected)
+
+        elo[red] += delta
+        elo[blue] -= delta
+
+        for (team, teamResult) in ((red, result), (blue, 1.0 - result)):
+            if (teamResult == 1.0):
+                records[team][0] += 1
+            elif (teamResult == 0.0):
+                records[team][1] += 1
+            else:
+                records[team][2] += 1
+
+    ratings = []
+    for team in records:
+        wins, losses, ties = records[team]
+        games = wins + losses + ties
+        ratings.append((team, elo[team], games, wins, losses, ties, wins / float(games)))
+
+    ratings.sort(key = lambda rating: rating[1], reverse = True)
+
+    with connection:
+        connection.execute('DELETE FROM ratings')
+        connection.executemany('INSERT INTO ratings VALUES (?, ?, ?, ?, ?, ?, ?)', ratings)
+
+    return ratings
+
+def openDatabase(path):
+    connection = sqlite3.connect(path)
+
+    with connection:
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS games (
+                red TEXT NOT NULL,
+                blue TEXT NOT NULL,
+                layout TEXT NOT NULL,
+                repetition INTEGER NOT NULL,
+                seed INTEGER NOT NULL,
+                score INTEGER NOT NULL,
+                winner TEXT NOT NULL,
+                crashed INTEGER NOT NULL,
+                moves INTEGER NOT NULL,
+                seconds REAL NOT NULL,
+                UNIQUE (red, blue, layout, repetition)
+            )
+        ''')
+
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS ratings (
+                team TEXT PRIMARY KEY,
+                elo REAL NOT NULL,
+                games INTEGER NOT NULL,
+                wins INTEGER NOT NULL,
+                losses INTEGER NOT NULL,
+                ties INTEGER NOT NULL,
+                winRate REAL NOT NULL
+            )
+        ''')
+
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS settings (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
+
+    return connection
+
+def playMatch(match, length, timeLimits, agentProcesses = None):
+    """
+    Play a single game.
+    If `agentProcesses` is given, agents are run in their own processes
+    (see `pacai.bin.capture.loadRemoteAgents`), and are stopped when they go past the move timeout.
+    Returns a row for the games table, the game's move history, and the names of its agents.
+    A team that cannot be created forfeits, and the game is not played (there are no moves).
+    """
+
+    random.seed(match.seed)
+
+    layout = _getLayout(match.layout)
+    startTime = time.time()
+
+    # A team that cannot even be created forfeits the game (like a team that crashes in it).
+    teams = {}
+    for (isRed, team) in ((True, match.red), (False, match.blue)):
+        try:
+            if (agentProcesses is None):
+                teams[isRed] = capture.loadAgents(isRed, team, True, {})
+            else:
+                teams[isRed] = capture.loadRemoteAgents(isRed, team, {}, agentProcesses)
+        except Exception as ex:
+            logging.warning('Could not create team %s.' % (team), exc_info = ex)
+
+    if (len(teams) < 2):
+        for agents in teams.values():
+            remote.closeAgents(agents)
+
+        # See CaptureRules.agentCrash().
+        score = 0
+        if (True not in teams and False in teams):
+            score = -1
+        elif (False not in teams and True in teams):
+            score = 1
+
+        row = (match.red, match.blue, match.layout, match.repetition, match.seed,
+                score, _getWinner(score), 1, 0, time.time() - startTime)
+
+        return row, [], []
+
+    agents = sum([list(el) for el in zip(teams[True], teams[False])], [])
+
+    # Tournaments always catch exceptions, so a broken team loses instead of ending the tournament.
+    game = capture.CaptureRules().newGame(layout, agents, CaptureNullView(), length, True,
+            **timeLimits)
+    try:
+        game.run()
+    finally:
+        remote.closeAgents(agents)
+
+    score = game.state.getScore()
+    crashed = (game.agentCrashed or game.agentTimeout)
+
+    row = (match.red, match.blue, match.layout, match.repetition, match.seed,
+            score, _getWinner(score), int(crashed), len(game.moveHistory),
+            time.time() - startTime)
+
+    return row, game.moveHistory, [agent.__class__.__name__ for agent in agents]
+
+def runTournament(teams, layouts, repetitions = 1, jobs = 1, database = DEFAULT_DATABASE,
+        seed = None, length = capture.DEFAULT_MAX_MOVES, cacheDir = None, record = None,
+        agentProcesses = None, workerLoggingLevel = logging.WARNING, **timeLimits):
+    """
+    Play every scheduled game that is not already in the database and update the ratings.
+    The seed is saved in the database the first time it is used,
+    later runs without a seed use the saved one (and a different seed is an error).
+    If `record` is given, every game is also added to that replay archive.
+    If `agentProcesses` is given, agents are run in their own processes (see `playMatch`).
+    Returns the ratings, best first.
+    """
+
+    if (len(set(teams)) < 2):
+        raise ValueError('A tournament needs at least two different teams.')
+
+    connection = openDatabase(database)
+    try:
+        seed = _getSeed(connection, seed)
+        logging.debug('Seed value: ' + str(seed))
+
+        played = {tuple(row) for row in
+                connection.execute('SELECT red, blue, layout, repetition FROM games')}
+
+        matches = [match for match in scheduleMatches(teams, layouts, repetitions, seed)
+                if (match[0:4] not in played)]
+
+        logging.info('Playing %d games (%d already played) using %d jobs.' % (
+                len(matches), len(played), jobs))
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers = jobs,
+                initializer = _initWorker, initargs = (cacheDir, workerLoggingLevel)) as executor:
+            futures = [executor.submit(playMatch, match, length, timeLimits, agentProcesses)
+                    for match in matches]
+
+            for (count, future) in enumerate(concurrent.futures.as_completed(futures)):
+                row, moveHistory, agentNames = future.result()
+
+                # Commit every game, so an interrupted tournament can pick up where it left off.
+                with connection:
+                    connection.execute('INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            row)
+
+                # Forfeited games were never played, so there is nothing to replay.
+                if (record is not None and len(agentNames) > 0):
+                    layout = _getLayout(row[2])
+                    keyframes = replay.buildKeyframes(capture.CaptureGameState(layout, length),
+                            moveHistory)
+
+                    replay.appendReplay(record, layout, moveHistory, len(agentNames), keyframes,
+                            agents = agentNames,
+                            length = length,
+                            redTeamName = row[0],
+                            blueTeamName = row[1])
+
+                logging.info('Game %d/%d: %s (red) vs %s (blue) on %s: %s.' % (
+                        count + 1, len(matches), row[0], row[1], row[2], row[6]))
+
+        return computeRatings(connection)
+    finally:
+        connection.close()
+
+def scheduleMatches(teams, layouts, repetitions, seed = None):
+    """
+    Get every game in a round robin: each pair of teams, on each layout, as each color,
+    for each repetition.
+    Each game gets its own seed (derived from the tournament seed),
+    and a RANDOM layout is replaced with a RANDOM<seed> layout for each repetition.
+    """
+
+    rng = random.Random(seed)
+    matches = []
+
+    for repetition in range(repetitions):
+        for layout in layouts:
+            if (layout == 'RANDOM'):
+                layout = 'RANDOM%d' % (rng.randint(0, 2**32))
+
+            for (first, second) in itertools.combinations(sorted(set(teams)), 2):
+                for (red, blue) in ((first, second), (second, first)):
+                    matches.append(Match(red, blue, layout, repetition, rng.getrandbits(32)))
+
+    return matches
+
+def _getLayout(name):
+    layout = _layouts.get(name)
+    if (layout is None):
+        layout = capture.loadLayout(name, _cacheDir)
+        _layouts[name] = layout
+
+    return layout
+
+def _getSeed(connection, seed):
+    """
+    Get the seed for the tournament in this database, saving it if it is new.
+    The schedule (including which RANDOM layouts are played) comes from this seed,
+    so resuming with any other seed would play different games.
+    """
+
+    row = connection.execute("SELECT value FROM settings WHERE name = 'seed'").fetchone()
+    if (row is not None):
+        if (seed is not None and seed != int(row[0])):
+            raise ValueError('This tournament was started with seed %s, not %d.' % (row[0], seed))
+
+        return int(row[0])
+
+    if (seed is None):
+        if (connection.execute('SELECT COUNT(*) FROM games').fetchone()[0] > 0):
+            raise ValueError('This tournament has no saved seed, '
+                    + 'resume it with the seed it was started with.')
+
+        seed = random.randint(0, 2**32)
+
+    with connection:
+        connection.execute("INSERT INTO settings VALUES ('seed', ?)", (str(seed),))
+
+    return seed
+
+def _getWinner(score):
+    if (score > 0):
+        return 'red'
+    elif (score < 0):
+        return 'blue'
+
+    return 'tie'
+
+def _initWorker(cacheDir, loggingLevel):
+    global _cacheDir
+    _cacheDir = cacheDir
+
+    distanceCalculator.setCacheDir(cacheDir)
+    updateLoggingLevel(loggingLevel)
+
+def readCommand(argv):
+    """
+    Processes the command used to run a tournament from the command line.
+    """
+
+    description = """
+    DESCRIPTION:
+        This program will run a round-robin tournament between capture teams.
+        Results are saved in a SQLite database, and running the same tournament again
+        will only play the games that are missing from the database.
+        The seed is saved in the database as well, so a tournament (even one with RANDOM layouts)
+        can be resumed without giving its seed again.
+
+    EXAMPLES:
+        (1) python -m pacai.bin.tournament --teams pacai.core.baselineTeam pacai.student.myTeam
+          - Plays the baseline team against pacai.student.myTeam on the default layout.
+        (2) python -m pacai.bin.tournament --teams teamA teamB teamC \\
+                --layouts defaultCapture RANDOM RANDOM23 --repetitions 5 --jobs 8
+          - Plays every pair of teams on three layouts (a new random one for each repetition),
+            five times, using eight processes.
+    """
+
+    parser = argparse.ArgumentParser(description = textwrap.dedent(description),
+        prog = os.path.basename(__file__), formatter_class = argparse.RawTextHelpFormatter)
+
+    # Options that mean the same thing as they do for a single game.
+    addLoggingArguments(parser)
+    addCacheDirArgument(parser)
+    addRecordArgument(parser)
+    capture.addGameLimitArguments(parser)
+
+    parser.add_argument('-j', '--jobs', dest = 'jobs',
+            action = 'store', type = int, default = os.cpu_count(),
+            help = 'play games using this many processes (default: %(default)s)')
+
+    parser.add_argument('-l', '--layouts', dest = 'layouts',
+            action = 'store', type = str, nargs = '+', default = ['defaultCapture'],
+            help = 'play on each of these layouts, RANDOM<seed> may be used for a random seeded '
+                + 'map (i.e. RANDOM23) (default: %(default)s)')
+
+    parser.add_argument('-n', '--repetitions', dest = 'repetitions',
+            action = 'store', type = int, default = 1,
+            help = 'play each pairing this many times per layout and color (default: %(default)s)')
+
+    parser.add_argument('-o', '--database', dest = 'database',
+            action = 'store', type = str, default = DEFAULT_DATABASE,
+            help = 'save results to this SQLite database (default: %(default)s)')
+
+    addSeedArgument(parser, help = 'seed used to derive the seed of every game, '
+            + 'a random seed is used for a new database and the saved seed when resuming '
+            + '(default: %(default)s)')
+
+    parser.add_argument('-t', '--teams', dest = 'teams',
+            action = 'store', type = str, nargs = '+', required = True,
+            help = 'the modules of the teams (that provide createTeam) to play')
+
+    parser.add_argument('--agent-processes', dest = 'agentProcesses',
+            action = 'store', type = str, default = None, choices = capture.AGENT_PROCESS_MODES,
+            help = 'run each agent or each team in its own process, '
+                + 'so agents that go past the move timeout can be stopped (default: %(default)s)')
+
+    options, otherjunk = parser.parse_known_args(argv)
+
+    if len(otherjunk) != 0:
+        raise ValueError('Unrecognized options: \'%s\'.' % (str(otherjunk)))
+
+    # Set the logging level.
+    if options.quiet and options.debug:
+        raise ValueError('Logging cannont be set to both debug and quiet.')
+
+    # Individual games are only logged when debugging.
+    workerLoggingLevel = logging.WARNING
+    if options.quiet:
+        updateLoggingLevel(logging.WARNING)
+    elif options.debug:
+        updateLoggingLevel(logging.DEBUG)
+        workerLoggingLevel = logging.DEBUG
+
+    if (options.jobs < 1):
+        raise ValueError('The number of jobs must be at least one.')
+
+    if (options.repetitions < 1):
+        raise ValueError('The number of repetitions must be at least one.')
+
+    for layout in options.layouts:
+        if (not layout.startswith('RANDOM') and layout.lower().find('capture') == -1):
+            raise ValueError('You must use capture layouts in a tournament.')
+
+    # Without a seed, runTournament() uses the database's seed (or picks a new one).
+    args = vars(options)
+    args['length'] = args.pop('maxMoves')
+    args['workerLoggingLevel'] = workerLoggingLevel
+
+    del args['debug']
+    del args['quiet']
+
+    return args
+
+def main(argv):
+    """
+    Entry point for a capture tournament.
+    The args are a blind pass of `sys.argv` with the executable stripped.
+    """
+
+    initLogging()
+
+    args = readCommand(argv)
+    ratings = runTournament(**args)
+
+    logging.info('%-40s %8s %6s %6s %6s %6s %8s' % (
+            'Team', 'Elo', 'Games', 'Wins', 'Losses', 'Ties', 'Win Rate'))
+    for (team, elo, games, wins, losses, ties, winRate) in ratings:
+        logging.info('%-40s %8.1f %6d %6d %6d %6d %8.2f' % (
+                team, elo, games, wins, losses, ties, winRate))
+
+    return ratings
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -9,13 +9,18 @@ class AgentState:
     The convention for positions, like a graph, is that (0, 0) is the lower left corner,
     x increases horizontally and y increases vertically.
     Therefore, north is the direction of increasing y, or (0, 1).
+
+    Many agent states are alive at once (search trees, observation histories),
+    so they use slots instead of a per-instance dict.
     """
 
+    __slots__ = ('_start', '_position', '_direction', '_isPacman', '_scaredTimer', '_hash',
+            '_respawned')
+
     def __init__(self, position, direction, isPacman):
-        # Save the starting information for later use.
-        self._startPosition = position
-        self._startDirection = direction
-        self._startIsPacman = isPacman
+        # Save the starting information (position, direction, isPacman) for later use.
+        # This never changes, so copies can all share the same tuple.
+        self._start = (position, direction, isPacman)
 
         self._position = position
         self._direction = direction
@@ -23,18 +28,34 @@ class AgentState:
         self._isPacman = isPacman
         self._scaredTimer = 0
 
+        # If respawn() was called on this copy of the agent.
+        # Since game states copy an agent state before changing it,
+        # this tells if the agent was killed by the move that made a state (see wasRespawned()).
+        self._respawned = False
+
+        # A Zobrist hash of the fields used in equality.
+        # Every mutation XORs its change into the hash, so it never needs to be rebuilt.
+        self._hash = (util.zobristKey('position', position)
+                ^ util.zobristKey('direction', direction)
+                ^ util.zobristKey('isPacman', isPacman)
+                ^ util.zobristKey('scaredTimer', 0))
+
     def copy(self):
-        state = AgentState(self._startPosition, self._startDirection, self._startIsPacman)
+        # Skip the constructor, every field is about to be overwritten.
+        state = AgentState.__new__(AgentState)
 
+        state._start = self._start
         state._isPacman = self._isPacman
         state._position = self._position
         state._direction = self._direction
         state._scaredTimer = self._scaredTimer
+        state._hash = self._hash
+        state._respawned = False
 
         return state
 
     def decrementScaredTimer(self):
-        self._scaredTimer = max(0, self._scaredTimer - 1)
+        self._setScaredTimer(max(0, self._scaredTimer - 1))
 
     def getDirection(self):
         return self._direction
@@ -53,10 +74,10 @@ class AgentState:
         A ghost that is not scared.
         """
 
-        return (self.isGhost() and not self.isScared())
+        return (not self._isPacman and self._scaredTimer <= 0)
 
     def isGhost(self):
-        return not self.isPacman()
+        return not self._isPacman
 
     def isPacman(self):
         return self._isPacman
@@ -65,30 +86,42 @@ class AgentState:
         return (self._scaredTimer > 0)
 
     def isScaredGhost(self):
-        return (self.isGhost() and self.isScared())
+        return (not self._isPacman and self._scaredTimer > 0)
+
+    def setDirection(self, direction):
+        self._setDirection(direction)
 
     def setIsPacman(self, isPacman):
+        self._hash ^= (util.zobristKey('isPacman', self._isPacman)
+                ^ util.zobristKey('isPacman', isPacman))
         self._isPacman = isPacman
 
+    def setPosition(self, position):
+        self._setPosition(position)
+
     def setScaredTimer(self, timer):
-        self._scaredTimer = timer
+        self._setScaredTimer(timer)
 
     def snapToNearestPoint(self):
         """
         Move the agent to the nearest point to its current location.
         """
 
-        self._position = util.nearestPoint(self._position)
+        self._setPosition(util.nearestPoint(self._position))
 
     def respawn(self):
         """
         This agent was killed, respawn it at the start as a pacman.
         """
 
-        self._position = self._startPosition
-        self._direction = self._startDirection
-        self._isPacman = self._startIsPacman
-        self._scaredTimer = 0
+        startPosition, startDirection, startIsPacman = self._start
+
+        self._setPosition(startPosition)
+        self._setDirection(startDirection)
+        self.setIsPacman(startIsPacman)
+        self._setScaredTimer(0)
+
+        self._respawned = True
 
     def updatePosition(self, vector):
         """
@@ -98,24 +131,52 @@ class AgentState:
         x, y = self._position
         dx, dy = vector
 
-        self._position = (x + dx, y + dy)
+        self._setPosition((x + dx, y + dy))
 
         direction = Actions.vectorToDirection(vector)
         if (direction != Directions.STOP):
             # If this is a zero vector, face the same direction as before.
-            self._direction = direction
+            self._setDirection(direction)
+
+    def wasRespawned(self):
+        """
+        If this copy of the agent was respawned.
+        Since game states share unchanged agent states with their parent,
+        this is only meaningful for agent states that a successor copied
+        (see `pacai.core.gamestate.AbstractGameState.getDelta`).
+        """
+
+        return self._respawned
+
+    def _setDirection(self, direction):
+        self._hash ^= (util.zobristKey('direction', self._direction)
+                ^ util.zobristKey('direction', direction))
+        self._direction = direction
+
+    def _setPosition(self, position):
+        self._hash ^= (util.zobristKey('position', self._position)
+                ^ util.zobristKey('position', position))
+        self._position = position
+
+    def _setScaredTimer(self, timer):
+        self._hash ^= (util.zobristKey('scaredTimer', self._scaredTimer)
+                ^ util.zobristKey('scaredTimer', timer))
+        self._scaredTimer = timer
 
     def __eq__(self, other):
         if (other is None):
             return False
 
+        if (self is other):
+            return True
+
         return (self._position == other._position
                 and self._direction == other._direction
                 and self._isPacman == other._isPacman
                 and self._scaredTimer == other._scaredTimer)
 
     def __hash__(self):
-        return util.buildHash(self._position, self._direction, self._isPacman, self._scaredTimer)
+        return self._hash
 
     def __str__(self):
         typeString = 'Ghost'
@@ -0,0 +1,319 @@
+"""
+Many games played in lockstep, for when a lot of games are needed quickly (e.g. training data).
+"""
+
+from pacai.bin.pacman import BOARD_CLEAR_POINTS
+from pacai.bin.pacman import COLLISION_TOLERANCE
+from pacai.bin.pacman import FOOD_POINTS
+from pacai.bin.pacman import GHOST_POINTS
+from pacai.bin.pacman import GhostRules
+from pacai.bin.pacman import LOSE_POINTS
+from pacai.bin.pacman import PACMAN_AGENT_INDEX
+from pacai.bin.pacman import PacmanGameState
+from pacai.bin.pacman import PacmanRules
+from pacai.bin.pacman import SCARED_TIME
+from pacai.bin.pacman import TIME_PENALTY
+from pacai.core.actions import Actions
+from pacai.core.directions import Directions
+from pacai.util.util import nearestPoint
+
+class PacmanBatch(object):
+    """
+    Many classic pacman games on the same layout, played in lockstep.
+
+    Instead of a state object per game, the batch keeps each piece of the game
+    (agent positions, directions, scared timers, food, capsules, scores)
+    in its own array with an entry per game.
+    A single call to step() then applies one action for the same agent in every game,
+    in one pass over those arrays.
+    The games are still updated one after another in plain Python,
+    what the batch saves is the state copies, hashing, agents, displays, and timeouts
+    that come with playing each game through `pacai.core.game.Game`.
+
+    The rules are the same as `PacmanGameState.generateSuccessor`,
+    and getGameState() can rebuild a normal game state for any game in the batch.
+    Games that are over ignore their actions until they are reset.
+    """
+
+    def __init__(self, layout, numGames):
+        self._layout = layout
+        self._numGames = numGames
+        self._numAgents = len(layout.agentPositions)
+
+        self._startPositions = [position for (isPacman, position) in layout.agentPositions]
+        self._startFood = layout.food.getBits()
+        self._startNumFood = layout.food.count()
+
+        # {(action, speed): (dx, dy)}, see Actions.directionToVector().
+        self._vectors = {}
+        for action in Directions.CARDINAL + [Directions.STOP]:
+            for speed in (PacmanRules.PACMAN_SPEED, GhostRules.GHOST_SPEED,
+                    GhostRules.GHOST_SPEED / 2.0):
+                self._vectors[(action, speed)] = Actions.directionToVector(action, speed)
+
+        # Indexed by [agentIndex][gameIndex].
+        self._x = [[0] * numGames for i in range(self._numAgents)]
+        self._y = [[0] * numGames for i in range(self._numAgents)]
+        self._directions = [[Directions.STOP] * numGames for i in range(self._numAgents)]
+        self._scaredTimers = [[0] * numGames for i in range(self._numAgents)]
+
+        # Indexed by [gameIndex].
+        self._food = [0] * numGames
+        self._numFood = [0] * numGames
+        self._capsules = [None] * numGames
+        self._scores = [0] * numGames
+        self._gameovers = [False] * numGames
+        self._wins = [False] * numGames
+        self._lastAgentMoved = [None] * numGames
+
+        self.reset()
+
+    def getGameState(self, gameIndex):
+        """
+        Build a `PacmanGameState` that matches a game in the batch.
+        """
+
+        agents = []
+        for agentIndex in range(self._numAgents):
+            position = [self._x[agentIndex][gameIndex], self._y[agentIndex][gameIndex]]
+            agents.append([position, self._directions[agentIndex][gameIndex],
+                    agentIndex == PACMAN_AGENT_INDEX, self._scaredTimers[agentIndex][gameIndex]])
+
+        snapshot = {
+            'agents': agents,
+            'capsules': [list(capsule) for capsule in self._capsules[gameIndex]],
+            'food': '%x' % (self._food[gameIndex]),
+            'gameover': self._gameovers[gameIndex],
+            'lastAgentMoved': self._lastAgentMoved[gameIndex],
+            'score': self._scores[gameIndex],
+            'win': self._wins[gameIndex],
+        }
+
+        state = PacmanGameState(self._layout)
+        state.loadSnapshot(snapshot)
+
+        return state
+
+    def getLegalActions(self, agentIndex):
+        """
+        Get the legal actions for an agent in every game.
+        Games that are over have no legal actions.
+        """
+
+        getActions = self._getActionsFunction(agentIndex)
+
+        xs = self._x[agentIndex]
+        ys = self._y[agentIndex]
+        directions = self._directions[agentIndex]
+
+        return [[] if gameover else getActions((x, y), direction)
+                for (x, y, direction, gameover) in zip(xs, ys, directions, self._gameovers)]
+
+    def getNumAgents(self):
+        return self._numAgents
+
+    def getNumGames(self):
+        return self._numGames
+
+    def getScores(self):
+        """
+        The caller should not modify the returned list.
+        """
+
+        return self._scores
+
+    def isOver(self):
+        """
+        Get if each game is over.
+        The caller should not modify the returned list.
+        """
+
+        return self._gameovers
+
+    def isWin(self):
+        """
+        Get if each game has been won.
+        The caller should not modify the returned list.
+        """
+
+        return self._wins
+
+    def reset(self, gameIndexes = None):
+        """
+        Start the given games (all games by default) over from the start of the layout.
+        """
+
+        if (gameIndexes is None):
+            gameIndexes = range(self._numGames)
+
+        for gameIndex in gameIndexes:
+            for agentIndex in range(self._numAgents):
+                self._respawn(agentIndex, gameIndex)
+
+            self._food[gameIndex] = self._startFood
+            self._numFood[gameIndex] = self._startNumFood
+            self._capsules[gameIndex] = list(self._layout.capsules)
+            self._scores[gameIndex] = 0
+            self._gameovers[gameIndex] = False
+            self._wins[gameIndex] = False
+            self._lastAgentMoved[gameIndex] = None
+
+    def step(self, agentIndex, actions):
+        """
+        Apply an action (one per game) for an agent in every game that is not over.
+        """
+
+        if (len(actions) != self._numGames):
+            raise ValueError('Expected %d actions, got %d.' % (self._numGames, len(actions)))
+
+        getActions = self._getActionsFunction(agentIndex)
+        xs = self._x[agentIndex]
+        ys = self._y[agentIndex]
+        directions = self._directions[agentIndex]
+
+        gameIndexes = []
+        for gameIndex in range(self._numGames):
+            if (self._gameovers[gameIndex]):
+                continue
+
+            action = actions[gameIndex]
+            position = (xs[gameIndex], ys[gameIndex])
+            if (action not in getActions(position, directions[gameIndex])):
+                raise ValueError('Illegal action in game %d: %s' % (gameIndex, str(action)))
+
+            gameIndexes.append(gameIndex)
+
+        if (agentIndex == PACMAN_AGENT_INDEX):
+            self._stepPacman(gameIndexes, actions)
+        else:
+            self._stepGhost(agentIndex, gameIndexes, actions)
+
+        for gameIndex in gameIndexes:
+            self._lastAgentMoved[gameIndex] = agentIndex
+
+    def _checkDeaths(self, ghostIndex, gameIndexes):
+        """
+        See `GhostRules.checkDeath` and `GhostRules.collide`.
+        """
+
+        pacmanXs = self._x[PACMAN_AGENT_INDEX]
+        pacmanYs = self._y[PACMAN_AGENT_INDEX]
+        ghostXs = self._x[ghostIndex]
+        ghostYs = self._y[ghostIndex]
+        scaredTimers = self._scaredTimers[ghostIndex]
+
+        for gameIndex in gameIndexes:
+            distance = (abs(ghostXs[gameIndex] - pacmanXs[gameIndex])
+                    + abs(ghostYs[gameIndex] - pacmanYs[gameIndex]))
+
+            if (distance > COLLISION_TOLERANCE):
+                continue
+
+            if (scaredTimers[gameIndex] > 0):
+                # Pacman ate a ghost.
+                self._scores[gameIndex] += GHOST_POINTS
+                self._respawn(ghostIndex, gameIndex)
+            elif (not self._gameovers[gameIndex]):
+                # A ghost ate pacman.
+                self._scores[gameIndex] += LOSE_POINTS
+                self._gameovers[gameIndex] = True
+                self._wins[gameIndex] = False
+
+    def _getActionsFunction(self, agentIndex):
+        if (agentIndex == PACMAN_AGENT_INDEX):
+            return self._layout.getPossibleActions
+
+        return self._layout.getGhostActions
+
+    def _respawn(self, agentIndex, gameIndex):
+        x, y = self._startPositions[agentIndex]
+
+        self._x[agentIndex][gameIndex] = x
+        self._y[agentIndex][gameIndex] = y
+        self._directions[agentIndex][gameIndex] = Directions.STOP
+        self._scaredTimers[agentIndex][gameIndex] = 0
+
+    def _stepGhost(self, agentIndex, gameIndexes, actions):
+        """
+        See `GhostRules.applyAction` and `GhostRules.decrementTimer`.
+        """
+
+        xs = self._x[agentIndex]
+        ys = self._y[agentIndex]
+        directions = self._directions[agentIndex]
+        scaredTimers = self._scaredTimers[agentIndex]
+        vectors = self._vectors
+
+        for gameIndex in gameIndexes:
+            action = actions[gameIndex]
+            scaredTimer = scaredTimers[gameIndex]
+
+            speed = GhostRules.GHOST_SPEED
+            if (scaredTimer > 0):
+                speed /= 2.0
+
+            dx, dy = vectors[(action, speed)]
+            xs[gameIndex] += dx
+            ys[gameIndex] += dy
+
+            if (action != Directions.STOP):
+                directions[gameIndex] = action
+
+            if (scaredTimer > 0):
+                scaredTimer -= 1
+                scaredTimers[gameIndex] = scaredTimer
+
+                if (scaredTimer == 0):
+                    # Done being scared, snap to the closest point.
+                    xs[gameIndex], ys[gameIndex] = nearestPoint((xs[gameIndex], ys[gameIndex]))
+
+        self._checkDeaths(agentIndex, gameIndexes)
+
+    def _stepPacman(self, gameIndexes, actions):
+        """
+        See `PacmanRules.applyAction` and `PacmanRules.consume`.
+        """
+
+        xs = self._x[PACMAN_AGENT_INDEX]
+        ys = self._y[PACMAN_AGENT_INDEX]
+        directions = self._directions[PACMAN_AGENT_INDEX]
+        food = self._food
+        scores = self._scores
+        vectors = self._vectors
+        height = self._layout.height
+
+        for gameIndex in gameIndexes:
+            action = actions[gameIndex]
+
+            dx, dy = vectors[(action, PacmanRules.PACMAN_SPEED)]
+            x = xs[gameIndex] + dx
+            y = ys[gameIndex] + dy
+            xs[gameIndex] = x
+            ys[gameIndex] = y
+
+            if (action != Directions.STOP):
+                directions[gameIndex] = action
+
+            # Pacman always moves a full square, so it is always on a grid point.
+            bit = 1 << (int(x) * height + int(y))
+
+            if (food[gameIndex] & bit):
+                food[gameIndex] ^= bit
+                self._numFood[gameIndex] -= 1
+                scores[gameIndex] += FOOD_POINTS
+
+                if (self._numFood[gameIndex] == 0 and not self._gameovers[gameIndex]):
+                    scores[gameIndex] += BOARD_CLEAR_POINTS
+                    self._gameovers[gameIndex] = True
+                    self._wins[gameIndex] = True
+            elif ((x, y) in self._capsules[gameIndex]):
+                self._capsules[gameIndex].remove((x, y))
+
+                for ghostIndex in range(1, self._numAgents):
+                    self._scaredTimers[ghostIndex][gameIndex] = SCARED_TIME
+
+            # Penalty for waiting around.
+            scores[gameIndex] -= TIME_PENALTY
+
+        for ghostIndex in range(1, self._numAgents):
+            self._checkDeaths(ghostIndex, gameIndexes)
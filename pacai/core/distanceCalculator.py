@@ -1,10 +1,30 @@
+import array
+import collections
+import hashlib
+import heapq
+import logging
+import mmap
+import os
 import sys
 
 from pacai.core.distance import manhattan
-from pacai.util import priorityQueue
 
 DEFAULT_DISTANCE = 10000
 
+# Distances are stored as unsigned shorts, the max value marks unreachable pairs.
+DISTANCE_TYPECODE = 'H'
+UNREACHABLE = 0xFFFF
+
+# The default number of rows kept by a lazy Distancer.
+DEFAULT_MAX_LAZY_ROWS = 64
+
+# Bump this whenever the on-disk format (or node ordering) changes.
+DISTANCE_FILE_VERSION = 1
+DISTANCE_CACHE_DIRNAME = 'distances'
+
+# Where distance tables are persisted across runs, None to only keep them in memory.
+_cacheDir = None
+
 class Distancer(object):
     """
     A class for computing and caching the shortest path between any two points in a given maze.
@@ -14,21 +34,49 @@ class Distancer(object):
     distancer = Distancer(gameState.getInitialLayout())
     distancer.getDistance((1, 1), (10, 10))
     ```
+
+    A lazy distancer does not compute all the distances up front.
+    Instead, the distances from a position are computed the first time they are asked for,
+    and only the most recently used maxLazyRows sets of distances are kept.
+    This is a good choice when only distances from a few positions are ever needed.
     """
 
-    def __init__(self, layout):
+    def __init__(self, layout, lazy = False, maxLazyRows = DEFAULT_MAX_LAZY_ROWS):
         self._distances = None
+        self._numNodes = layout.getNumNodes()
         self.dc = DistanceCalculator(layout, self)
 
+        self._lazy = lazy
+        self._maxLazyRows = max(1, int(maxLazyRows))
+
+        # Only used in lazy mode, {sourceNodeId: row, ...} in least to most recently used order.
+        self._lazyRows = None
+        self._neighbors = None
+
+        # Map positions straight to node ids, lookups are on the hot path for most agents.
+        self._nodeIds = {position: nodeId
+                for (nodeId, position) in enumerate(layout.getNodePositions())}
+
     def getMazeDistances(self):
-        self.dc.run()
+        if (not self._lazy):
+            self.dc.run()
+            return
+
+        # If the full table is already around, there is no reason to be lazy.
+        self._distances = distanceMap.get(str(self.dc.layout.walls))
+        if (self._distances is not None):
+            return
+
+        layout = self.dc.layout
+        self._neighbors = [layout.getNodeNeighbors(nodeId) for nodeId in range(self._numNodes)]
+        self._lazyRows = collections.OrderedDict()
 
     def getDistance(self, pos1, pos2):
         """
         The only function you will need after you create the object.
         """
 
-        if (self._distances is None):
+        if (not self.isReadyForMazeDistance()):
             return manhattan(pos1, pos2)
 
         if isInt(pos1) and isInt(pos2):
@@ -47,15 +95,266 @@ class Distancer(object):
 
         return bestDistance
 
+    def getDistanceField(self, targets):
+        """
+        Get a `DistanceField` that tracks the distance from every position to the nearest target.
+        """
+
+        return DistanceField(self.dc.layout, targets)
+
+    def getDistancesFrom(self, position, targets):
+        """
+        Get the distance from a position to each of the targets (in the same order).
+        This gives the same results as calling getDistance() for each target, but is much faster.
+        """
+
+        node = None
+        if (self.isReadyForMazeDistance()):
+            node = self._nodeIds.get(position)
+
+        if (node is None):
+            return [self.getDistance(position, target) for target in targets]
+
+        if (self._distances is not None):
+            table = self._distances
+            offset = node * self._numNodes
+        else:
+            table = self._getLazyRow(node)
+            offset = 0
+
+        results = []
+        for target in targets:
+            targetNode = self._nodeIds.get(target)
+            if (targetNode is None):
+                results.append(self.getDistance(position, target))
+                continue
+
+            distance = table[offset + targetNode]
+            if (distance == UNREACHABLE):
+                distance = sys.maxsize
+
+            results.append(distance)
+
+        return results
+
+    def getNearest(self, position, targets):
+        """
+        Find the target that is closest to the position.
+        Returns (target, distance), or (None, None) if there are no targets.
+        Ties go to the earliest target.
+        """
+
+        targets = list(targets)
+        if (len(targets) == 0):
+            return (None, None)
+
+        distances = self.getDistancesFrom(position, targets)
+        distance = min(distances)
+
+        return (targets[distances.index(distance)], distance)
+
     def getDistanceOnGrid(self, pos1, pos2):
-        key = (pos1, pos2)
-        if key in self._distances:
-            return self._distances[key]
+        node1 = self._nodeIds.get(pos1)
+        node2 = self._nodeIds.get(pos2)
+
+        if (node1 is None or node2 is None):
+            raise Exception("Position not in grid: " + str((pos1, pos2)))
+
+        if (self._distances is not None):
+            distance = self._distances[node1 * self._numNodes + node2]
+        else:
+            distance = self._getLazyDistance(node1, node2)
+
+        if (distance == UNREACHABLE):
+            return sys.maxsize
 
-        raise Exception("Position not in grid: " + str(key))
+        return distance
 
     def isReadyForMazeDistance(self):
-        return (self._distances is not None)
+        return (self._distances is not None or self._lazyRows is not None)
+
+    def _getLazyDistance(self, node1, node2):
+        # Distances are symmetric, so a row for either node will do.
+        if (node1 not in self._lazyRows and node2 in self._lazyRows):
+            return self._getLazyRow(node2)[node1]
+
+        return self._getLazyRow(node1)[node2]
+
+    def _getLazyRow(self, node):
+        rows = self._lazyRows
+
+        if (node in rows):
+            rows.move_to_end(node)
+            return rows[node]
+
+        row = array.array(DISTANCE_TYPECODE, computeDistanceRow(self._neighbors, node))
+
+        rows[node] = row
+        if (len(rows) > self._maxLazyRows):
+            rows.popitem(last = False)
+
+        return row
+
+class DistanceField(object):
+    """
+    The maze distance from every position to the nearest of a set of targets (e.g. food).
+    Looking up a distance is a single array access,
+    and adding/removing targets only updates the part of the field that changes.
+
+    Example:
+    ```
+    field = DistanceField(gameState.getInitialLayout(), foodList)
+    field.getDistance(myPosition)  # The distance to the closest food.
+    field.removeTarget(eatenFood)
+    ```
+    """
+
+    def __init__(self, layout, targets = []):
+        self._layout = layout
+
+        numNodes = layout.getNumNodes()
+        self._neighbors = [layout.getNodeNeighbors(nodeId) for nodeId in range(numNodes)]
+
+        # For each node: the distance to the nearest target, and which target that is.
+        self._distances = [UNREACHABLE] * numNodes
+        self._owners = [None] * numNodes
+
+        # {target node: set of the nodes it owns}, targets own themselves.
+        self._regions = {}
+
+        frontier = []
+        for target in targets:
+            node = self._getNode(target)
+            if (node in self._regions):
+                continue
+
+            self._setTarget(node)
+            frontier.append(node)
+
+        self._expand(frontier)
+
+    def addTarget(self, target):
+        node = self._getNode(target)
+        if (node in self._regions):
+            return
+
+        self._setTarget(node)
+        self._expand([node])
+
+    def getDistance(self, position):
+        """
+        Get the distance from a position to the nearest target.
+        Returns sys.maxsize if no target can be reached.
+        """
+
+        distance = self._distances[self._getNode(position)]
+        if (distance == UNREACHABLE):
+            return sys.maxsize
+
+        return distance
+
+    def getNearestTarget(self, position):
+        """
+        Get the position of the target nearest to the given position,
+        or None if no target can be reached.
+        """
+
+        owner = self._owners[self._getNode(position)]
+        if (owner is None):
+            return None
+
+        return self._layout.getNodePosition(owner)
+
+    def getTargets(self):
+        return [self._layout.getNodePosition(node) for node in sorted(self._regions)]
+
+    def removeTarget(self, target):
+        """
+        Remove a target.
+        Only the positions that were closest to this target need to be recomputed.
+        """
+
+        node = self._getNode(target)
+        if (node not in self._regions):
+            return
+
+        # Clear out the region owned by the removed target.
+        region = self._regions.pop(node)
+        for other in region:
+            self._distances[other] = UNREACHABLE
+            self._owners[other] = None
+
+        # Everything outside the region is still correct,
+        # so refill the region from its border.
+        heap = []
+        for other in region:
+            for neighbor in self._neighbors[other]:
+                if (self._owners[neighbor] is not None):
+                    heapq.heappush(heap, (self._distances[neighbor] + 1, other,
+                            self._owners[neighbor]))
+
+        while (len(heap) > 0):
+            distance, other, owner = heapq.heappop(heap)
+            if (distance >= self._distances[other]):
+                continue
+
+            self._distances[other] = distance
+            self._setOwner(other, owner)
+
+            for neighbor in self._neighbors[other]:
+                if (distance + 1 < self._distances[neighbor]):
+                    heapq.heappush(heap, (distance + 1, neighbor, owner))
+
+    def _expand(self, frontier):
+        """
+        BFS out from the frontier nodes (which must already be set),
+        improving any distances that get shorter.
+        """
+
+        distances = self._distances
+        owners = self._owners
+        regions = self._regions
+
+        while (len(frontier) > 0):
+            nextFrontier = []
+
+            for node in frontier:
+                distance = distances[node] + 1
+                owner = owners[node]
+
+                for neighbor in self._neighbors[node]:
+                    if (distance < distances[neighbor]):
+                        oldOwner = owners[neighbor]
+                        if (oldOwner is not None):
+                            regions[oldOwner].discard(neighbor)
+
+                        distances[neighbor] = distance
+                        owners[neighbor] = owner
+                        regions[owner].add(neighbor)
+                        nextFrontier.append(neighbor)
+
+            frontier = nextFrontier
+
+    def _getNode(self, position):
+        node = self._layout.getNodeId(position)
+        if (node is None):
+            raise ValueError("Position not in grid: " + str(position))
+
+        return node
+
+    def _setOwner(self, node, owner):
+        oldOwner = self._owners[node]
+        if (oldOwner is not None and oldOwner in self._regions):
+            self._regions[oldOwner].discard(node)
+
+        self._owners[node] = owner
+        if (owner is not None):
+            self._regions[owner].add(node)
+
+    def _setTarget(self, node):
+        self._regions[node] = set()
+        self._distances[node] = 0
+        self._setOwner(node, node)
 
 def isInt(pos):
     x, y = pos
@@ -78,79 +377,165 @@ def getGrids1D(x):
 # MACHINERY FOR COMPUTING MAZE DISTANCES #
 ##########################################
 
+# All the distance tables computed (or loaded) in this process, keyed by the layout's walls.
+# Every agent (in every game) on the same walls shares a single table.
 distanceMap = {}
 
 class DistanceCalculator:
     def __init__(self, layout, distancer):
         self.layout = layout
         self.distancer = distancer
-        self.cache = {}
 
     def run(self):
-        if self.layout.walls not in self.cache:
-            self.cache[self.layout.walls] = computeDistances(self.layout)
+        self.distancer._distances = getDistances(self.layout)
 
-        self.distancer._distances = self.cache[self.layout.walls]
+def setCacheDir(cacheDir):
+    """
+    Set the directory that distance tables are persisted to (and loaded from).
+    Pass None to only cache distances in memory.
+    """
+
+    global _cacheDir
+    _cacheDir = cacheDir
+
+def getDistances(layout):
+    """
+    Get the all-pairs distance table (see computeDistances()) for a layout.
+    Tables are shared across the whole process and, if a cache dir is set, across runs.
+    """
+
+    # The string form of the walls is exact (and includes the dimensions).
+    key = str(layout.walls)
+
+    if (key in distanceMap):
+        return distanceMap[key]
+
+    path = None
+    distances = None
+
+    if (_cacheDir is not None and layout.getNumNodes() > 0):
+        path = _getCachePath(_cacheDir, key)
+        distances = _loadDistances(path, layout.getNumNodes())
+
+    if (distances is None):
+        distances = computeDistances(layout)
+
+        if (path is not None):
+            _saveDistances(path, distances)
+
+    distanceMap[key] = distances
+    return distances
 
 def computeDistances(layout):
     """
-    Runs UCS to all other positions from each position.
+    Runs a BFS from each node in the layout (all moves cost 1).
+
+    The result is a flat array indexed by node id (see `pacai.core.layout.Layout.getNodeId`):
+    the distance between nodes a and b is at `distances[a * numNodes + b]`.
+    Nodes that cannot reach each other have a distance of UNREACHABLE.
     """
 
-    distances = {}
-    allNodes = layout.walls.asList(False)
+    numNodes = layout.getNumNodes()
+    neighbors = [layout.getNodeNeighbors(nodeId) for nodeId in range(numNodes)]
 
-    for source in allNodes:
-        dist = {}
-        closed = {}
+    distances = array.array(DISTANCE_TYPECODE)
+    for source in range(numNodes):
+        distances.extend(computeDistanceRow(neighbors, source))
 
-        for node in allNodes:
-            dist[node] = sys.maxsize
+    return distances
 
-        queue = priorityQueue.PriorityQueue()
-        queue.push(source, 0)
-        dist[source] = 0
+def computeDistanceRow(neighbors, source):
+    """
+    Runs a BFS from a single node.
+    Neighbors is a list of the neighboring node ids for every node.
+    Returns a list of the distance to each node (UNREACHABLE if it cannot be reached).
+    """
 
-        while not queue.isEmpty():
-            node = queue.pop()
-            if node in closed:
-                continue
+    # Work in a list (it is faster to index), callers can pack it into an array.
+    row = [UNREACHABLE] * len(neighbors)
+    row[source] = 0
+
+    frontier = [source]
+    distance = 0
 
-            closed[node] = True
-            nodeDist = dist[node]
-            adjacent = []
-            x, y = node
+    while (len(frontier) > 0):
+        distance += 1
+        nextFrontier = []
 
-            if not layout.isWall((x, y + 1)):
-                adjacent.append((x, y + 1))
+        for node in frontier:
+            for other in neighbors[node]:
+                if (row[other] == UNREACHABLE):
+                    row[other] = distance
+                    nextFrontier.append(other)
 
-            if not layout.isWall((x, y - 1)):
-                adjacent.append((x, y - 1))
+        frontier = nextFrontier
 
-            if not layout.isWall((x + 1, y)):
-                adjacent.append((x + 1, y))
+    return row
 
-            if not layout.isWall((x - 1, y)):
-                adjacent.append((x - 1, y))
+def getDistanceOnGrid(distances, pos1, pos2, layout = None):
+    """
+    Look up the distance between two grid positions in a table from computeDistances().
+    Tables are indexed by node id, so the layout the table was computed for must be given.
+    Without a layout, `distances` is taken to be a dict of {(pos1, pos2): distance}
+    (the form tables used to have).
+    """
 
-            for other in adjacent:
-                if other not in dist:
-                    continue
+    if (layout is None):
+        if (not isinstance(distances, dict)):
+            raise ValueError("The layout of a distance table is needed to look up distances.")
 
-                oldDist = dist[other]
-                newDist = nodeDist + 1
-                if newDist < oldDist:
-                    dist[other] = newDist
-                    queue.push(other, newDist)
+        return distances.get((pos1, pos2), DEFAULT_DISTANCE)
 
-        for target in allNodes:
-            distances[(target, source)] = dist[target]
+    node1 = layout.getNodeId(pos1)
+    node2 = layout.getNodeId(pos2)
 
-    return distances
+    if (node1 is None or node2 is None):
+        return DEFAULT_DISTANCE
+
+    distance = distances[node1 * layout.getNumNodes() + node2]
+    if (distance == UNREACHABLE):
+        return sys.maxsize
+
+    return distance
+
+def _getCachePath(cacheDir, key):
+    # Native byte order and the item size are part of the file format.
+    fullKey = '%d:%s:%d:%s' % (DISTANCE_FILE_VERSION, sys.byteorder,
+            array.array(DISTANCE_TYPECODE).itemsize, key)
+    name = hashlib.sha256(fullKey.encode('utf-8')).hexdigest()
+
+    return os.path.join(cacheDir, DISTANCE_CACHE_DIRNAME, name + '.bin')
+
+def _loadDistances(path, numNodes):
+    """
+    Memory-map a distance table from disk.
+    Returns None if there is no usable table at the path.
+    """
+
+    if (not os.path.isfile(path)):
+        return None
+
+    itemsize = array.array(DISTANCE_TYPECODE).itemsize
+    if (os.path.getsize(path) != numNodes * numNodes * itemsize):
+        return None
+
+    try:
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    return memoryview(buffer).cast(DISTANCE_TYPECODE)
+
+def _saveDistances(path, distances):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok = True)
 
-def getDistanceOnGrid(distances, pos1, pos2):
-    key = (pos1, pos2)
-    if key in distances:
-        return distances[key]
+        # Write to a temp file and then move, so concurrent runs never see a partial file.
+        tempPath = '%s.%d.tmp' % (path, os.getpid())
+        with open(tempPath, 'wb') as file:
+            distances.tofile(file)
 
-    return DEFAULT_DISTANCE
+        os.replace(tempPath, path)
+    except OSError as ex:
+        logging.warning("Could not save maze distances to '%s': %s." % (path, ex))
@@ -5,6 +5,8 @@ The core of a pacman-style game.
 import logging
 import time
 
+from pacai.core import gamestats
+
 class Game:
     """
     The Game manages the control flow, soliciting actions from agents.
@@ -22,6 +24,14 @@ class Game:
         self.totalAgentTimeWarnings = [0 for agent in agents]
         self.agentTimeout = False
 
+        # Move times, where the game's time went, and engine call counts.
+        # See `pacai.core.gamestats.GameStats`.
+        self.stats = gamestats.GameStats(len(agents))
+
+        # The deltas each agent that wants them has not seen yet.
+        # See `pacai.agents.base.BaseAgent.observeDeltas`.
+        self._pendingDeltas = {}
+
         self.enforceTimeouts = catchExceptions
         self.catchExceptions = catchExceptions
 
@@ -30,28 +40,45 @@ class Game:
         Main control loop for game play.
         """
 
+        try:
+            return self._run()
+        finally:
+            self.stats.finish()
+
+    def _run(self):
         self.numMoves = 0
 
         agentIndex = self.startingIndex
         numAgents = len(self.agents)
 
-        self.display.initialize(self.state)
+        self._timePhase(gamestats.PHASE_DISPLAY, self.display.initialize, self.state)
 
         if (not self._registerInitialState()):
             return False
 
         # Draw the initial frame.
-        self.display.update(self.state)
+        self._timePhase(gamestats.PHASE_DISPLAY, self.display.update, self.state)
+
+        self._pendingDeltas = {}
+        for index in range(numAgents):
+            if (self.agents[index].wantsDeltas()):
+                self._pendingDeltas[index] = []
 
         while (not self.gameOver):
             # Fetch the next agent
             agent = self.agents[agentIndex]
 
             action = None
-            startTime = time.time()
+            startCounts = dict(gamestats.counts)
+            startTime = time.perf_counter()
+            agent.setDeadline(self._getMoveDeadline(agentIndex, startTime))
 
             # Get an action from the agent.
             try:
+                if (agentIndex in self._pendingDeltas):
+                    agent.observeDeltas(self._pendingDeltas[agentIndex])
+                    self._pendingDeltas[agentIndex] = []
+
                 agent.observationFunction(self.state)
                 action = agent.getAction(self.state)
             except Exception as ex:
@@ -61,28 +88,41 @@ class Game:
                 self._agentCrash(agentIndex, ex)
                 return False
 
-            timeTaken = time.time() - startTime
+            timeTaken = time.perf_counter() - startTime
             self.totalAgentTimes[agentIndex] += timeTaken
 
+            self.stats.addMoveTime(agentIndex, timeTaken)
+            self.stats.addPhaseTime(gamestats.PHASE_AGENT, timeTaken)
+            self.stats.addAgentCounts(agentIndex, startCounts)
+
             if (self._checkForTimeouts(agentIndex, timeTaken)):
                 return False
 
             # Execute the action.
             self.moveHistory.append((agentIndex, action))
+            startTime = time.perf_counter()
             try:
+                previousState = self.state
                 self.state = self.state.generateSuccessor(agentIndex, action)
+
+                if (len(self._pendingDeltas) > 0):
+                    delta = self.state.getDelta(previousState, action)
+                    for deltas in self._pendingDeltas.values():
+                        deltas.append(delta)
             except Exception as ex:
                 if (not self.catchExceptions):
                     raise ex
 
                 self._agentCrash(agentIndex, ex)
                 return False
+            finally:
+                self.stats.addPhaseTime(gamestats.PHASE_ENGINE, time.perf_counter() - startTime)
 
             # Update the display.
-            self.display.update(self.state)
+            self._timePhase(gamestats.PHASE_DISPLAY, self.display.update, self.state)
 
             # Allow for game specific conditions (winning, losing, etc.).
-            self.rules.process(self.state, self)
+            self._timePhase(gamestats.PHASE_RULES, self.rules.process, self.state, self)
 
             # Track progress.
             if (agentIndex == numAgents + 1):
@@ -94,7 +134,7 @@ class Game:
         if (not self._registerFinalState()):
             return False
 
-        self.display.finish()
+        self._timePhase(gamestats.PHASE_DISPLAY, self.display.finish)
 
     def _agentCrash(self, agentIndex, exception = None):
         """
@@ -151,6 +191,27 @@ class Game:
 
         return False
 
+    def _getMoveDeadline(self, agentIndex, startTime):
+        """
+        Get the latest time (in terms of time.perf_counter()) that an agent starting a move
+        at the given time can return its action without losing.
+        Returns None if timeouts are not enforced.
+        """
+
+        if (not self.enforceTimeouts):
+            return None
+
+        budget = float(self.rules.getMoveTimeout(agentIndex))
+
+        remainingTime = float(self.rules.getMaxTotalAgentTime(agentIndex))
+        budget = min(budget, remainingTime - self.totalAgentTimes[agentIndex])
+
+        # With no warnings left, the next warning is as bad as a timeout.
+        if (self.totalAgentTimeWarnings[agentIndex] >= self.rules.getMaxTimeWarnings(agentIndex)):
+            budget = min(budget, float(self.rules.getMoveWarningTime(agentIndex)))
+
+        return startTime + max(0.0, budget)
+
     def _registerInitialState(self):
         """
         Inform agents of the game start.
@@ -165,7 +226,14 @@ class Game:
                 return False
 
             maxStartupTime = float(self.rules.getMaxStartupTime(agentIndex))
-            startTime = time.time()
+            startCounts = dict(gamestats.counts)
+            startTime = time.perf_counter()
+
+            # Agents only get a deadline if it will be enforced.
+            deadline = None
+            if (self.enforceTimeouts):
+                deadline = startTime + maxStartupTime
+            agent.setDeadline(deadline)
 
             try:
                 agent.registerInitialState(self.state)
@@ -176,9 +244,12 @@ class Game:
                 self._agentCrash(agentIndex, ex)
                 return False
 
-            timeTaken = time.time() - startTime
+            timeTaken = time.perf_counter() - startTime
             self.totalAgentTimes[agentIndex] += timeTaken
 
+            self.stats.addPhaseTime(gamestats.PHASE_AGENT, timeTaken)
+            self.stats.addAgentCounts(agentIndex, startCounts)
+
             if (self.enforceTimeouts and timeTaken > maxStartupTime):
                 logging.warning('Agent %d ran out of time on startup!' % agentIndex)
                 self.agentTimeout = True
@@ -189,9 +260,15 @@ class Game:
 
     def _registerFinalState(self):
         # Inform a learning agent of the game's result.
-        for agent in self.agents:
+        # Pending deltas are kept by the agent's place in the game (like the main loop).
+        for (agentIndex, agent) in enumerate(self.agents):
             try:
-                agent.final(self.state)
+                if (agentIndex in self._pendingDeltas):
+                    self._timePhase(gamestats.PHASE_AGENT, agent.observeDeltas,
+                            self._pendingDeltas[agentIndex])
+                    self._pendingDeltas[agentIndex] = []
+
+                self._timePhase(gamestats.PHASE_AGENT, agent.final, self.state)
             except Exception as ex:
                 if (not self.catchExceptions):
                     raise ex
@@ -200,3 +277,14 @@ class Game:
                 return False
 
         return True
+
+    def _timePhase(self, phase, function, *args):
+        """
+        Call a function and add the time it took to a phase of the game's stats.
+        """
+
+        startTime = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.stats.addPhaseTime(phase, time.perf_counter() - startTime)
@@ -1,10 +1,21 @@
 import abc
+import collections
 import copy
 
+from pacai.core import gamestats
 from pacai.core.agentstate import AgentState
 from pacai.core.directions import Directions
 from pacai.util import util
 
+# What changed in a game from one state to the next (see AbstractGameState.getDelta()).
+# agentIndex and action are the move that was made (agentIndex is None if no move was made).
+# moves is a list of (agentIndex, old position, new position) for every agent that changed position
+# (including agents that were killed), and respawns is a list of the agents that were killed.
+# scaredTimers is a list of (agentIndex, new timer) for every agent whose scared timer changed.
+# foodEaten and capsulesEaten are lists of the (x, y) positions that were eaten.
+StateDelta = collections.namedtuple('StateDelta', ['agentIndex', 'action', 'moves', 'respawns',
+        'scaredTimers', 'foodEaten', 'capsulesEaten'])
+
 class AbstractGameState(abc.ABC):
     """
     A game state specifies the status of a game, including the food, capsules, agents, and score.
@@ -22,7 +33,7 @@ class AbstractGameState(abc.ABC):
 
         self._layout = layout
 
-        # Keep a copy of the hash, since it is expensive to compute.
+        # Keep a copy of the hash.
         # Any children should be sure to clear the hash when modifications are made.
         self._hash = None
 
@@ -37,6 +48,15 @@ class AbstractGameState(abc.ABC):
         self._capsules = layout.capsules.copy()
         self._lastCapsuleEaten = None
 
+        # A Zobrist hash of the food and capsules left on the board.
+        # Eating food or a capsule XORs its key out, so successors never rebuild it.
+        self._boardHash = 0
+        for (x, y) in self._food.asList():
+            self._boardHash ^= util.zobristKey('food', x, y)
+
+        for (x, y) in self._capsules:
+            self._boardHash ^= util.zobristKey('capsule', x, y)
+
         # An ordered list of locations that this state considers special.
         # A view may choose to specially represent these locations.
         self._highlightLocations = []
@@ -45,6 +65,10 @@ class AbstractGameState(abc.ABC):
         for (isPacman, position) in layout.agentPositions:
             self._agentStates.append(AgentState(position, Directions.STOP, isPacman))
 
+        # Successors share agent states with their parent and only copy on write.
+        # Matches indexes with getAgentStates(), true if this state owns its copy of the agent.
+        self._agentStatesCopied = [True] * len(self._agentStates)
+
         self._score = 0
 
     @abc.abstractmethod
@@ -83,6 +107,7 @@ class AbstractGameState(abc.ABC):
         self._capsules.remove((x, y))
         self._lastCapsuleEaten = (x, y)
 
+        self._boardHash ^= util.zobristKey('capsule', x, y)
         self._hash = None
         return True
 
@@ -101,6 +126,7 @@ class AbstractGameState(abc.ABC):
         self._food[x][y] = False
         self._lastFoodEaten = (x, y)
 
+        self._boardHash ^= util.zobristKey('food', x, y)
         self._hash = None
         return True
 
@@ -125,9 +151,19 @@ class AbstractGameState(abc.ABC):
         return tuple(int(pos) for pos in position)
 
     def getAgentState(self, index):
+        """
+        Get the state of an agent.
+        Agent states may be shared with other game states, so the caller should not modify it.
+        """
+
         return self._agentStates[index]
 
     def getAgentStates(self):
+        """
+        Get the states of all agents.
+        Agent states may be shared with other game states, so the caller should not modify them.
+        """
+
         return self._agentStates
 
     def getCapsules(self):
@@ -137,6 +173,54 @@ class AbstractGameState(abc.ABC):
 
         return self._capsules
 
+    def getDelta(self, previousState, action = None):
+        """
+        Get a `StateDelta` with what changed between a previous state and this state
+        (which is usually its successor).
+        Successors share everything they do not change with their parent,
+        so this only does work for the parts of the state that actually changed.
+        """
+
+        moves = []
+        respawns = []
+        scaredTimers = []
+
+        for agentIndex in range(len(self._agentStates)):
+            agentState = self._agentStates[agentIndex]
+            previousAgentState = previousState._agentStates[agentIndex]
+
+            if (agentState is previousAgentState):
+                continue
+
+            if (agentState.getPosition() != previousAgentState.getPosition()):
+                moves.append((agentIndex, previousAgentState.getPosition(),
+                        agentState.getPosition()))
+
+            if (agentState.wasRespawned()):
+                respawns.append(agentIndex)
+
+            if (agentState.getScaredTimer() != previousAgentState.getScaredTimer()):
+                scaredTimers.append((agentIndex, agentState.getScaredTimer()))
+
+        foodEaten = []
+        if (self._food is not previousState._food):
+            height = self._food.getHeight()
+            eatenBits = previousState._food.getBits() & ~self._food.getBits()
+
+            while (eatenBits != 0):
+                lowBit = eatenBits & -eatenBits
+                index = lowBit.bit_length() - 1
+                foodEaten.append((index // height, index % height))
+                eatenBits ^= lowBit
+
+        capsulesEaten = []
+        if (self._capsules is not previousState._capsules):
+            capsulesEaten = [capsule for capsule in previousState._capsules
+                    if capsule not in self._capsules]
+
+        return StateDelta(self._lastAgentMoved, action, moves, respawns, scaredTimers,
+                foodEaten, capsulesEaten)
+
     def getFood(self):
         """
         Returns a Grid of boolean food indicator variables.
@@ -173,6 +257,20 @@ class AbstractGameState(abc.ABC):
     def getLastFoodEaten(self):
         return self._lastFoodEaten
 
+    def getMutableAgentState(self, index):
+        """
+        Get the state of an agent that is safe to modify.
+        Successors share agent states with their parent until one needs to change,
+        so game rules must use this (instead of getAgentState()) before changing an agent.
+        """
+
+        if (not self._agentStatesCopied[index]):
+            self._agentStates[index] = self._agentStates[index].copy()
+            self._agentStatesCopied[index] = True
+
+        self._hash = None
+        return self._agentStates[index]
+
     def getNumAgents(self):
         return len(self._agentStates)
 
@@ -193,6 +291,32 @@ class AbstractGameState(abc.ABC):
     def getScore(self):
         return self._score
 
+    def getSnapshot(self):
+        """
+        Get a compact (JSON serializable) description of everything in this state
+        that can change during a game.
+        A fresh state for the same layout can be brought to this state with loadSnapshot().
+        """
+
+        agents = []
+        for agentState in self._agentStates:
+            position = agentState.getPosition()
+            if (position is not None):
+                position = list(position)
+
+            agents.append([position, agentState.getDirection(), agentState.isPacman(),
+                    agentState.getScaredTimer()])
+
+        return {
+            'agents': agents,
+            'capsules': [list(capsule) for capsule in self._capsules],
+            'food': '%x' % (self._food.getBits()),
+            'gameover': self._gameover,
+            'lastAgentMoved': self._lastAgentMoved,
+            'score': self._score,
+            'win': self._win,
+        }
+
     def getWalls(self):
         """
         Returns a Grid of boolean wall indicator variables.
@@ -235,6 +359,45 @@ class AbstractGameState(abc.ABC):
     def isWin(self):
         return self.isOver() and self._win
 
+    def loadSnapshot(self, snapshot):
+        """
+        Bring this state to the one described by a snapshot from getSnapshot().
+        This state must be a fresh state for the same layout as the snapshot.
+        """
+
+        # Eat (instead of just setting) the missing food and capsules,
+        # so children get the chance to update any structures they build on top of them.
+        foodBits = int(snapshot['food'], 16)
+        height = self._food.getHeight()
+        for (x, y) in self._food.asList():
+            if (not (foodBits >> (x * height + y)) & 1):
+                self.eatFood(x, y)
+
+        capsules = {tuple(capsule) for capsule in snapshot['capsules']}
+        for (x, y) in list(self._capsules):
+            if ((x, y) not in capsules):
+                self.eatCapsule(x, y)
+
+        self._lastFoodEaten = None
+        self._lastCapsuleEaten = None
+
+        for (index, (position, direction, isPacman, scaredTimer)) in enumerate(snapshot['agents']):
+            if (position is not None):
+                position = tuple(position)
+
+            agentState = self.getMutableAgentState(index)
+            agentState.setPosition(position)
+            agentState.setDirection(direction)
+            agentState.setIsPacman(isPacman)
+            agentState.setScaredTimer(scaredTimer)
+
+        self._lastAgentMoved = snapshot['lastAgentMoved']
+        self._score = snapshot['score']
+        self._gameover = snapshot['gameover']
+        self._win = snapshot['win']
+
+        self._hash = None
+
     def setHighlightLocations(self, locations):
         self._highlightLocations = list(locations)
 
@@ -248,6 +411,8 @@ class AbstractGameState(abc.ABC):
         Initialize the successor to look like this state.
         """
 
+        gamestats.counts[gamestats.GENERATE_SUCCESSOR] += 1
+
         # Start with a shallow copy.
         successor = copy.copy(self)
         successor._hash = None
@@ -256,8 +421,10 @@ class AbstractGameState(abc.ABC):
         successor._foodCopied = False
         successor._capsulesCopied = False
 
-        # Agent states need to be deep copied.
-        successor._agentStates = [agentState.copy() for agentState in self._agentStates]
+        # Agent states are also shared until they are modified.
+        # See getMutableAgentState().
+        successor._agentStates = list(self._agentStates)
+        successor._agentStatesCopied = [False] * len(self._agentStates)
 
         return successor
 
@@ -288,8 +455,10 @@ class AbstractGameState(abc.ABC):
                 and self._layout == other._layout)
 
     def __hash__(self):
+        # The board and agent states keep their own incremental hashes,
+        # so this is constant time no matter how big the board is.
         if (self._hash is None):
-            self._hash = util.buildHash(self._score, self._gameover, self._win, *self._capsules,
-                self._food, *self._agentStates, self._layout)
+            self._hash = util.buildHash(self._score, self._gameover, self._win, self._boardHash,
+                *self._agentStates, self._layout)
 
         return self._hash
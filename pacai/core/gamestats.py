@@ -0,0 +1,157 @@
+"""
+Instrumentation for games.
+Tracks how long each agent takes to move, where the time in a game goes
+(agents, the engine, the rules, or the display), and how much work the engine does.
+"""
+
+import json
+import math
+
+GENERATE_SUCCESSOR = 'generateSuccessor'
+GET_LEGAL_ACTIONS = 'getLegalActions'
+
+PHASE_AGENT = 'agent'
+PHASE_DISPLAY = 'display'
+PHASE_ENGINE = 'engine'
+PHASE_RULES = 'rules'
+
+PHASES = [PHASE_AGENT, PHASE_DISPLAY, PHASE_ENGINE, PHASE_RULES]
+
+# Upper bounds (in seconds) of the move time histogram buckets.
+# A final bucket holds every move slower than the last bound.
+HISTOGRAM_BOUNDS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0]
+
+# Process-wide counts of engine calls.
+# Game states bump these, and games attribute the change across an agent's move to that agent.
+counts = {
+    GENERATE_SUCCESSOR: 0,
+    GET_LEGAL_ACTIONS: 0,
+}
+
+class GameStats(object):
+    """
+    The instrumentation for a single game.
+    """
+
+    def __init__(self, numAgents):
+        self._moveTimes = [[] for i in range(numAgents)]
+        self._agentCounts = [dict.fromkeys(counts, 0) for i in range(numAgents)]
+        self._phaseTimes = dict.fromkeys(PHASES, 0.0)
+
+        self._startCounts = dict(counts)
+        self._endCounts = None
+
+    def addAgentCounts(self, agentIndex, startCounts):
+        """
+        Attribute the engine calls made since `startCounts` (a copy of `counts`) to an agent.
+        """
+
+        agentCounts = self._agentCounts[agentIndex]
+        for (name, count) in counts.items():
+            agentCounts[name] += count - startCounts[name]
+
+    def addMoveTime(self, agentIndex, seconds):
+        self._moveTimes[agentIndex].append(seconds)
+
+    def addPhaseTime(self, phase, seconds):
+        self._phaseTimes[phase] += seconds
+
+    def finish(self):
+        """
+        Mark the end of the game, engine calls after this are not counted.
+        """
+
+        self._endCounts = dict(counts)
+
+    def getAgentCounts(self, agentIndex):
+        return dict(self._agentCounts[agentIndex])
+
+    def getCounts(self):
+        """
+        Get the engine calls made (by anyone) during the game.
+        """
+
+        endCounts = self._endCounts
+        if (endCounts is None):
+            endCounts = counts
+
+        return {name: endCounts[name] - self._startCounts[name] for name in self._startCounts}
+
+    def getMoveSummary(self, agentIndex):
+        """
+        Summarize an agent's move times (in seconds): count, total, mean, p50, p95, max,
+        and a histogram (the number of moves in each bucket of `HISTOGRAM_BOUNDS`).
+        """
+
+        times = sorted(self._moveTimes[agentIndex])
+
+        histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        for seconds in times:
+            bucket = 0
+            while (bucket < len(HISTOGRAM_BOUNDS) and seconds > HISTOGRAM_BOUNDS[bucket]):
+                bucket += 1
+
+            histogram[bucket] += 1
+
+        summary = {
+            'count': len(times),
+            'total': sum(times),
+            'mean': 0.0,
+            'p50': 0.0,
+            'p95': 0.0,
+            'max': 0.0,
+            'histogram': histogram,
+        }
+
+        if (len(times) > 0):
+            summary['mean'] = summary['total'] / len(times)
+            summary['p50'] = _percentile(times, 0.50)
+            summary['p95'] = _percentile(times, 0.95)
+            summary['max'] = times[-1]
+
+        return summary
+
+    def getMoveTimes(self, agentIndex):
+        """
+        The caller should not modify the returned list.
+        """
+
+        return self._moveTimes[agentIndex]
+
+    def getPhaseTimes(self):
+        return dict(self._phaseTimes)
+
+    def toDict(self):
+        """
+        Get all the stats as a JSON serializable dict.
+        """
+
+        agents = []
+        for agentIndex in range(len(self._moveTimes)):
+            agents.append({
+                'counts': self.getAgentCounts(agentIndex),
+                'moves': self.getMoveSummary(agentIndex),
+            })
+
+        return {
+            'agents': agents,
+            'counts': self.getCounts(),
+            'histogramBounds': HISTOGRAM_BOUNDS,
+            'phases': self.getPhaseTimes(),
+        }
+
+def writeStats(path, games):
+    """
+    Write the stats for a list of `pacai.core.game.Game` as a JSON list.
+    """
+
+    with open(path, 'w') as file:
+        json.dump([game.stats.toDict() for game in games], file, indent = 4)
+
+def _percentile(sortedValues, fraction):
+    """
+    The nearest-rank percentile of a non-empty sorted list.
+    """
+
+    rank = max(1, int(math.ceil(fraction * len(sortedValues))))
+    return sortedValues[rank - 1]
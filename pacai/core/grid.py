@@ -55,6 +55,9 @@ class Grid:
         if (other is None):
             return False
 
+        if (isinstance(other, BitGrid)):
+            return other == self
+
         return self._data == other._data
 
     def __getitem__(self, i):
@@ -82,3 +85,152 @@ class Grid:
         out = [[str(self._data[x][y])[0] for x in range(self._width)] for y in range(self._height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
+
+class BitGrid(Grid):
+    """
+    A 2-dimensional array of booleans backed by a single integer bitset.
+    Cell (x, y) is stored in bit (x * height + y),
+    which is the same order that `Grid.__hash__` uses.
+
+    Reads and writes still go through grid[x][y],
+    but counting, copying, hashing, and equality checks are done on the whole bitset at once.
+    This makes BitGrid a good choice for grids that are frequently copied (like food).
+    """
+
+    def __init__(self, width, height, initialValue = False):
+        if (not isinstance(initialValue, bool)):
+            raise ValueError('Grids can only contain booleans')
+
+        self._width = width
+        self._height = height
+        self._bits = 0
+
+        if (initialValue):
+            self._bits = self._fullMask()
+
+    def asList(self, key = True):
+        bits = self._bits
+        if (not key):
+            bits = ~bits & self._fullMask()
+
+        values = []
+
+        while (bits != 0):
+            lowBit = bits & -bits
+            index = lowBit.bit_length() - 1
+            values.append((index // self._height, index % self._height))
+            bits ^= lowBit
+
+        return values
+
+    def copy(self):
+        grid = BitGrid(self._width, self._height)
+        grid._bits = self._bits
+        return grid
+
+    def count(self, item = True):
+        if (item not in (True, False)):
+            return 0
+
+        trueCount = bin(self._bits).count('1')
+        if (item):
+            return trueCount
+
+        return self._width * self._height - trueCount
+
+    def getBits(self):
+        """
+        Get the raw bitset for this grid.
+        Cell (x, y) is at bit (x * height + y).
+        """
+
+        return self._bits
+
+    def shallowCopy(self):
+        # The bitset is an immutable int, so there is no storage to share.
+        return self.copy()
+
+    def _fullMask(self):
+        return (1 << (self._width * self._height)) - 1
+
+    def __eq__(self, other):
+        if (other is None):
+            return False
+
+        if (isinstance(other, BitGrid)):
+            return (self._width == other._width
+                    and self._height == other._height
+                    and self._bits == other._bits)
+
+        if (isinstance(other, Grid)):
+            return (self._width == other.getWidth()
+                    and self._height == other.getHeight()
+                    and self.asList() == other.asList())
+
+        return False
+
+    def __getitem__(self, x):
+        if (x < 0):
+            x += self._width
+
+        if (x < 0 or x >= self._width):
+            raise IndexError('Grid column out of range: %d.' % (x))
+
+        return _BitGridColumn(self, x * self._height)
+
+    def __hash__(self):
+        return hash(self._bits)
+
+    def __setitem__(self, x, column):
+        if (len(column) != self._height):
+            raise ValueError('Grid columns must have exactly %d values.' % (self._height))
+
+        target = self[x]
+        for y in range(self._height):
+            target[y] = column[y]
+
+    def __str__(self):
+        out = [[str(self[x][y])[0] for x in range(self._width)] for y in range(self._height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+class _BitGridColumn:
+    """
+    A view of a single column in a `BitGrid`.
+    This is what makes grid[x][y] work on a bitset.
+    """
+
+    __slots__ = ('_grid', '_offset')
+
+    def __init__(self, grid, offset):
+        self._grid = grid
+        self._offset = offset
+
+    def __getitem__(self, y):
+        return ((self._grid._bits >> (self._offset + self._checkIndex(y))) & 1) == 1
+
+    def __iter__(self):
+        for y in range(self._grid._height):
+            yield self[y]
+
+    def __len__(self):
+        return self._grid._height
+
+    def __setitem__(self, y, value):
+        mask = 1 << (self._offset + self._checkIndex(y))
+
+        if (value):
+            self._grid._bits |= mask
+        else:
+            self._grid._bits &= ~mask
+
+    def _checkIndex(self, y):
+        height = self._grid._height
+
+        if (y < 0):
+            y += height
+
+        if (y < 0 or y >= height):
+            raise IndexError('Grid row out of range: %d.' % (y))
+
+        return y
@@ -1,7 +1,12 @@
+import hashlib
 import os
+import pickle
 import random
 
+from pacai.core.actions import Actions
+from pacai.core.directions import Directions
 from pacai.core.distance import manhattan
+from pacai.core.grid import BitGrid
 from pacai.core.grid import Grid
 
 # By default, the layout directory is adjacent to this file.
@@ -9,6 +14,14 @@ DEFAULT_LAYOUT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '
 
 GHOST_NUMS = ['1', '2', '3', '4']
 
+# Bump this whenever the layout structure changes, so stale precompiled layouts are ignored.
+COMPILED_LAYOUT_VERSION = 2
+COMPILED_LAYOUT_DIRNAME = 'layouts'
+
+# Layouts that have already been loaded in this process, keyed by (path, mtime, maxGhosts).
+# Layouts are not modified during a game, so the same object can be shared between games.
+_layoutCache = {}
+
 class Layout(object):
     """
     A Layout manages the static information about the game board.
@@ -18,7 +31,7 @@ class Layout(object):
         self.width = len(layoutText[0])
         self.height = len(layoutText)
         self.walls = Grid(self.width, self.height, initialValue = False)
-        self.food = Grid(self.width, self.height, initialValue = False)
+        self.food = BitGrid(self.width, self.height, initialValue = False)
         self.capsules = []
         self.agentPositions = []
         self.numGhosts = 0
@@ -26,9 +39,103 @@ class Layout(object):
 
         self.processLayoutText(layoutText, maxGhosts)
 
+        # Every non-wall cell gets a dense integer id (a "node"), in (x, y) order.
+        # Ids allow structures like distance tables and food sets to be plain arrays/bitsets.
+        self._cellNodeIds = None
+        self._nodePositions = None
+        self._nodeNeighbors = None
+        self._buildNodeIndex()
+
+        # Legal actions only depend on the walls, so precompute them for every cell.
+        # Cells are indexed by (x * height + y).
+        self._possibleActions = None
+        self._ghostActions = None
+        self._legalNeighbors = None
+        self._buildActionTables()
+
+    def getGhostActions(self, position, direction):
+        """
+        Get the legal actions for a ghost at the given position, heading in the given direction.
+        Ghosts cannot stop, and cannot turn around unless they reach a dead end.
+        The returned list belongs to the caller.
+        """
+
+        cell = self._getCell(position)
+        if (cell is None or self._ghostActions[cell] is None):
+            possible = self.getPossibleActions(position, direction)
+            return list(_filterGhostActions(possible, direction))
+
+        return list(self._ghostActions[cell][direction])
+
+    def getLegalNeighbors(self, position):
+        """
+        Get the positions reachable from the given position in one move (including staying put).
+        This is the same as `pacai.core.actions.Actions.getLegalNeighbors`, but is a lookup.
+        The returned list belongs to the caller.
+        """
+
+        x, y = position
+        cell = int(x + 0.5) * self.height + int(y + 0.5)
+
+        if (cell < 0 or cell >= len(self._legalNeighbors) or self._legalNeighbors[cell] is None):
+            return Actions.getLegalNeighbors(position, self.walls)
+
+        return list(self._legalNeighbors[cell])
+
+    def getNodeId(self, position):
+        """
+        Get the node id for a position.
+        Returns None if the position is a wall, off the board, or between grid points.
+        """
+
+        cell = self._getCell(position)
+        if (cell is None or cell < 0 or cell >= len(self._cellNodeIds)):
+            return None
+
+        return self._cellNodeIds[cell]
+
+    def getNodeNeighbors(self, nodeId):
+        """
+        Get the ids of the nodes one (non-stop) move away from the given node.
+        The caller should not modify the returned tuple.
+        """
+
+        return self._nodeNeighbors[nodeId]
+
+    def getNodePosition(self, nodeId):
+        return self._nodePositions[nodeId]
+
+    def getNodePositions(self):
+        """
+        Get the position of every node, indexed by node id.
+        The caller should not modify the returned list.
+        """
+
+        return self._nodePositions
+
     def getNumGhosts(self):
         return self.numGhosts
 
+    def getNumNodes(self):
+        return len(self._nodePositions)
+
+    def getPossibleActions(self, position, direction):
+        """
+        Get the possible actions for an agent at the given position, heading in the given direction.
+        This is the same as `pacai.core.actions.Actions.getPossibleActions`, but is a lookup.
+        The returned list belongs to the caller.
+        """
+
+        cell = self._getCell(position)
+        if (cell is None):
+            # In between grid points, all agents must continue straight.
+            return [direction]
+
+        if (self._possibleActions[cell] is None):
+            return Actions.getPossibleActions(position, direction, self.walls)
+
+        return list(self._possibleActions[cell])
+
     def isWall(self, pos):
         x, col = pos
         return self.walls[x][col]
@@ -78,6 +185,74 @@ class Layout(object):
     def deepCopy(self):
         return Layout(self.layoutText[:])
 
+    def _buildNodeIndex(self):
+        self._cellNodeIds = [None] * (self.width * self.height)
+        self._nodePositions = []
+
+        for x in range(self.width):
+            for y in range(self.height):
+                if (self.walls[x][y]):
+                    continue
+
+                self._cellNodeIds[x * self.height + y] = len(self._nodePositions)
+                self._nodePositions.append((x, y))
+
+        self._nodeNeighbors = []
+        for (x, y) in self._nodePositions:
+            neighbors = []
+
+            for direction in Directions.CARDINAL:
+                dx, dy = Actions.directionToVector(direction)
+                nextX = int(x + dx)
+                nextY = int(y + dy)
+
+                if (nextX < 0 or nextX >= self.width or nextY < 0 or nextY >= self.height):
+                    continue
+
+                neighborId = self._cellNodeIds[nextX * self.height + nextY]
+                if (neighborId is not None):
+                    neighbors.append(neighborId)
+
+            self._nodeNeighbors.append(tuple(neighbors))
+
+    def _buildActionTables(self):
+        size = self.width * self.height
+
+        self._possibleActions = [None] * size
+        self._ghostActions = [None] * size
+        self._legalNeighbors = [None] * size
+
+        for x in range(1, self.width - 1):
+            for y in range(1, self.height - 1):
+                if (self.walls[x][y]):
+                    continue
+
+                cell = x * self.height + y
+                position = (x, y)
+
+                possible = tuple(Actions.getPossibleActions(position, Directions.STOP, self.walls))
+                self._possibleActions[cell] = possible
+
+                self._ghostActions[cell] = {}
+                for direction in Directions.CARDINAL + [Directions.STOP]:
+                    self._ghostActions[cell][direction] = _filterGhostActions(possible, direction)
+
+                self._legalNeighbors[cell] = tuple(Actions.getLegalNeighbors(position, self.walls))
+
+    def _getCell(self, position):
+        """
+        Get the cell index for a position, or None if the position is between grid points.
+        """
+
+        x, y = position
+        xInt = int(x + 0.5)
+        yInt = int(y + 0.5)
+
+        if (abs(x - xInt) + abs(y - yInt) > Actions.TOLERANCE):
+            return None
+
+        return xInt * self.height + yInt
+
     def processLayoutText(self, layoutText, maxGhosts):
         """
         Coordinates are flipped from the input format to the (x, y) convention here
@@ -118,7 +293,27 @@ class Layout(object):
             self.agentPositions.append((int(layoutChar), (x, y)))
             self.numGhosts += 1
 
-def getLayout(name, layout_dir = DEFAULT_LAYOUT_DIR, maxGhosts = None):
+def _filterGhostActions(possibleActions, direction):
+    """
+    Remove the actions a ghost may not take: stopping and (unless it is a dead end) reversing.
+    """
+
+    actions = [action for action in possibleActions if action != Directions.STOP]
+
+    reverse = Actions.reverseDirection(direction)
+    if (reverse in actions and len(actions) > 1):
+        actions.remove(reverse)
+
+    return tuple(actions)
+
+def getLayout(name, layout_dir = DEFAULT_LAYOUT_DIR, maxGhosts = None, cacheDir = None):
+    """
+    Load a layout by name.
+    Loaded layouts are cached for the life of the process, so repeated games only parse once.
+    If a cache directory is given, a precompiled (pickled) copy of the layout (along with
+    all of its precomputed structures) will also be read from/written to that directory.
+    """
+
     if (not name.endswith('.lay')):
         name += '.lay'
 
@@ -126,6 +321,56 @@ def getLayout(name, layout_dir = DEFAULT_LAYOUT_DIR, maxGhosts = None):
     if (not os.path.isfile(path)):
         raise Exception("Could not locate layout file: '%s'." % (path))
 
+    path = os.path.realpath(path)
+    key = (path, os.path.getmtime(path), maxGhosts)
+
+    if (key in _layoutCache):
+        return _layoutCache[key]
+
+    layout = None
+    if (cacheDir is not None):
+        layout = _loadCompiledLayout(_getCompiledLayoutPath(cacheDir, key), key)
+
+    if (layout is None):
+        layout = Layout(_readLayoutText(path), maxGhosts)
+
+        if (cacheDir is not None):
+            _saveCompiledLayout(_getCompiledLayoutPath(cacheDir, key), key, layout)
+
+    _layoutCache[key] = layout
+    return layout
+
+def _getCompiledLayoutPath(cacheDir, key):
+    path, _, maxGhosts = key
+    name = os.path.splitext(os.path.basename(path))[0]
+
+    # Layouts with the same name may live in different directories.
+    pathHash = hashlib.sha256(path.encode('utf-8')).hexdigest()[:16]
+
+    return os.path.join(cacheDir, COMPILED_LAYOUT_DIRNAME,
+            '%s-%s-%s.pickle' % (name, pathHash, maxGhosts))
+
+def _loadCompiledLayout(compiledPath, key):
+    """
+    Load a precompiled layout.
+    Returns None if there is no usable precompiled layout for the key.
+    """
+
+    if (not os.path.isfile(compiledPath)):
+        return None
+
+    try:
+        with open(compiledPath, 'rb') as file:
+            compiled = pickle.load(file)
+    except Exception:
+        return None
+
+    if (compiled.get('version') != COMPILED_LAYOUT_VERSION or compiled.get('key') != key):
+        return None
+
+    return compiled['layout']
+
+def _readLayoutText(path):
     rows = []
     with open(path, 'r') as file:
         for line in file:
@@ -133,4 +378,20 @@ def getLayout(name, layout_dir = DEFAULT_LAYOUT_DIR, maxGhosts = None):
             if (line != ''):
                 rows.append(line)
 
-    return Layout(rows, maxGhosts)
+    return rows
+
+def _saveCompiledLayout(compiledPath, key, layout):
+    compiled = {
+        'version': COMPILED_LAYOUT_VERSION,
+        'key': key,
+        'layout': layout,
+    }
+
+    os.makedirs(os.path.dirname(compiledPath), exist_ok = True)
+
+    # Write to a temp file and then move, so concurrent runs never see a partial file.
+    tempPath = '%s.%d.tmp' % (compiledPath, os.getpid())
+    with open(tempPath, 'wb') as file:
+        pickle.dump(compiled, file)
+
+    os.replace(tempPath, compiledPath)
@@ -0,0 +1,222 @@
+"""
+Replays record the moves of games so they can be played back later.
+
+A replay archive is a text file that holds any number of games.
+Games are appended to an archive as they finish, and read back one game at a time,
+so large archives never need to be fully loaded.
+
+After a header line, each game in an archive looks like:
+```
+    game <JSON object with the other components of the game (team names, length, etc.)>
+    layout <number of ghosts> <number of rows>
+    <one line per layout row>
+    moves <index of the first agent to move> <number of agents> <one character per move>
+    keyframe <number of moves> <JSON snapshot of the state after that many moves>
+    ...
+    end
+```
+Agents always move in turn, so only the action of each move needs to be stored.
+Keyframes are optional, and allow a replay to start in the middle of a game
+without simulating every move before it (see `seekReplay`).
+"""
+
+import json
+import logging
+import os
+import pickle
+
+from pacai.core.directions import Directions
+from pacai.core.layout import Layout
+
+ARCHIVE_HEADER = '# pacai replay archive v1'
+
+DEFAULT_KEYFRAME_INTERVAL = 100
+
+ACTION_CODES = {
+    Directions.NORTH: 'N',
+    Directions.SOUTH: 'S',
+    Directions.EAST: 'E',
+    Directions.WEST: 'W',
+    Directions.STOP: 'X',
+}
+
+CODE_ACTIONS = {code: action for (action, code) in ACTION_CODES.items()}
+
+def appendReplay(path, layout, actions, numAgents, keyframes = None, **components):
+    """
+    Add a game to the end of a replay archive (creating the archive if necessary).
+    `actions` is a list of (agentIndex, action), like `pacai.core.game.Game.moveHistory`,
+    and `keyframes` is an optional result of `buildKeyframes`.
+    All other components must be JSON serializable.
+    Returns the text that was added to the archive.
+    """
+
+    text = encodeReplay(layout, actions, numAgents, keyframes, **components)
+
+    with open(path, 'a') as file:
+        if (file.tell() == 0):
+            file.write(ARCHIVE_HEADER + '\n')
+
+        # One write per game, so concurrent readers only ever see whole games.
+        file.write(text)
+
+    return text
+
+def buildKeyframes(state, actions, interval = DEFAULT_KEYFRAME_INTERVAL):
+    """
+    Get snapshots of a game every `interval` moves, by playing the actions from the initial state.
+    Returns a dict of {number of moves: snapshot}.
+    """
+
+    keyframes = {}
+
+    # Never apply the final action, it may be the one that crashed the game.
+    for moveIndex in range(len(actions) - 1):
+        agentIndex, action = actions[moveIndex]
+        state = state.generateSuccessor(agentIndex, action)
+
+        if ((moveIndex + 1) % interval == 0):
+            keyframes[moveIndex + 1] = state.getSnapshot()
+
+    return keyframes
+
+def encodeReplay(layout, actions, numAgents, keyframes = None, **components):
+    """
+    Get the archive text for a single game.
+    """
+
+    moves = []
+    start = 0
+    if (len(actions) > 0):
+        start = actions[0][0]
+
+    for (i, (agentIndex, action)) in enumerate(actions):
+        if (agentIndex != (start + i) % numAgents):
+            raise ValueError('Agent %d moved out of turn (move %d).' % (agentIndex, i))
+
+        if (action not in ACTION_CODES):
+            # Only the final move of a game (the one that crashed it) can be illegal.
+            logging.debug('Not recording illegal action: %s.' % (str(action)))
+            break
+
+        moves.append(ACTION_CODES[action])
+
+    lines = [
+        'game %s' % (json.dumps(components, sort_keys = True)),
+        'layout %d %d' % (layout.getNumGhosts(), len(layout.layoutText)),
+    ]
+    lines += layout.layoutText
+    lines.append('moves %d %d %s' % (start, numAgents, ''.join(moves)))
+
+    if (keyframes is not None):
+        for moveIndex in sorted(keyframes):
+            if (moveIndex <= len(moves)):
+                lines.append('keyframe %d %s' % (moveIndex,
+                        json.dumps(keyframes[moveIndex], sort_keys = True)))
+
+    lines.append('end')
+
+    return '\n'.join(lines) + '\n'
+
+def isArchive(path):
+    with open(path, 'rb') as file:
+        return file.read(len(ARCHIVE_HEADER)) == ARCHIVE_HEADER.encode()
+
+def readReplays(path):
+    """
+    Iterate over the games in a replay archive.
+    Each game is a dict with a layout, actions (a list of (agentIndex, action)),
+    keyframes (a dict of {number of moves: snapshot}),
+    and any other components that were recorded with the game.
+
+    Older (pickled, single game) replay files are also supported.
+    """
+
+    if (not os.path.isfile(path)):
+        raise ValueError("Could not locate replay file: '%s'." % (path))
+
+    if (not isArchive(path)):
+        with open(path, 'rb') as file:
+            components = pickle.load(file)
+
+        # The pickled layout only has the attributes layouts had when it was recorded,
+        # so rebuild it to get everything layouts have now.
+        oldLayout = components['layout']
+        components['layout'] = Layout(oldLayout.layoutText, maxGhosts = oldLayout.getNumGhosts())
+
+        yield components
+        return
+
+    # Archives usually hold many games on a few layouts, so share layouts between games.
+    layouts = {}
+
+    with open(path, 'r') as file:
+        lines = iter(file)
+        next(lines)
+
+        for line in lines:
+            line = line.rstrip('\n')
+            if (line == ''):
+                continue
+
+            try:
+                yield _decodeReplay(line, lines, layouts)
+            except StopIteration:
+                raise ValueError("Replay archive '%s' ends in the middle of a game." % (path))
+
+def _checkKeyword(expected, keyword):
+    if (keyword != expected):
+        raise ValueError("Malformed replay archive, expected '%s' but found '%s'." % (
+                expected, keyword))
+
+def _decodeReplay(gameLine, lines, layouts):
+    keyword, components = gameLine.split(' ', 1)
+    _checkKeyword('game', keyword)
+    replay = json.loads(components)
+
+    keyword, numGhosts, numRows = next(lines).split()
+    _checkKeyword('layout', keyword)
+    layoutText = [next(lines).rstrip('\n') for i in range(int(numRows))]
+
+    key = (int(numGhosts), tuple(layoutText))
+    if (key not in layouts):
+        layouts[key] = Layout(layoutText, maxGhosts = int(numGhosts))
+    replay['layout'] = layouts[key]
+
+    keyword, start, numAgents, codes = next(lines).rstrip('\n').split(' ', 3)
+    _checkKeyword('moves', keyword)
+    start = int(start)
+    numAgents = int(numAgents)
+    replay['actions'] = [((start + i) % numAgents, CODE_ACTIONS[code])
+            for (i, code) in enumerate(codes)]
+
+    replay['keyframes'] = {}
+    while (True):
+        line = next(lines).rstrip('\n')
+        if (line == 'end'):
+            break
+
+        keyword, moveIndex, snapshot = line.split(' ', 2)
+        _checkKeyword('keyframe', keyword)
+        replay['keyframes'][int(moveIndex)] = json.loads(snapshot)
+
+    return replay
+
+def seekReplay(state, actions, keyframes, start):
+    """
+    Get the state of a game after the first `start` actions have been applied to
+    the initial state (which may be modified).
+    The closest keyframe before the start is used, so only the moves after it are simulated.
+    """
+
+    position = 0
+    if (keyframes):
+        candidates = [moveIndex for moveIndex in keyframes if moveIndex <= start]
+        if (len(candidates) > 0):
+            position = max(candidates)
+            state.loadSnapshot(keyframes[position])
+
+    for (agentIndex, action) in actions[position:start]:
+        state = state.generateSuccessor(agentIndex, action)
+
+    return state
@@ -2,15 +2,25 @@ from pacai.util import reflection
 
 def createTeam(firstIndex, secondIndex, isRed,
         first = 'pacai.agents.capture.timeout.TimeoutAgent',
-        second = 'pacai.agents.capture.timeout.TimeoutAgent'):
+        second = 'pacai.agents.capture.timeout.TimeoutAgent',
+        waitMoveDurationSecs = None, waitInitDurationSecs = None):
     """
     A team for testing timeouts.
+    If given, the wait durations are passed to both agents
+    (see `pacai.agents.capture.timeout.TimeoutAgent`).
     """
 
     firstAgent = reflection.qualifiedImport(first)
     secondAgent = reflection.qualifiedImport(second)
 
+    waits = {}
+    if (waitMoveDurationSecs is not None):
+        waits['waitMoveDurationSecs'] = float(waitMoveDurationSecs)
+
+    if (waitInitDurationSecs is not None):
+        waits['waitInitDurationSecs'] = float(waitInitDurationSecs)
+
     return [
-        firstAgent(firstIndex),
-        secondAgent(secondIndex),
+        firstAgent(firstIndex, **waits),
+        secondAgent(secondIndex, **waits),
     ]
@@ -12,4 +12,4 @@ class CaptureAbstractView(AbstractView):
 
     # Override
     def _createFrame(self, state):
-        return CaptureFrame(self._frameCount, state, self._turnCount)
+        return CaptureFrame(self._frameCount, state, self._turnCount, self._lastFrame)
@@ -19,21 +19,45 @@ MAX_HIGHLIGHT_INTENSITY_RANGE = 150
 SCORE_X_POSITION = 0.55
 SCORE_Y_POSITION = -0.95
 
+# Walls never change during a game, so they are only drawn once for each layout and sprite sheet.
+# {(frame class, layout, id(sprites), cell size): (sprites, background, wall layer)}
+# The background is the walls drawn on an empty board,
+# and the wall layer is just the walls (on a transparent image) to draw over highlights.
+MAX_CACHED_BACKGROUNDS = 16
+_backgrounds = {}
+
+# The wall tokens of a board are also only worked out once for each layout.
+# {(frame class, layout): [[wall token or EMPTY_TOKEN, ...], ...]}
+MAX_CACHED_WALL_TOKENS = 16
+_wallTokens = {}
+
 class Frame(abc.ABC):
     """
     A general representation of that can be seen on-screen at a given time.
     Frames are the basic units of the views.
     """
 
-    def __init__(self, frame, state, turn):
+    def __init__(self, frame, state, turn, previousFrame = None):
+        """
+        If given, `previousFrame` should be the last frame made for the same game.
+        Its board is reused, with only the food and capsules that have since been eaten removed.
+        """
+
         self._frame = frame
         self._turn = turn
+        self._state = state
 
-        self._boardHeight = state.getInitialLayout().getHeight()
-        self._boardWidth = state.getInitialLayout().getWidth()
+        self._layout = state.getInitialLayout()
+        self._boardHeight = self._layout.getHeight()
+        self._boardWidth = self._layout.getWidth()
 
         # All items on the board are at integral potision.
-        self._board = self._buildBoard(state)
+        self._board = None
+        if (previousFrame is not None):
+            self._board = self._updateBoard(state, previousFrame)
+
+        if (self._board is None):
+            self._board = self._buildBoard(state)
 
         # Agents may not be at integral positions, so they are represented independently.
         self._agentTokens = self._getAgentTokens(state)
@@ -79,64 +103,124 @@ class Frame(abc.ABC):
     def getBoardWidth(self):
         return self._boardWidth
 
-    def toImage(self, sprites = {}, font = None):
-        # Height is +1 for the score.
-        size = (
-            self._boardWidth * spritesheet.SQUARE_SIZE,
-            (self._boardHeight + 1) * spritesheet.SQUARE_SIZE
-        )
+    def toImage(self, sprites = {}, font = None, cellSize = None):
+        """
+        Draw this frame.
+        Each cell of the board is drawn as a `cellSize` (width, height) rectangle,
+        which defaults to the size of a sprite (`pacai.ui.spritesheet.SQUARE_SIZE`).
+        Frames drawn at other sizes should use sprites (and a font) scaled to match,
+        see `pacai.ui.spritesheet.scaleSprites`.
+        """
+
+        if (cellSize is None):
+            cellSize = (spritesheet.SQUARE_SIZE, spritesheet.SQUARE_SIZE)
+
+        background, wallLayer = self._getBackground(sprites, cellSize)
+
+        if (len(self._highlightLocations) == 0):
+            image = background.copy()
+            draw = ImageDraw.Draw(image)
+        else:
+            image = Image.new('RGB', background.size, (0, 0, 0, 255))
+            draw = ImageDraw.Draw(image)
 
-        image = Image.new('RGB', size, (0, 0, 0, 255))
-        draw = ImageDraw.Draw(image)
+            # First, draw any highlights.
+            for i in range(len(self._highlightLocations)):
+                (x, y) = self._highlightLocations[i]
+                startPoint = self._toImageCoords(x, y, cellSize)
+                endPoint = self._toImageCoords(x + 1, y - 1, cellSize)
 
-        # First, draw any highlights.
-        for i in range(len(self._highlightLocations)):
-            (x, y) = self._highlightLocations[i]
-            startPoint = self._toImageCoords(x, y)
-            endPoint = self._toImageCoords(x + 1, y - 1)
+                intensity = int((i / len(self._highlightLocations))
+                        * MAX_HIGHLIGHT_INTENSITY_RANGE)
 
-            intensity = int((i / len(self._highlightLocations)) * MAX_HIGHLIGHT_INTENSITY_RANGE)
+                draw.rectangle([startPoint, endPoint], fill = (255, intensity, intensity))
 
-            draw.rectangle([startPoint, endPoint], fill = (255, intensity, intensity))
+            # Then, the walls.
+            image.paste(wallLayer, (0, 0), wallLayer)
 
-        # Then, draw the board.
+        # Then, draw the rest of the board.
         for x in range(self._boardWidth):
             for y in range(self._boardHeight):
-                if (self._board[x][y] != token.EMPTY_TOKEN):
-                    self._placeToken(x, y, self._board[x][y], sprites, image, draw)
+                objectToken = self._board[x][y]
+                if (objectToken != token.EMPTY_TOKEN and not token.isWall(objectToken)):
+                    self._placeToken(x, y, objectToken, sprites, image, draw, cellSize)
 
         # Finally, overlay the agents.
         for ((x, y), agentToken) in self._agentTokens.items():
-            self._placeToken(x, y, agentToken, sprites, image, draw)
+            self._placeToken(x, y, agentToken, sprites, image, draw, cellSize)
 
         # Draw score
-        position = self._toImageCoords(SCORE_X_POSITION, SCORE_Y_POSITION)
+        position = self._toImageCoords(SCORE_X_POSITION, SCORE_Y_POSITION, cellSize)
         scoreText = "Score: %d" % (self._score)
         draw.text(position, scoreText, self._getTextColor(), font)
 
         return image
 
     def _buildBoard(self, state):
-        board = self._boardWidth * [None]
-        for x in range(self._boardWidth):
+        board = [list(items) for items in self._getWallTokens(state)]
 
-            items = self._boardHeight * [token.EMPTY_TOKEN]
+        for x in range(self._boardWidth):
+            items = board[x]
             for y in range(self._boardHeight):
-                if (state.hasWall(x, y)):
-                    items[y] = self._getWallToken(x, y, state)
-                elif (state.hasFood(x, y)):
+                if (items[y] != token.EMPTY_TOKEN):
+                    continue
+
+                if (state.hasFood(x, y)):
                     items[y] = self._getFoodToken(x, y, state)
                 elif (state.hasCapsule(x, y)):
                     items[y] = self._getCapsuleToken(x, y, state)
 
-            board[x] = items
-
         return board
 
     @abc.abstractmethod
     def _getAgentBaseToken(self, x, y, agentIndex, state):
         pass
 
+    def _getBackground(self, sprites, cellSize):
+        """
+        Get the (cached) background and wall layer for this frame's layout.
+        """
+
+        key = (type(self), self._layout, id(sprites), cellSize)
+
+        cached = _backgrounds.get(key)
+        if (cached is not None and cached[0] is sprites):
+            return cached[1], cached[2]
+
+        # Height is +1 for the score.
+        size = (
+            self._boardWidth * cellSize[0],
+            (self._boardHeight + 1) * cellSize[1]
+        )
+
+        # Walls never overlap, so each can be copied into the layer as-is (including its alpha).
+        wallLayer = Image.new('RGBA', size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(wallLayer)
+
+        wallTokens = self._getWallTokens(self._state)
+        for x in range(self._boardWidth):
+            for y in range(self._boardHeight):
+                objectToken = wallTokens[x][y]
+                if (objectToken == token.EMPTY_TOKEN):
+                    continue
+
+                if (objectToken in sprites):
+                    wallLayer.paste(sprites[objectToken], self._toImageCoords(x, y, cellSize))
+                else:
+                    self._placeToken(x, y, objectToken, sprites, wallLayer, draw, cellSize)
+
+        background = Image.new('RGB', size, (0, 0, 0, 255))
+        background.paste(wallLayer, (0, 0), wallLayer)
+
+        if (len(_backgrounds) >= MAX_CACHED_BACKGROUNDS):
+            # Forget the oldest background.
+            # Frames may be rendered on several threads, so another thread may have beaten us to it.
+            _backgrounds.pop(next(iter(_backgrounds)), None)
+
+        _backgrounds[key] = (sprites, background, wallLayer)
+
+        return background, wallLayer
+
     def _getAgentTokens(self, state):
         """
         Returns: {(x, y): token, ...}
@@ -205,9 +289,37 @@ class Frame(abc.ABC):
 
         return token.getWallToken(baseToken, hasWallN, hasWallE, hasWallS, hasWallW)
 
-    def _placeToken(self, x, y, objectToken, sprites, image, draw):
-        startPoint = self._toImageCoords(x, y)
-        endPoint = self._toImageCoords(x + 1, y - 1)
+    def _getWallTokens(self, state):
+        """
+        Get the (cached) board of just the walls for this frame's layout.
+        The caller should not modify the board.
+        """
+
+        key = (type(self), self._layout)
+
+        wallTokens = _wallTokens.get(key)
+        if (wallTokens is not None):
+            return wallTokens
+
+        wallTokens = self._boardWidth * [None]
+        for x in range(self._boardWidth):
+            items = self._boardHeight * [token.EMPTY_TOKEN]
+            for y in range(self._boardHeight):
+                if (state.hasWall(x, y)):
+                    items[y] = self._getWallToken(x, y, state)
+
+            wallTokens[x] = items
+
+        if (len(_wallTokens) >= MAX_CACHED_WALL_TOKENS):
+            _wallTokens.pop(next(iter(_wallTokens)), None)
+
+        _wallTokens[key] = wallTokens
+
+        return wallTokens
+
+    def _placeToken(self, x, y, objectToken, sprites, image, draw, cellSize = None):
+        startPoint = self._toImageCoords(x, y, cellSize)
+        endPoint = self._toImageCoords(x + 1, y - 1, cellSize)
 
         if (objectToken in sprites):
             image.paste(sprites[objectToken], startPoint, sprites[objectToken])
@@ -215,11 +327,49 @@ class Frame(abc.ABC):
             color = self._tokenToColor(objectToken)
             draw.rectangle([startPoint, endPoint], fill = color)
 
-    def _toImageCoords(self, x, y):
+    def _updateBoard(self, state, previousFrame):
+        """
+        Build this frame's board from the board of a previous frame.
+        Columns that did not change are shared with the previous frame.
+        Returns None if the previous frame is not from the same game.
+        """
+
+        if (type(previousFrame) is not type(self) or previousFrame._layout is not self._layout):
+            return None
+
+        previousState = previousFrame._state
+        delta = state.getDelta(previousState)
+
+        # Food and capsules are only ever eaten during a game,
+        # so anything else (e.g. a new game) needs a full build.
+        if ((state.getNumFood() + len(delta.foodEaten) != previousState.getNumFood())
+                or (len(state.getCapsules()) + len(delta.capsulesEaten)
+                    != len(previousState.getCapsules()))):
+            return None
+
+        board = list(previousFrame._board)
+        copiedColumns = set()
+
+        for (x, y) in delta.foodEaten + delta.capsulesEaten:
+            if (x not in copiedColumns):
+                board[x] = list(board[x])
+                copiedColumns.add(x)
+
+            if (state.hasCapsule(x, y)):
+                board[x][y] = self._getCapsuleToken(x, y, state)
+            else:
+                board[x][y] = token.EMPTY_TOKEN
+
+        return board
+
+    def _toImageCoords(self, x, y, cellSize = None):
+        if (cellSize is None):
+            cellSize = (spritesheet.SQUARE_SIZE, spritesheet.SQUARE_SIZE)
+
         # PIL has (0, 0) as the upper-left, while pacai has it as the lower-left.
         return (
-            int(x * spritesheet.SQUARE_SIZE),
-            int((self._boardHeight - 1 - y) * spritesheet.SQUARE_SIZE)
+            int(x * cellSize[0]),
+            int((self._boardHeight - 1 - y) * cellSize[1])
         )
 
     def _tokenToColor(self, objectToken):
@@ -241,3 +391,13 @@ class Frame(abc.ABC):
             return (0, 255, 0)
         else:
             return (0, 0, 0)
+
+def forgetBackgrounds(cellSize):
+    """
+    Drop the cached backgrounds drawn at a cell size
+    (e.g. once a window has been resized away from that size).
+    """
+
+    for key in list(_backgrounds):
+        if (key[3] == cellSize):
+            _backgrounds.pop(key, None)
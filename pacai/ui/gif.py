@@ -0,0 +1,79 @@
+"""
+Write animated gifs one frame at a time.
+"""
+
+import os
+
+from PIL import GifImagePlugin
+from PIL import Image
+from PIL import ImageChops
+
+GIF_TRAILER = b';'
+
+class GifWriter(object):
+    """
+    Encodes each frame to the gif as soon as it is added,
+    so only the last frame (not the whole animation) is held in memory.
+
+    Each frame gets its own palette, and only the part of a frame
+    that changed from the previous frame is written.
+    A writer can be closed and then added to again (e.g. for the next game using the same view),
+    the new frames are added to the end of the same gif.
+    """
+
+    def __init__(self, path, frameDurationMS):
+        self._path = path
+        self._frameDurationMS = frameDurationMS
+
+        self._file = None
+        self._lastImage = None
+
+    def addFrame(self, image):
+        image = image.convert('RGB')
+
+        if (self._file is None):
+            self._open(image)
+
+        box = (0, 0) + image.size
+        if (self._lastImage is not None and self._lastImage.size == image.size):
+            box = ImageChops.difference(self._lastImage, image).getbbox()
+            if (box is None):
+                # Nothing changed, but the frame still needs to take up time.
+                box = (0, 0, 1, 1)
+
+        self._lastImage = image
+
+        frame = image.crop(box).convert('P', palette = Image.ADAPTIVE)
+        for data in GifImagePlugin.getdata(frame, offset = box[0:2],
+                duration = self._frameDurationMS, include_color_table = True):
+            self._file.write(data)
+
+    def close(self):
+        """
+        Finish the gif, so it can be viewed.
+        """
+
+        if (self._file is None):
+            return
+
+        self._file.write(GIF_TRAILER)
+        self._file.close()
+        self._file = None
+
+    def _open(self, image):
+        if (self._lastImage is not None and os.path.isfile(self._path)):
+            # Continue a gif that was closed, by writing over its trailer.
+            self._file = open(self._path, 'r+b')
+            self._file.seek(-len(GIF_TRAILER), os.SEEK_END)
+            return
+
+        self._file = open(self._path, 'wb')
+
+        header = image.convert('P', palette = Image.ADAPTIVE)
+        headerData, _ = GifImagePlugin.getheader(header, info = {
+            'duration': self._frameDurationMS,
+            'loop': 0,
+        })
+
+        for data in headerData:
+            self._file.write(data)
@@ -3,12 +3,16 @@ import sys
 import time
 import tkinter
 
-from PIL import Image
+from PIL import ImageFont
 from PIL import ImageTk
 
 from pacai.ui.keyboard import Keyboard
+from pacai.ui import frame as frameModule
 from pacai.ui import spritesheet
+from pacai.ui.renderer import FrameRenderer
 from pacai.ui.view import AbstractView
+from pacai.ui.view import FONT_PATH
+from pacai.ui.view import FONT_SIZE
 
 MAX_FPS = 1000
 TK_BASE_NAME = 'pacai'
@@ -21,6 +25,10 @@ class AbstractGUIView(AbstractView):
     """
     Most of the functionality necessary to draw graphics in a window.
     `tkinter` is used, so Tk must be installed on the machine.
+
+    Frames are turned into images on a background thread (see `pacai.ui.renderer`),
+    so the game does not wait on drawing.
+    Only handing the newest image to Tk is done on the game's thread.
     """
 
     def __init__(self, fps = 0, title = 'pacai', **kwargs):
@@ -60,6 +68,17 @@ class AbstractGUIView(AbstractView):
         self._dead = False
         self._keyboard = None
 
+        self._renderer = FrameRenderer()
+
+        # Sprites (and a font) scaled to the window, see _getScaledSprites().
+        # Cleared whenever the window is resized.
+        self._scaledCellSize = None
+        self._scaledSprites = None
+        self._scaledFont = None
+
+        # Tk does not keep a reference to the image it is showing.
+        self._tkImage = None
+
     # Override
     def finish(self):
         super().finish()
@@ -86,8 +105,9 @@ class AbstractGUIView(AbstractView):
             state.getInitialLayout().getWidth() * spritesheet.SQUARE_SIZE)
 
         if (self._canvas is None):
+            # The board may not exactly fill the window, so match the board's background.
             self._canvas = tkinter.Canvas(self._root, height = self._height, width = self._width,
-                    highlightthickness = 0)
+                    highlightthickness = 0, background = 'black')
 
         self._imageArea = self._canvas.create_image(0, 0, image = None, anchor = tkinter.NW)
         self._canvas.pack(fill = 'both', expand = True)
@@ -105,6 +125,8 @@ class AbstractGUIView(AbstractView):
         # Sleep for a short period, so the last state of the game can be seen.
         time.sleep(DEATH_SLEEP_TIME)
 
+        self._renderer.stop()
+
         if (self._root is not None):
             self._root.destroy()
             self._root = None
@@ -157,21 +179,50 @@ class AbstractGUIView(AbstractView):
         if (not forceDraw and self._adjustFPS()):
             return
 
-        image = frame.toImage(self._sprites, self._font)
-
-        # Check for a resize.
-        if (self._height != frame.getImageHeight() or self._width != frame.getImageWidth()):
-            image = image.resize((self._width, self._height), resample = Image.LANCZOS)
-
-        # Convert the image into a tk image.
-        image = ImageTk.PhotoImage(image)
-        self._canvas.itemconfig(self._imageArea, image = image)
+        # Draw the frame to fit the window.
+        # Height is +1 for the score.
+        cellSize = (
+            max(1, self._width // frame.getBoardWidth()),
+            max(1, self._height // (frame.getBoardHeight() + 1))
+        )
+        sprites, font = self._getScaledSprites(cellSize)
+
+        frameNumber = self._renderer.render(frame, sprites, font, cellSize)
+        if (forceDraw):
+            # Forced frames (e.g. the end of the game) must be shown, so wait for them.
+            self._renderer.wait(frameNumber)
+
+        # Show the newest image that is ready (usually the frame before this one).
+        image = self._renderer.takeImage()
+        if (image is not None):
+            # Convert the image into a tk image.
+            self._tkImage = ImageTk.PhotoImage(image)
+            self._canvas.itemconfig(self._imageArea, image = self._tkImage)
 
         self._root.update_idletasks()
         self._root.update()
 
         self._lastDrawTime = time.time()
 
+    def _getScaledSprites(self, cellSize):
+        """
+        Get the sprites and font to draw cells of the given size with.
+        Sprites are only scaled once for each window size.
+        """
+
+        if (cellSize == (spritesheet.SQUARE_SIZE, spritesheet.SQUARE_SIZE)):
+            return self._sprites, self._font
+
+        if (self._scaledCellSize != cellSize):
+            self._scaledSprites = spritesheet.scaleSprites(self._sprites, *cellSize)
+
+            fontSize = max(1, int(FONT_SIZE * cellSize[1] / spritesheet.SQUARE_SIZE))
+            self._scaledFont = ImageFont.truetype(FONT_PATH, fontSize)
+
+            self._scaledCellSize = cellSize
+
+        return self._scaledSprites, self._scaledFont
+
     def _resize(self, event):
         if (self._width == event.width and self._height == event.height):
             return
@@ -184,6 +235,14 @@ class AbstractGUIView(AbstractView):
         self._width = max(MIN_WINDOW_WIDTH, event.width)
         self._height = max(MIN_WINDOW_HEIGHT, event.height)
 
+        # The scaled sprites (and any backgrounds drawn with them) are for the old size.
+        if (self._scaledCellSize is not None):
+            frameModule.forgetBackgrounds(self._scaledCellSize)
+
+        self._scaledCellSize = None
+        self._scaledSprites = None
+        self._scaledFont = None
+
         self._canvas.config(width = self._width, height = self._height)
         self._canvas.pack(fill = 'both', expand = True)
 
@@ -12,4 +12,4 @@ class PacmanAbstractView(AbstractView):
 
     # Override
     def _createFrame(self, state):
-        return PacmanFrame(self._frameCount, state, self._turnCount)
+        return PacmanFrame(self._frameCount, state, self._turnCount, self._lastFrame)
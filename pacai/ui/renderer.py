@@ -0,0 +1,109 @@
+"""
+Render frames to images in the background.
+"""
+
+import threading
+
+class FrameRenderer(object):
+    """
+    Turns frames into images on a worker thread,
+    so drawing does not hold up the game.
+
+    Only the latest frame matters:
+    a frame that is waiting to be rendered is replaced by any newer frame,
+    and a rendered image that has not been taken is replaced by any newer image.
+    So the renderer never holds more than one waiting frame and one finished image.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+
+        # The number of frames requested so far, used to identify each frame.
+        self._requestCount = 0
+        # (frame number, frame, toImage() arguments) of the frame waiting to be rendered.
+        self._pending = None
+        # (frame number, image) of the last frame rendered.
+        self._rendered = None
+        self._lastRenderedNumber = 0
+
+        # An exception raised while rendering, raised again for the caller.
+        self._error = None
+
+        self._stopped = False
+        self._thread = threading.Thread(target = self._run, name = 'pacai-renderer', daemon = True)
+        self._thread.start()
+
+    def render(self, frame, sprites = {}, font = None, cellSize = None):
+        """
+        Request that a frame be rendered (see `pacai.ui.frame.Frame.toImage`).
+        Returns the number of the frame, see `FrameRenderer.wait`.
+        """
+
+        with self._condition:
+            self._requestCount += 1
+            self._pending = (self._requestCount, frame, (sprites, font, cellSize))
+            self._condition.notify_all()
+
+            return self._requestCount
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+        self._thread.join()
+
+    def takeImage(self):
+        """
+        Get the image of the newest frame rendered since the last call (or None).
+        """
+
+        with self._condition:
+            self._checkError()
+
+            rendered = self._rendered
+            self._rendered = None
+
+        if (rendered is None):
+            return None
+
+        return rendered[1]
+
+    def wait(self, frameNumber):
+        """
+        Block until the given frame (or a newer one) has been rendered.
+        """
+
+        with self._condition:
+            self._condition.wait_for(
+                    lambda: (self._stopped or self._lastRenderedNumber >= frameNumber))
+            self._checkError()
+
+    def _checkError(self):
+        if (self._error is not None):
+            raise RuntimeError('Failed to render a frame.') from self._error
+
+    def _run(self):
+        while (True):
+            with self._condition:
+                self._condition.wait_for(lambda: (self._stopped or self._pending is not None))
+                if (self._stopped):
+                    return
+
+                frameNumber, frame, args = self._pending
+                self._pending = None
+
+            try:
+                image = frame.toImage(*args)
+            except Exception as ex:
+                with self._condition:
+                    self._error = ex
+                    self._stopped = True
+                    self._condition.notify_all()
+
+                return
+
+            with self._condition:
+                self._rendered = (frameNumber, image)
+                self._lastRenderedNumber = frameNumber
+                self._condition.notify_all()
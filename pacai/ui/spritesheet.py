@@ -105,6 +105,16 @@ def loadSpriteSheet(path):
 
     return sprites
 
+def scaleSprites(sprites, width, height):
+    """
+    Get a copy of loaded sprites that are each resized to (width, height).
+    Scaling the sprites once lets frames be drawn directly at any size
+    (instead of resizing every drawn frame).
+    """
+
+    return {spriteToken: sprite.resize((width, height), resample = Image.LANCZOS)
+            for (spriteToken, sprite) in sprites.items()}
+
 def _cropSprite(spritesheet, row, col):
     # (left, upper, right, lower)
     rectangle = (
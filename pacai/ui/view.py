@@ -3,6 +3,7 @@ import os
 
 from PIL import ImageFont
 
+from pacai.ui import gif
 from pacai.ui import spritesheet
 
 DEFAULT_GIF_FPS = 10
@@ -14,6 +15,7 @@ DEFAULT_SPRITES = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'pac
 
 THIS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)))
 FONT_PATH = os.path.join(THIS_DIR, 'fonts', 'roboto', 'RobotoMono-Regular.ttf')
+FONT_SIZE = spritesheet.SQUARE_SIZE - 14
 
 class AbstractView(abc.ABC):
     """
@@ -32,29 +34,31 @@ class AbstractView(abc.ABC):
 
         self._saveFrames = (self._gifPath is not None)
         self._skipFrames = max(1, int(skipFrames))
-        self._keyFrames = []
+
+        # Key frames are written to the gif as they are made.
+        self._gifWriter = None
+        if (self._saveFrames):
+            self._gifWriter = gif.GifWriter(self._gifPath, int(1.0 / self._gifFPS * 1000.0))
 
         # The number of frames this view has produced.
         self._frameCount = 0
+        # The last frame this view has produced, new frames are built from it.
+        self._lastFrame = None
         # The number of turns this view has produced.
         # (Tracked by the number of times agent 0 has been animated.)
         self._turnCount = 0
 
         self._sprites = spritesheet.loadSpriteSheet(spritesPath)
-        self._font = ImageFont.truetype(FONT_PATH, spritesheet.SQUARE_SIZE - 14)
+        self._font = ImageFont.truetype(FONT_PATH, FONT_SIZE)
 
     def finish(self):
         """
         Signal that the game is over and the UI should cleanup.
         """
 
-        # Save the gif.
-        if (self._saveFrames and len(self._keyFrames) > 0):
-            gifTimePerFrameMS = int(1.0 / self._gifFPS * 1000.0)
-
-            images = [frame.toImage(self._sprites, self._font) for frame in self._keyFrames]
-            images[0].save(self._gifPath, save_all = True, append_images = images,
-                    duration = gifTimePerFrameMS, loop = 0, optimize = False)
+        # Finish the gif.
+        if (self._saveFrames):
+            self._gifWriter.close()
 
     def getKeyboard(self):
         """
@@ -79,9 +83,12 @@ class AbstractView(abc.ABC):
             forceDraw = True
 
         frame = self._createFrame(state)
+        if (frame is not None):
+            self._lastFrame = frame
+
         if (frame is not None and self._saveFrames
                 and (state.isOver() or (self._frameCount % self._skipFrames == 0))):
-            self._keyFrames.append(frame)
+            self._gifWriter.addFrame(frame.toImage(self._sprites, self._font))
 
         self._drawFrame(state, frame, forceDraw = forceDraw)
 
@@ -93,7 +100,8 @@ class AbstractView(abc.ABC):
     def _createFrame(self, state):
         """
         Create the frame using the given state.
-        Children can decide on the correct concrete representation of a frame.
+        Children can decide on the correct concrete representation of a frame,
+        and should build it from the last frame (if there is one).
         """
 
         pass
@@ -2,9 +2,18 @@
 Various utility functions.
 """
 
+import random
+
 INITIAL_HASH_VALUE = 17
 HASH_MULTIPLIER = 37
 
+ZOBRIST_KEY_BITS = 64
+ZOBRIST_SEED = 4
+
+# Use a private generator so creating keys does not disturb the global random state.
+_zobristRandom = random.Random(ZOBRIST_SEED)
+_zobristKeys = {}
+
 def arrayInvert(array):
     """
     Inverts a matrix stored as a list of lists.
@@ -64,3 +73,20 @@ def sign(x):
         return 1
     else:
         return -1
+
+def zobristKey(*components):
+    """
+    Get the Zobrist key for a single feature of a state, e.g. zobristKey('food', x, y).
+    A Zobrist hash is the XOR of the keys for all the features a state has,
+    so adding or removing a feature is just XORing its key into the hash.
+
+    Keys are random and created on first use,
+    so they are only stable for the life of the process.
+    """
+
+    key = _zobristKeys.get(components)
+    if (key is None):
+        key = _zobristRandom.getrandbits(ZOBRIST_KEY_BITS)
+        _zobristKeys[components] = key
+
+    return key
@@ -0,0 +1,78 @@
+import random
+import unittest
+
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.batch import PacmanBatch
+from pacai.core.layout import getLayout
+
+NUM_GAMES = 10
+MAX_ROUNDS = 150
+
+class PacmanBatchTest(unittest.TestCase):
+    """
+    Test that batched games follow the same rules as normal game states.
+    """
+
+    def test_matches_game_states(self):
+        for layoutName in ['smallClassic', 'capsuleClassic', 'trickyClassic']:
+            self._checkLayout(getLayout(layoutName))
+
+    def test_reset(self):
+        layout = getLayout('smallClassic')
+        batch = PacmanBatch(layout, 3)
+
+        batch.step(0, [actions[0] for actions in batch.getLegalActions(0)])
+        self.assertNotEqual(PacmanGameState(layout), batch.getGameState(1))
+
+        batch.reset([1])
+        self.assertEqual(PacmanGameState(layout), batch.getGameState(1))
+        self.assertNotEqual(PacmanGameState(layout), batch.getGameState(0))
+
+    def test_illegal_action(self):
+        batch = PacmanBatch(getLayout('smallClassic'), 2)
+
+        with self.assertRaises(ValueError):
+            batch.step(0, ['Jump', 'Jump'])
+
+        with self.assertRaises(ValueError):
+            batch.step(0, [batch.getLegalActions(0)[0][0]])
+
+    def _checkLayout(self, layout):
+        rng = random.Random(4)
+
+        batch = PacmanBatch(layout, NUM_GAMES)
+        states = [PacmanGameState(layout) for i in range(NUM_GAMES)]
+
+        for round in range(MAX_ROUNDS):
+            for agentIndex in range(batch.getNumAgents()):
+                legalActions = batch.getLegalActions(agentIndex)
+
+                actions = []
+                for gameIndex in range(NUM_GAMES):
+                    state = states[gameIndex]
+                    if (state.isOver()):
+                        self.assertEqual([], legalActions[gameIndex])
+                        actions.append(None)
+                        continue
+
+                    self.assertEqual(state.getLegalActions(agentIndex), legalActions[gameIndex])
+                    actions.append(rng.choice(legalActions[gameIndex]))
+
+                    states[gameIndex] = state.generateSuccessor(agentIndex, actions[-1])
+
+                batch.step(agentIndex, actions)
+
+            for gameIndex in range(NUM_GAMES):
+                state = states[gameIndex]
+                batchState = batch.getGameState(gameIndex)
+
+                self.assertEqual(state, batchState)
+                self.assertEqual(state.getSnapshot(), batchState.getSnapshot())
+                self.assertEqual(state.getScore(), batch.getScores()[gameIndex])
+                self.assertEqual(state.isWin(), batch.isWin()[gameIndex])
+
+            if (all(batch.isOver())):
+                break
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,6 +21,26 @@ class BinTest(unittest.TestCase):
             # Expected exception.
             pass
 
+    def test_pacman_parallel(self):
+        # Games are seeded per game, so the number of jobs should not matter.
+        baseArgs = ['-p', 'GreedyAgent', '--null-graphics', '--num-games', '4', '--seed', '1234']
+
+        games = pacman.main(baseArgs + ['--jobs', '1'])
+        moves = [game.moveHistory for game in games]
+        self.assertEqual(4, len(moves))
+
+        for jobs in ['2', '3']:
+            games = pacman.main(baseArgs + ['--jobs', jobs])
+            self.assertEqual(moves, [game.moveHistory for game in games])
+
+        # Parallel games need null graphics.
+        try:
+            pacman.main(['-p', 'GreedyAgent', '--text-graphics', '--jobs', '2'])
+            self.fail("Test did not raise expected exception.")
+        except ValueError:
+            # Expected exception.
+            pass
+
     def test_pacman_help(self):
         # Show all pacman arguments.
         try:
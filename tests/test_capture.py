@@ -1,7 +1,37 @@
+import random
+import time
 import unittest
 
 from pacai.bin import capture
+from pacai.agents import remote
 from pacai.agents.capture.timeout import TimeoutAgent
+from pacai.agents.random import RandomAgent
+from pacai.core.layout import getLayout
+from pacai.ui.capture.null import CaptureNullView
+
+class DeadlineAgent(RandomAgent):
+    """
+    A random agent that remembers how much time it was given.
+    """
+
+    def __init__(self, index, **kwargs):
+        super().__init__(index, **kwargs)
+
+        self.startupTimeLeft = None
+        self.timesLeft = []
+
+        # (deadline, time the deadline was checked) for each move.
+        self.deadlines = []
+
+    def registerInitialState(self, state):
+        self.startupTimeLeft = self.getTimeLeft()
+
+    def getAction(self, state):
+        self.deadlines.append((self.getDeadline(), time.perf_counter()))
+        self.timesLeft.append(self.getTimeLeft())
+        time.sleep(0.01)
+
+        return super().getAction(state)
 
 class CaptureTest(unittest.TestCase):
     def test_base(self):
@@ -92,3 +122,121 @@ class CaptureTest(unittest.TestCase):
         # Each blue agent should get a warning on every turn.
         # The game ends right away at the third warning an agent gets.
         self.assertEqual(5, sum(games[0].totalAgentTimeWarnings))
+
+    def test_deadlines(self):
+        random.seed(4)
+
+        agents = [DeadlineAgent(index) for index in range(4)]
+        self.assertIsNone(agents[0].getTimeLeft())
+
+        # Budgets are far apart, so which one applies does not depend on how fast the machine is.
+        game = capture.CaptureRules().newGame(getLayout('defaultCapture'), agents,
+                CaptureNullView(), 16, True,
+                maxTotalAgentTimeSecs = 10,
+                maxStartupTimeSecs = 30,
+                moveWarningTimeSecs = 100,
+                moveTimeoutTimeSecs = 200,
+                maxMoveWarnings = 1)
+        game.run()
+
+        self.assertFalse(game.agentCrashed)
+
+        for agent in agents:
+            self.assertTrue(10 < agent.startupTimeLeft <= 30)
+            self.assertEqual(4, len(agent.timesLeft))
+
+            for (deadline, checkTime) in agent.deadlines:
+                self.assertTrue(deadline > checkTime)
+
+            # The total time left is less than the move timeout,
+            # and shrinks by (at least) the time slept every move.
+            self.assertTrue(agent.timesLeft[0] <= 10)
+            for i in range(1, len(agent.timesLeft)):
+                self.assertTrue(agent.timesLeft[i] <= agent.timesLeft[i - 1] - 0.01)
+
+    def test_deadline_warnings(self):
+        random.seed(4)
+
+        agents = [DeadlineAgent(index) for index in range(4)]
+
+        # Agents with no warnings left must finish within the warning time.
+        game = capture.CaptureRules().newGame(getLayout('defaultCapture'), agents,
+                CaptureNullView(), 8, True,
+                moveWarningTimeSecs = 10,
+                moveTimeoutTimeSecs = 100,
+                maxMoveWarnings = 0)
+        game.run()
+
+        for agent in agents:
+            self.assertTrue(0 < agent.timesLeft[0] <= 10)
+
+    def test_deadlines_not_enforced(self):
+        random.seed(4)
+
+        agents = [DeadlineAgent(index) for index in range(4)]
+
+        # Without enforced timeouts, agents have no deadlines.
+        game = capture.CaptureRules().newGame(getLayout('defaultCapture'), agents,
+                CaptureNullView(), 8, False)
+        game.run()
+
+        for agent in agents:
+            self.assertIsNone(agent.startupTimeLeft)
+            self.assertEqual([None, None], agent.timesLeft)
+
+    def test_agent_processes(self):
+        for mode in capture.AGENT_PROCESS_MODES:
+            games = capture.main([
+                '--null-graphics',
+                '--catch-exceptions',
+                '--agent-processes', mode,
+                '--max-moves', '16',
+            ])
+
+            self.assertTrue(games[0].gameOver)
+            self.assertFalse(games[0].agentCrashed)
+            self.assertEqual(16, len(games[0].moveHistory))
+
+    def test_agent_processes_move_timeout(self):
+        # Without preemption, this game would take minutes.
+        # The wait is passed to the team (instead of set on TimeoutAgent),
+        # since the agent's process may not share this process's state.
+        startTime = time.time()
+        games = capture.main([
+            '--null-graphics',
+            '--catch-exceptions',
+            '--blue', 'pacai.core.timeoutTeam',
+            '--blue-args', 'waitMoveDurationSecs=60',
+            '--agent-processes', 'team',
+            '--move-timeout-time', '0.2',
+        ])
+
+        self.assertTrue(time.time() - startTime < 30)
+
+        self.assertTrue(games[0].gameOver)
+        self.assertTrue(games[0].agentCrashed)
+        self.assertTrue(games[0].agentTimeout)
+
+    def test_agent_processes_killed_host(self):
+        layout = getLayout('defaultCapture')
+        state = capture.CaptureGameState(layout, 100)
+
+        host = remote.AgentHost(capture.loadAgents, (False, 'pacai.core.baselineTeam', True, {}))
+        agents = [remote.RemoteAgent(index, host) for index in capture.getTeamIndices(False)]
+
+        try:
+            for agent in agents:
+                agent.registerInitialState(state)
+
+            # Once the host is gone (e.g. killed for a timeout), the end of the game is ignored.
+            host.kill()
+            for agent in agents:
+                agent.observeDeltas([state.getDelta(state)])
+                agent.final(state)
+
+            # The host is started again for the next game.
+            agents[0].registerInitialState(state)
+            self.assertTrue(host.isAlive())
+            self.assertIn(agents[0].getAction(state), state.getLegalActions(agents[0].index))
+        finally:
+            remote.closeAgents(agents)
@@ -0,0 +1,186 @@
+import os
+import tempfile
+import unittest
+
+from pacai.core import distanceCalculator
+from pacai.core.actions import Actions
+from pacai.core.layout import getLayout
+
+"""
+Test the maze distance calculator.
+"""
+class DistanceTest(unittest.TestCase):
+    def _bfs(self, layout, source):
+        distances = {source: 0}
+        frontier = [source]
+
+        while (len(frontier) > 0):
+            nextFrontier = []
+
+            for position in frontier:
+                for neighbor in Actions.getLegalNeighbors(position, layout.walls):
+                    if (neighbor not in distances):
+                        distances[neighbor] = distances[position] + 1
+                        nextFrontier.append(neighbor)
+
+            frontier = nextFrontier
+
+        return distances
+
+    def test_maze_distances(self):
+        layout = getLayout('mediumClassic')
+
+        distancer = distanceCalculator.Distancer(layout)
+        distancer.getMazeDistances()
+        self.assertTrue(distancer.isReadyForMazeDistance())
+
+        positions = layout.walls.asList(False)
+        for source in positions[::7]:
+            expected = self._bfs(layout, source)
+
+            for target in positions:
+                self.assertEqual(expected[target], distancer.getDistance(source, target))
+
+    def test_distance_on_grid(self):
+        layout = getLayout('mediumClassic')
+        distances = distanceCalculator.computeDistances(layout)
+
+        self.assertEqual(2, distanceCalculator.getDistanceOnGrid(distances, (1, 1), (3, 1),
+                layout = layout))
+
+        # Tables in the old (dict) form still work without a layout.
+        oldDistances = {((1, 1), (3, 1)): 2}
+        self.assertEqual(2, distanceCalculator.getDistanceOnGrid(oldDistances, (1, 1), (3, 1)))
+        self.assertEqual(distanceCalculator.DEFAULT_DISTANCE,
+                distanceCalculator.getDistanceOnGrid(oldDistances, (1, 1), (1, 2)))
+
+        with self.assertRaises(ValueError):
+            distanceCalculator.getDistanceOnGrid(distances, (1, 1), (3, 1))
+
+    def test_partial_positions(self):
+        layout = getLayout('mediumClassic')
+
+        distancer = distanceCalculator.Distancer(layout)
+        distancer.getMazeDistances()
+
+        self.assertEqual(0.5, distancer.getDistance((1, 1), (1.5, 1)))
+        self.assertEqual(distancer.getDistance((1, 1), (3, 1)),
+                distancer.getDistance((1.0, 1.0), (3, 1)))
+
+        with self.assertRaises(Exception):
+            distancer.getDistance((0, 0), (1, 1))
+
+    def test_lazy_distances(self):
+        layout = getLayout('mediumClassic')
+        distanceCalculator.distanceMap.pop(str(layout.walls), None)
+
+        full = distanceCalculator.Distancer(layout)
+        full.getMazeDistances()
+
+        # Make sure the lazy distancer cannot just borrow the full table.
+        distanceCalculator.distanceMap.pop(str(layout.walls), None)
+
+        lazy = distanceCalculator.Distancer(layout, lazy = True, maxLazyRows = 3)
+        lazy.getMazeDistances()
+        self.assertTrue(lazy.isReadyForMazeDistance())
+
+        positions = layout.walls.asList(False)
+        for source in positions[::11]:
+            for target in positions:
+                self.assertEqual(full.getDistance(source, target), lazy.getDistance(source, target))
+
+            self.assertTrue(len(lazy._lazyRows) <= 3)
+
+    def test_multiple_targets(self):
+        layout = getLayout('mediumClassic')
+
+        distancer = distanceCalculator.Distancer(layout)
+        distancer.getMazeDistances()
+
+        positions = layout.walls.asList(False)
+        source = positions[0]
+        targets = positions[5::13]
+
+        expected = [distancer.getDistance(source, target) for target in targets]
+        self.assertEqual(expected, distancer.getDistancesFrom(source, targets))
+
+        target, distance = distancer.getNearest(source, targets)
+        self.assertEqual(min(expected), distance)
+        self.assertEqual(distance, distancer.getDistance(source, target))
+
+        self.assertEqual((None, None), distancer.getNearest(source, []))
+
+    def test_distance_field(self):
+        layout = getLayout('mediumClassic')
+
+        distancer = distanceCalculator.Distancer(layout)
+        distancer.getMazeDistances()
+
+        positions = layout.walls.asList(False)
+        targets = positions[3::17]
+        field = distancer.getDistanceField(targets)
+
+        def check():
+            for position in positions[::5]:
+                expected = min([distancer.getDistance(position, target) for target in targets])
+                self.assertEqual(expected, field.getDistance(position))
+
+                nearest = field.getNearestTarget(position)
+                self.assertEqual(expected, distancer.getDistance(position, nearest))
+
+            # Each target keeps track of the nodes it owns.
+            owned = {node: owner for (owner, region) in field._regions.items()
+                    for node in region}
+            self.assertEqual(owned, {node: owner for (node, owner) in enumerate(field._owners)
+                    if owner is not None})
+
+        check()
+
+        for target in list(targets[::2]):
+            targets.remove(target)
+            field.removeTarget(target)
+            check()
+
+        targets.append(positions[0])
+        field.addTarget(positions[0])
+        check()
+
+    def test_shared_cache(self):
+        layout = getLayout('mediumClassic')
+
+        first = distanceCalculator.Distancer(layout)
+        first.getMazeDistances()
+
+        second = distanceCalculator.Distancer(layout)
+        second.getMazeDistances()
+
+        self.assertIs(first._distances, second._distances)
+
+    def test_disk_cache(self):
+        layout = getLayout('smallClassic')
+        key = str(layout.walls)
+
+        try:
+            with tempfile.TemporaryDirectory() as cacheDir:
+                distanceCalculator.setCacheDir(cacheDir)
+                distanceCalculator.distanceMap.pop(key, None)
+
+                computed = distanceCalculator.getDistances(layout)
+                self.assertEqual(1, len(os.listdir(os.path.join(cacheDir,
+                        distanceCalculator.DISTANCE_CACHE_DIRNAME))))
+
+                # Drop the in-memory copy, so the table must come from disk.
+                distanceCalculator.distanceMap.pop(key, None)
+
+                loaded = distanceCalculator.getDistances(layout)
+                self.assertIsInstance(loaded, memoryview)
+                self.assertEqual(list(computed), loaded.tolist())
+
+                # Release the mapping before the directory is removed.
+                distanceCalculator.distanceMap.pop(key, None)
+                loaded.release()
+        finally:
+            distanceCalculator.setCacheDir(None)
+
+if __name__ == '__main__':
+    unittest.main()
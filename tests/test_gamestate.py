@@ -0,0 +1,206 @@
+import random
+import unittest
+
+from pacai.agents.base import BaseAgent
+from pacai.agents.capture.defense import DefensiveReflexAgent
+from pacai.agents.capture.offense import OffensiveReflexAgent
+from pacai.bin import capture
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.agentstate import AgentState
+from pacai.core.directions import Directions
+from pacai.core.layout import getLayout
+from pacai.ui.capture.null import CaptureNullView
+
+class DeltaCheck(object):
+    """
+    Makes an agent track the food, capsules, agents, and scared timers using only deltas,
+    and check them against the full state.
+    """
+
+    def __init__(self, index, testCase, **kwargs):
+        super().__init__(index, **kwargs)
+
+        self.testCase = testCase
+        self.numRespawns = 0
+
+    def registerInitialState(self, state):
+        super().registerInitialState(state)
+
+        self.food = set(state.getFood().asList())
+        self.capsules = set(state.getCapsules())
+        self.positions = [agentState.getPosition() for agentState in state.getAgentStates()]
+        self.scaredTimers = [0] * state.getNumAgents()
+        self.state = state
+
+    def wantsDeltas(self):
+        return True
+
+    def observeDeltas(self, deltas):
+        for delta in deltas:
+            for (agentIndex, oldPosition, newPosition) in delta.moves:
+                self.testCase.assertEqual(self.positions[agentIndex], oldPosition)
+                self.positions[agentIndex] = newPosition
+
+            for agentIndex in delta.respawns:
+                self.testCase.assertEqual(self.state.getInitialAgentPosition(agentIndex),
+                        self.positions[agentIndex])
+                self.numRespawns += 1
+
+            for (agentIndex, timer) in delta.scaredTimers:
+                self.scaredTimers[agentIndex] = timer
+
+            self.food -= set(delta.foodEaten)
+            self.capsules -= set(delta.capsulesEaten)
+
+    def getAction(self, state):
+        self.check(state)
+        return super().getAction(state)
+
+    def final(self, state):
+        self.check(state)
+        super().final(state)
+
+    def check(self, state):
+        self.testCase.assertEqual(set(state.getFood().asList()), self.food)
+        self.testCase.assertEqual(set(state.getCapsules()), self.capsules)
+
+        for (agentIndex, agentState) in enumerate(state.getAgentStates()):
+            self.testCase.assertEqual(agentState.getPosition(), self.positions[agentIndex])
+            self.testCase.assertEqual(agentState.getScaredTimer(), self.scaredTimers[agentIndex])
+
+class OffensiveDeltaAgent(DeltaCheck, OffensiveReflexAgent):
+    pass
+
+class DefensiveDeltaAgent(DeltaCheck, DefensiveReflexAgent):
+    pass
+
+class StopAgent(BaseAgent):
+    """
+    Always stays put, and counts the deltas it sees (if it wants them).
+    """
+
+    def __init__(self, index, wantsDeltas = False, **kwargs):
+        super().__init__(index, **kwargs)
+
+        self._wantsDeltas = wantsDeltas
+        self.numDeltas = 0
+
+    def getAction(self, state):
+        return Directions.STOP
+
+    def observeDeltas(self, deltas):
+        self.numDeltas += len(deltas)
+
+    def wantsDeltas(self):
+        return self._wantsDeltas
+
+"""
+Test game state equality and hashing.
+"""
+class GameStateTest(unittest.TestCase):
+    def test_hash_independent_of_move_order(self):
+        state = PacmanGameState(getLayout('mediumClassic', maxGhosts = 2))
+
+        ghost1 = state.getLegalActions(1)[0]
+        ghost2 = state.getLegalActions(2)[0]
+
+        first = state.generateSuccessor(1, ghost1).generateSuccessor(2, ghost2)
+        second = state.generateSuccessor(2, ghost2).generateSuccessor(1, ghost1)
+
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertNotEqual(hash(state), hash(first))
+
+    def test_hash_tracks_food(self):
+        state = PacmanGameState(getLayout('testClassic'))
+        (x, y) = state.getFood().asList()[0]
+
+        successor = state.generateSuccessor(0, Directions.STOP)
+        before = hash(successor)
+
+        successor.eatFood(x, y)
+        self.assertNotEqual(before, hash(successor))
+
+        # The parent must not be affected by the successor eating.
+        self.assertTrue(state.hasFood(x, y))
+
+    def test_successor_shares_agent_states(self):
+        state = PacmanGameState(getLayout('mediumClassic', maxGhosts = 2))
+        pacmanPosition = state.getPacmanPosition()
+
+        action = [action for action in state.getLegalActions(0) if action != Directions.STOP][0]
+        successor = state.generateSuccessor(0, action)
+
+        # Only the agent that moved gets copied.
+        self.assertIsNot(state.getAgentState(0), successor.getAgentState(0))
+        self.assertIs(state.getAgentState(1), successor.getAgentState(1))
+        self.assertIs(state.getAgentState(2), successor.getAgentState(2))
+
+        self.assertEqual(pacmanPosition, state.getPacmanPosition())
+        self.assertNotEqual(pacmanPosition, successor.getPacmanPosition())
+
+    def test_agent_state_hash(self):
+        agentState = AgentState((1, 1), Directions.STOP, True)
+        agentState.updatePosition((1, 0))
+        agentState.setScaredTimer(3)
+        agentState.decrementScaredTimer()
+        agentState.setIsPacman(False)
+
+        expected = AgentState((2, 1), Directions.EAST, False)
+        expected.setScaredTimer(2)
+
+        self.assertEqual(expected, agentState)
+        self.assertEqual(hash(expected), hash(agentState))
+
+        agentState.respawn()
+        self.assertEqual(AgentState((1, 1), Directions.STOP, True), agentState)
+        self.assertEqual(hash(AgentState((1, 1), Directions.STOP, True)), hash(agentState))
+
+    def test_delta(self):
+        state = PacmanGameState(getLayout('testClassic'))
+        (x, y) = state.getFood().asList()[0]
+
+        successor = state.generateSuccessor(0, Directions.STOP)
+        successor.eatFood(x, y)
+        successor.getMutableAgentState(1).respawn()
+
+        delta = successor.getDelta(state, Directions.STOP)
+
+        self.assertEqual(0, delta.agentIndex)
+        self.assertEqual(Directions.STOP, delta.action)
+        self.assertEqual([(x, y)], delta.foodEaten)
+        self.assertEqual([1], delta.respawns)
+        self.assertEqual([], delta.capsulesEaten)
+
+        # An agent state that was respawned in an earlier move is shared, not respawned again.
+        self.assertEqual([], successor.generateSuccessor(0, Directions.STOP).getDelta(
+                successor).respawns)
+
+    def test_delta_feed(self):
+        random.seed(4)
+
+        agents = [
+            OffensiveDeltaAgent(0, self),
+            OffensiveDeltaAgent(1, self),
+            DefensiveDeltaAgent(2, self),
+            DefensiveDeltaAgent(3, self),
+        ]
+        game = capture.CaptureRules().newGame(getLayout('defaultCapture'), agents,
+                CaptureNullView(), 1200, False)
+        game.run()
+
+        self.assertFalse(game.agentCrashed)
+        self.assertTrue(sum([agent.numRespawns for agent in agents]) > 0)
+
+    def test_delta_feed_agent_order(self):
+        # Deltas go to an agent's place in the game, even if its index does not match.
+        agents = [StopAgent(0), StopAgent(3, wantsDeltas = True), StopAgent(2), StopAgent(1)]
+        game = capture.CaptureRules().newGame(getLayout('defaultCapture'), agents,
+                CaptureNullView(), 40, False)
+        game.run()
+
+        self.assertEqual(len(game.moveHistory), agents[1].numDeltas)
+        self.assertEqual(0, agents[3].numDeltas)
+
+if __name__ == '__main__':
+    unittest.main()
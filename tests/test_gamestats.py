@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+
+from pacai.bin import capture
+from pacai.bin import pacman
+from pacai.core import gamestats
+
+STATS_FILENAME = 'pacai_unittest_stats.json'
+
+class GameStatsTest(unittest.TestCase):
+    """
+    Test the instrumentation collected while games run.
+    """
+
+    def setUp(self):
+        self._statsPath = os.path.join(tempfile.gettempdir(), STATS_FILENAME)
+
+    def tearDown(self):
+        if (os.path.isfile(self._statsPath)):
+            os.remove(self._statsPath)
+
+    def test_move_summary(self):
+        stats = gamestats.GameStats(1)
+        for seconds in [0.0005, 0.003, 0.003, 0.04, 3.0, 7.0] + [0.0001] * 14:
+            stats.addMoveTime(0, seconds)
+
+        summary = stats.getMoveSummary(0)
+
+        self.assertEqual(20, summary['count'])
+        self.assertEqual(0.0001, summary['p50'])
+        self.assertEqual(3.0, summary['p95'])
+        self.assertEqual(7.0, summary['max'])
+        self.assertEqual(15, summary['histogram'][0])
+        self.assertEqual(2, summary['histogram'][2])
+        self.assertEqual(1, summary['histogram'][-1])
+        self.assertEqual(20, sum(summary['histogram']))
+
+        self.assertEqual(0, gamestats.GameStats(1).getMoveSummary(0)['count'])
+
+    def test_pacman(self):
+        games = pacman.main(['--null-graphics', '-p', 'GreedyAgent', '--num-games', '2',
+                '--stats', self._statsPath])
+
+        with open(self._statsPath, 'r') as file:
+            allStats = json.load(file)
+
+        self.assertEqual(2, len(allStats))
+
+        for (game, stats) in zip(games, allStats):
+            moves = sum([agent['moves']['count'] for agent in stats['agents']])
+            self.assertEqual(len(game.moveHistory), moves)
+
+            # The game makes one successor per move, and the greedy agent makes more.
+            self.assertTrue(stats['counts']['generateSuccessor'] > len(game.moveHistory))
+            self.assertTrue(stats['agents'][0]['counts']['generateSuccessor'] > 0)
+            self.assertTrue(stats['agents'][0]['counts']['getLegalActions'] > 0)
+
+            self.assertEqual(set(gamestats.PHASES), set(stats['phases']))
+            self.assertTrue(stats['phases']['engine'] > 0.0)
+
+            self.assertEqual(stats, game.stats.toDict())
+
+    def test_capture(self):
+        games = capture.main(['--null-graphics', '--max-moves', '16',
+                '--stats', self._statsPath])
+
+        with open(self._statsPath, 'r') as file:
+            allStats = json.load(file)
+
+        self.assertEqual(1, len(allStats))
+        self.assertEqual(4, len(allStats[0]['agents']))
+        self.assertEqual(16, sum([agent['moves']['count'] for agent in allStats[0]['agents']]))
+        self.assertEqual(allStats[0], games[0].stats.toDict())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from pacai.core.grid import BitGrid
+from pacai.core.grid import Grid
+
+"""
+Test the different grid storage backends.
+"""
+class GridTest(unittest.TestCase):
+    def _buildGrids(self):
+        width = 5
+        height = 3
+        cells = [(0, 0), (1, 2), (3, 1), (4, 2)]
+
+        grid = Grid(width, height)
+        bitGrid = BitGrid(width, height)
+
+        for (x, y) in cells:
+            grid[x][y] = True
+            bitGrid[x][y] = True
+
+        return grid, bitGrid, cells
+
+    def test_bit_grid_matches_grid(self):
+        grid, bitGrid, cells = self._buildGrids()
+
+        self.assertEqual(cells, bitGrid.asList())
+        self.assertEqual(grid.asList(), bitGrid.asList())
+        self.assertEqual(grid.asList(False), bitGrid.asList(False))
+
+        self.assertEqual(grid.count(), bitGrid.count())
+        self.assertEqual(grid.count(False), bitGrid.count(False))
+
+        self.assertEqual(grid, bitGrid)
+        self.assertEqual(bitGrid, grid)
+        self.assertEqual(hash(grid), hash(bitGrid))
+        self.assertEqual(str(grid), str(bitGrid))
+
+        for x in range(grid.getWidth()):
+            for y in range(grid.getHeight()):
+                self.assertEqual(grid[x][y], bitGrid[x][y])
+
+    def test_bit_grid_copy(self):
+        _, bitGrid, _ = self._buildGrids()
+
+        other = bitGrid.copy()
+        self.assertEqual(bitGrid, other)
+
+        other[1][2] = False
+        self.assertTrue(bitGrid[1][2])
+        self.assertFalse(other[1][2])
+        self.assertNotEqual(bitGrid, other)
+        self.assertEqual(bitGrid.count() - 1, other.count())
+
+    def test_bit_grid_bounds(self):
+        bitGrid = BitGrid(2, 2)
+
+        with self.assertRaises(IndexError):
+            bitGrid[2]
+
+        with self.assertRaises(IndexError):
+            bitGrid[0][2]
+
+        bitGrid[-1][-1] = True
+        self.assertEqual([(1, 1)], bitGrid.asList())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+
+from pacai.core import layout as layoutModule
+from pacai.core.actions import Actions
+from pacai.core.directions import Directions
+from pacai.core.layout import getLayout
+
+DIRECTIONS = Directions.CARDINAL + [Directions.STOP]
+
+"""
+Test layouts and the structures they precompute.
+"""
+class LayoutTest(unittest.TestCase):
+    def test_action_tables(self):
+        layout = getLayout('mediumClassic')
+
+        for (x, y) in layout.walls.asList(False):
+            position = (x, y)
+
+            self.assertEqual(Actions.getLegalNeighbors(position, layout.walls),
+                    layout.getLegalNeighbors(position))
+
+            for direction in DIRECTIONS:
+                possible = Actions.getPossibleActions(position, direction, layout.walls)
+                self.assertEqual(possible, layout.getPossibleActions(position, direction))
+
+                ghostActions = layout.getGhostActions(position, direction)
+                self.assertNotIn(Directions.STOP, ghostActions)
+                self.assertTrue(set(ghostActions) <= set(possible))
+
+    def test_action_tables_between_cells(self):
+        layout = getLayout('mediumClassic')
+        position = (1.5, 1)
+
+        self.assertEqual([Directions.EAST], layout.getPossibleActions(position, Directions.EAST))
+        self.assertEqual([Directions.EAST], layout.getGhostActions(position, Directions.EAST))
+
+    def test_action_tables_copy(self):
+        layout = getLayout('mediumClassic')
+        position = layout.agentPositions[0][1]
+
+        actions = layout.getPossibleActions(position, Directions.STOP)
+        actions.clear()
+
+        self.assertNotEqual([], layout.getPossibleActions(position, Directions.STOP))
+
+    def test_node_index(self):
+        layout = getLayout('mediumClassic')
+        positions = layout.walls.asList(False)
+
+        self.assertEqual(len(positions), layout.getNumNodes())
+        self.assertEqual(positions, layout.getNodePositions())
+
+        for nodeId in range(layout.getNumNodes()):
+            position = layout.getNodePosition(nodeId)
+            self.assertEqual(nodeId, layout.getNodeId(position))
+
+            expected = set(layout.getLegalNeighbors(position)) - {position}
+            neighbors = {layout.getNodePosition(other) for other in layout.getNodeNeighbors(nodeId)}
+            self.assertEqual(expected, neighbors)
+
+        self.assertIsNone(layout.getNodeId((0, 0)))
+        self.assertIsNone(layout.getNodeId((1.5, 1)))
+        self.assertEqual(layout.getNodeId((1, 1)), layout.getNodeId((1.0, 1.0)))
+
+    def test_cache(self):
+        self.assertIs(getLayout('mediumClassic'), getLayout('mediumClassic'))
+        self.assertIsNot(getLayout('mediumClassic'), getLayout('mediumClassic', maxGhosts = 1))
+
+    def test_compiled_cache(self):
+        layoutModule._layoutCache.clear()
+
+        with tempfile.TemporaryDirectory() as cacheDir:
+            original = getLayout('tinyMaze', cacheDir = cacheDir)
+            compiledDir = os.path.join(cacheDir, layoutModule.COMPILED_LAYOUT_DIRNAME)
+            self.assertEqual(1, len(os.listdir(compiledDir)))
+
+            # Forget the in-process copy, so the compiled one has to be used.
+            layoutModule._layoutCache.clear()
+
+            compiled = getLayout('tinyMaze', cacheDir = cacheDir)
+            self.assertIsNot(original, compiled)
+            self.assertEqual(str(original), str(compiled))
+            self.assertEqual(original.walls, compiled.walls)
+            self.assertEqual(original.food, compiled.food)
+            self.assertEqual(original.agentPositions, compiled.agentPositions)
+
+    def test_compiled_cache_same_name(self):
+        layoutModule._layoutCache.clear()
+
+        with tempfile.TemporaryDirectory() as cacheDir, \
+                tempfile.TemporaryDirectory() as layoutDir:
+            layoutText = '%%%%%\n%P .%\n%%%%%\n'
+            with open(os.path.join(layoutDir, 'tinyMaze.lay'), 'w') as file:
+                file.write(layoutText)
+
+            original = getLayout('tinyMaze', cacheDir = cacheDir)
+
+            # A layout with the same name in another directory gets its own compiled copy.
+            layoutModule._layoutCache.clear()
+            other = getLayout('tinyMaze', layout_dir = layoutDir, cacheDir = cacheDir)
+
+            self.assertEqual(layoutText.strip(), str(other))
+            self.assertNotEqual(str(original), str(other))
+
+            compiledDir = os.path.join(cacheDir, layoutModule.COMPILED_LAYOUT_DIRNAME)
+            self.assertEqual(2, len(os.listdir(compiledDir)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,42 @@
 import os
+import pickle
 import tempfile
 import unittest
 
 from pacai.bin import capture
 from pacai.bin import pacman
+from pacai.bin.capture import CaptureGameState
+from pacai.bin.pacman import PacmanGameState
+from pacai.core import replay
+from pacai.core.grid import Grid
+from pacai.core.layout import Layout
 
 PACMAN_FILENAME = 'pacai_unittest_pacman.replay'
 CAPTURE_FILENAME = 'pacai_unittest_capture.replay'
 
+def _oldLayout(layout):
+    """
+    Make a layout shaped like the ones in old pickled replays:
+    only the attributes layouts used to have, with plain grids.
+    """
+
+    oldLayout = object.__new__(Layout)
+    oldLayout.width = layout.width
+    oldLayout.height = layout.height
+    oldLayout.walls = Grid(layout.width, layout.height)
+    oldLayout.food = Grid(layout.width, layout.height)
+    oldLayout.capsules = list(layout.capsules)
+    oldLayout.agentPositions = list(layout.agentPositions)
+    oldLayout.numGhosts = layout.getNumGhosts()
+    oldLayout.layoutText = list(layout.layoutText)
+
+    for x in range(layout.width):
+        for y in range(layout.height):
+            oldLayout.walls[x][y] = layout.walls[x][y]
+            oldLayout.food[x][y] = layout.food[x][y]
+
+    return oldLayout
+
 """
 Test saving and playing replays.
 """
@@ -24,6 +53,105 @@ class ReplayTest(unittest.TestCase):
 
         os.remove(replayPath)
 
+    def test_pacman_archive(self):
+        replayPath = os.path.join(tempfile.gettempdir(), PACMAN_FILENAME)
+
+        games = pacman.main(['--null-graphics', '-p', 'GreedyAgent', '--num-games', '3',
+                '--record', replayPath])
+
+        # Every game is kept, in order.
+        replays = list(replay.readReplays(replayPath))
+        self.assertEqual(3, len(replays))
+        for (game, recorded) in zip(games, replays):
+            self.assertEqual(game.moveHistory, recorded['actions'])
+            self.assertEqual(str(game.state.getInitialLayout()), str(recorded['layout']))
+
+        # More games can be added to an archive.
+        pacman.main(['--null-graphics', '-p', 'GreedyAgent', '--record', replayPath])
+        self.assertEqual(4, len(list(replay.readReplays(replayPath))))
+
+        pacman.main(['--null-graphics', '--replay', replayPath, '--replay-game', '2'])
+
+        os.remove(replayPath)
+
+    def test_pacman_parallel_archive(self):
+        replayPath = os.path.join(tempfile.gettempdir(), PACMAN_FILENAME)
+
+        games = pacman.main(['--null-graphics', '-p', 'GreedyAgent', '--num-games', '2',
+                '--jobs', '2', '--record', replayPath])
+
+        replays = list(replay.readReplays(replayPath))
+        self.assertEqual(2, len(replays))
+        for (game, recorded) in zip(games, replays):
+            self.assertEqual(game.moveHistory, recorded['actions'])
+
+        pacman.main(['--null-graphics', '--replay', replayPath, '--replay-game', '1'])
+
+        os.remove(replayPath)
+
+    def test_pacman_keyframes(self):
+        replayPath = os.path.join(tempfile.gettempdir(), PACMAN_FILENAME)
+
+        games = pacman.main(['--null-graphics', '-p', 'GreedyAgent', '--seed', '4',
+                '--record', replayPath])
+        recorded = next(replay.readReplays(replayPath))
+        actions = recorded['actions']
+
+        self.assertTrue(len(recorded['keyframes']) > 0)
+        self._checkSeek(lambda: PacmanGameState(recorded['layout']), actions,
+                recorded['keyframes'])
+
+        pacman.main(['--null-graphics', '--replay', replayPath,
+                '--replay-start', str(len(actions) // 2)])
+
+        # Starting past the end still shows the final move.
+        pacman.main(['--null-graphics', '--replay', replayPath,
+                '--replay-start', str(len(actions) * 2)])
+
+        self.assertEqual(games[0].moveHistory, actions)
+        os.remove(replayPath)
+
+    def test_pacman_pickle(self):
+        replayPath = os.path.join(tempfile.gettempdir(), PACMAN_FILENAME)
+
+        games = pacman.main(['--null-graphics', '-p', 'GreedyAgent'])
+        layout = games[0].state.getInitialLayout()
+
+        # Replays used to be a pickled dict, those should still work.
+        components = {'layout': _oldLayout(layout), 'actions': games[0].moveHistory}
+        with open(replayPath, 'wb') as file:
+            pickle.dump(components, file)
+
+        replays = list(replay.readReplays(replayPath))
+        self.assertEqual(1, len(replays))
+        self.assertEqual(games[0].moveHistory, replays[0]['actions'])
+        self.assertEqual(str(layout), str(replays[0]['layout']))
+        self.assertEqual(layout.agentPositions, replays[0]['layout'].agentPositions)
+
+        pacman.main(['--null-graphics', '--replay', replayPath])
+
+        os.remove(replayPath)
+
+    def test_capture_pickle(self):
+        replayPath = os.path.join(tempfile.gettempdir(), CAPTURE_FILENAME)
+
+        games = capture.main(['--null-graphics', '--max-moves', '100'])
+
+        components = {
+            'layout': _oldLayout(games[0].state.getInitialLayout()),
+            'agents': [],
+            'actions': games[0].moveHistory,
+            'length': 100,
+            'redTeamName': 'pacai.core.baselineTeam',
+            'blueTeamName': 'pacai.core.baselineTeam',
+        }
+        with open(replayPath, 'wb') as file:
+            pickle.dump(components, file)
+
+        capture.main(['--null-graphics', '--replay', replayPath])
+
+        os.remove(replayPath)
+
     def test_capture(self):
         replayPath = os.path.join(tempfile.gettempdir(), CAPTURE_FILENAME)
 
@@ -35,5 +163,47 @@ class ReplayTest(unittest.TestCase):
 
         os.remove(replayPath)
 
+    def test_capture_archive(self):
+        replayPath = os.path.join(tempfile.gettempdir(), CAPTURE_FILENAME)
+
+        games = capture.main(['--null-graphics', '--num-games', '2', '--max-moves', '100',
+                '--layout', 'RANDOM13', '--record', replayPath])
+
+        replays = list(replay.readReplays(replayPath))
+        self.assertEqual(2, len(replays))
+        for (game, recorded) in zip(games, replays):
+            self.assertEqual(game.moveHistory, recorded['actions'])
+            self.assertEqual(100, recorded['length'])
+            self.assertEqual('pacai.core.baselineTeam', recorded['redTeamName'])
+
+        capture.main(['--null-graphics', '--replay', replayPath])
+
+        os.remove(replayPath)
+
+    def test_capture_keyframes(self):
+        replayPath = os.path.join(tempfile.gettempdir(), CAPTURE_FILENAME)
+
+        capture.main(['--null-graphics', '--max-moves', '400', '--seed', '4',
+                '--record', replayPath])
+        recorded = next(replay.readReplays(replayPath))
+
+        self.assertEqual(3, len(recorded['keyframes']))
+        self._checkSeek(lambda: CaptureGameState(recorded['layout'], recorded['length']),
+                recorded['actions'], recorded['keyframes'])
+
+        capture.main(['--null-graphics', '--replay', replayPath, '--replay-start', '350'])
+
+        os.remove(replayPath)
+
+    def _checkSeek(self, newState, actions, keyframes):
+        state = newState()
+        for moveIndex in range(len(actions)):
+            if (moveIndex % 37 == 0 or moveIndex in keyframes):
+                seeked = replay.seekReplay(newState(), actions, keyframes, moveIndex)
+                self.assertEqual(state, seeked)
+                self.assertEqual(state.getSnapshot(), seeked.getSnapshot())
+
+            state = state.generateSuccessor(*actions[moveIndex])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from pacai.bin import capture
+from pacai.bin import tournament
+
+DATABASE_FILENAME = 'pacai_unittest_tournament.sqlite'
+
+TEAMS = ['pacai.core.baselineTeam', 'pacai.student.myTeam']
+
+class TournamentTest(unittest.TestCase):
+    """
+    Test running (and resuming) a round-robin tournament.
+    """
+
+    def setUp(self):
+        self._databasePath = os.path.join(tempfile.gettempdir(), DATABASE_FILENAME)
+        if (os.path.isfile(self._databasePath)):
+            os.remove(self._databasePath)
+
+    def tearDown(self):
+        if (os.path.isfile(self._databasePath)):
+            os.remove(self._databasePath)
+
+    def test_schedule(self):
+        matches = tournament.scheduleMatches(TEAMS, ['defaultCapture', 'RANDOM'], 3, seed = 4)
+
+        # Two colors, two layouts, three repetitions.
+        self.assertEqual(12, len(matches))
+        self.assertEqual(matches, tournament.scheduleMatches(TEAMS, ['defaultCapture', 'RANDOM'],
+                3, seed = 4))
+
+        # Each repetition gets its own random layout.
+        randomLayouts = {match.layout for match in matches if match.layout != 'defaultCapture'}
+        self.assertEqual(3, len(randomLayouts))
+
+        # Every game gets its own seed.
+        self.assertEqual(12, len({match.seed for match in matches}))
+
+    def test_read_command(self):
+        args = tournament.readCommand(['--teams', *TEAMS, '--max-moves', '16',
+                '--move-timeout-time', '2.5'])
+
+        # The game options come from capture, and the tournament calls --max-moves the length.
+        self.assertEqual(16, args['length'])
+        self.assertEqual(2.5, args['moveTimeoutTimeSecs'])
+        self.assertEqual(capture.DEFAULT_MAX_STARTUP_TIME_SECS, args['maxStartupTimeSecs'])
+        self.assertNotIn('maxMoves', args)
+
+    def test_tournament(self):
+        args = [
+            '--teams', *TEAMS,
+            '--layouts', 'defaultCapture', 'RANDOM94',
+            '--repetitions', '2',
+            '--jobs', '2',
+            '--database', self._databasePath,
+            '--seed', '1234',
+            '--max-moves', '16',
+        ]
+
+        ratings = tournament.main(args)
+
+        self.assertEqual(2, len(ratings))
+        for (team, elo, games, wins, losses, ties, winRate) in ratings:
+            self.assertIn(team, TEAMS)
+            self.assertEqual(8, games)
+            self.assertEqual(games, wins + losses + ties)
+
+        # Running the same tournament again should not replay any games.
+        self.assertEqual(ratings, tournament.main(args))
+
+        connection = sqlite3.connect(self._databasePath)
+        try:
+            count = connection.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+        finally:
+            connection.close()
+
+        self.assertEqual(8, count)
+
+    def test_resume_saved_seed(self):
+        args = [
+            '--teams', *TEAMS,
+            '--layouts', 'RANDOM',
+            '--jobs', '1',
+            '--database', self._databasePath,
+            '--max-moves', '16',
+        ]
+
+        ratings = tournament.main(args)
+
+        # Without a seed, resuming uses the saved one (and so the same random layout).
+        self.assertEqual(ratings, tournament.main(args))
+
+        connection = sqlite3.connect(self._databasePath)
+        try:
+            count = connection.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+            seed = connection.execute("SELECT value FROM settings WHERE name = 'seed'").fetchone()
+        finally:
+            connection.close()
+
+        self.assertEqual(2, count)
+
+        # A different seed would schedule different games.
+        self.assertRaises(ValueError, tournament.main, args + ['--seed', str(int(seed[0]) + 1)])
+
+    def test_broken_team(self):
+        teams = ['pacai.core.baselineTeam', 'pacai.core.noSuchTeam']
+        ratings = tournament.main([
+            '--teams', *teams,
+            '--jobs', '1',
+            '--database', self._databasePath,
+            '--seed', '1234',
+            '--max-moves', '16',
+        ])
+
+        # The team that cannot be created forfeits every game, instead of ending the tournament.
+        records = {team: (wins, losses) for (team, elo, games, wins, losses, ties, winRate)
+                in ratings}
+        self.assertEqual((2, 0), records['pacai.core.baselineTeam'])
+        self.assertEqual((0, 2), records['pacai.core.noSuchTeam'])
+
+        connection = sqlite3.connect(self._databasePath)
+        try:
+            crashed = [row[0] for row in connection.execute('SELECT crashed FROM games')]
+        finally:
+            connection.close()
+
+        self.assertEqual([1, 1], crashed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,27 @@
+import os
+import random
 import shutil
 import subprocess
+import tempfile
 import unittest
 
+from PIL import Image
+from PIL import ImageDraw
+from PIL import ImageSequence
+
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.layout import getLayout
+from pacai.ui import frame as frameModule
+from pacai.ui import gif
+from pacai.ui.pacman.frame import PacmanFrame
+from pacai.ui.renderer import FrameRenderer
+
+GIF_FILENAME = 'pacai_unittest.gif'
+
+class BrokenFrame(object):
+    def toImage(self, sprites = {}, font = None, cellSize = None):
+        raise ValueError('This frame cannot be drawn.')
+
 """
 Test standard graphics under xvfb.
 """
@@ -51,5 +71,106 @@ class UITest(unittest.TestCase):
 
         subprocess.run(args, shell = False, check = True)
 
+    def test_gif(self):
+        path = os.path.join(tempfile.gettempdir(), GIF_FILENAME)
+
+        images = []
+        for i in range(6):
+            image = Image.new('RGB', (40, 30), (0, 0, 0))
+            ImageDraw.Draw(image).rectangle([i * 5, 10, i * 5 + 4, 14], fill = (255, 255, 0))
+            images.append(image)
+
+        # Repeat a frame, so some frames do not change.
+        images.insert(3, images[2])
+
+        writer = gif.GifWriter(path, 100)
+        try:
+            for image in images[0:4]:
+                writer.addFrame(image)
+            writer.close()
+
+            # A closed gif can be continued.
+            for image in images[4:]:
+                writer.addFrame(image)
+            writer.close()
+
+            with Image.open(path) as animation:
+                frames = [frame.convert('RGB') for frame in ImageSequence.Iterator(animation)]
+        finally:
+            os.remove(path)
+
+        self.assertEqual(len(images), len(frames))
+        for (image, frame) in zip(images, frames):
+            self.assertEqual(image.tobytes(), frame.tobytes())
+
+    def test_frame_board(self):
+        random.seed(5)
+
+        initialState = PacmanGameState(getLayout('smallClassic'))
+        state = initialState
+        frame = PacmanFrame(0, state, 0)
+
+        for i in range(1, 200):
+            if (state.isOver()):
+                break
+
+            agentIndex = i % state.getNumAgents()
+            action = random.choice(state.getLegalActions(agentIndex))
+            state = state.generateSuccessor(agentIndex, action)
+
+            # Frames built from the last frame match frames built from scratch.
+            frame = PacmanFrame(i, state, i, frame)
+            fullFrame = PacmanFrame(i, state, i)
+
+            for x in range(frame.getBoardWidth()):
+                self.assertEqual(fullFrame.getCol(x), frame.getCol(x))
+
+        self.assertTrue(state.getNumFood() < initialState.getNumFood())
+
+        # A new game is built from scratch.
+        frame = PacmanFrame(0, initialState, 0, frame)
+        fullFrame = PacmanFrame(0, initialState, 0)
+        for x in range(frame.getBoardWidth()):
+            self.assertEqual(fullFrame.getCol(x), frame.getCol(x))
+
+    def test_forget_backgrounds(self):
+        frame = PacmanFrame(0, PacmanGameState(getLayout('smallClassic')), 0)
+
+        frame.toImage(cellSize = (5, 10))
+        frame.toImage(cellSize = (6, 12))
+
+        cellSizes = [key[3] for key in frameModule._backgrounds]
+        self.assertIn((5, 10), cellSizes)
+        self.assertIn((6, 12), cellSizes)
+
+        frameModule.forgetBackgrounds((5, 10))
+
+        cellSizes = [key[3] for key in frameModule._backgrounds]
+        self.assertNotIn((5, 10), cellSizes)
+        self.assertIn((6, 12), cellSizes)
+
+    def test_renderer(self):
+        state = PacmanGameState(getLayout('smallClassic'))
+        frames = [PacmanFrame(i, state, i) for i in range(5)]
+
+        renderer = FrameRenderer()
+        try:
+            # Only the newest frame needs to be rendered.
+            frameNumbers = [renderer.render(frame, cellSize = (5, 10)) for frame in frames]
+            renderer.wait(frameNumbers[-1])
+
+            size = (frames[0].getBoardWidth() * 5, (frames[0].getBoardHeight() + 1) * 10)
+            self.assertEqual(size, renderer.takeImage().size)
+            self.assertIsNone(renderer.takeImage())
+
+            renderer.wait(renderer.render(frames[0]))
+            self.assertEqual(frames[0].toImage().tobytes(), renderer.takeImage().tobytes())
+
+            # Errors are raised in the caller's thread.
+            with self.assertRaises(RuntimeError):
+                renderer.wait(renderer.render(BrokenFrame()))
+        finally:
+            renderer.stop()
+
 if __name__ == '__main__':
     unittest.main()